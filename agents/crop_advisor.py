@@ -1,8 +1,9 @@
 # agents/crop_advisor.py
 from pydantic import BaseModel, Field, ValidationError
-from typing import List
-import pandas as pd
-from services.llm import chat_json_with_usage
+from typing import Callable, List, Optional
+from services.llm import chat_json_with_usage, chat_json_streaming
+from services.catalog import TableView, crops_catalog
+from services import tracing
 from config import settings
 
 class CropItem(BaseModel):
@@ -23,14 +24,21 @@ Output STRICT JSON with: location, greenhouse_area_m2, season, crops[{name, area
 Do not include keys not in the schema.
 """
 
-def _load_crops_catalog() -> pd.DataFrame:
-    df = pd.read_csv("data/crops.csv")
-    df.columns = [c.strip().lower() for c in df.columns]
-    return df
+RATIONALE_SYSTEM_PROMPT = """You are CropRationale, explaining a greenhouse crop mix that was already chosen by an optimizer.
+Do not change the crops or areas. Output STRICT JSON with one key: rationale (2–3 sentences, plain language).
+"""
 
-def generate_crop_plan(user_inputs: dict, weather: dict | None = None) -> CropPlan:
-    catalog = _load_crops_catalog()
-    crops_list = ", ".join(sorted(catalog["crop"].unique().tolist()))
+@tracing.traced("crop_advisor.generate")
+def generate_crop_plan(user_inputs: dict, weather: dict | None = None, catalog: TableView | None = None,
+                       on_field: Optional[Callable[[tuple, object], None]] = None) -> CropPlan:
+    """
+    Ask the LLM for a crop mix. With `on_field`, the completion is streamed and
+    on_field(path, value) sees each raw field as it closes (("crops", 0), ..., ("rationale",)),
+    before catalog filtering and area scaling.
+    """
+    if catalog is None:
+        catalog = crops_catalog()
+    crops_list = ", ".join(catalog.names)
     area = float(user_inputs["area"])
     location = str(user_inputs["location"])
     season = str(user_inputs["season"])
@@ -62,21 +70,30 @@ Rules:
 Return JSON ONLY with keys: location, greenhouse_area_m2, season, crops, rationale.
 """
 
-    data, usage, elapsed = chat_json_with_usage(
-        model=settings.model_small,
-        system=SYSTEM_PROMPT,
-        user=user_prompt,
-    )
+    if on_field is not None:
+        data, usage, elapsed = chat_json_streaming(
+            model=settings.model_small,
+            system=SYSTEM_PROMPT,
+            user=user_prompt,
+            on_field=on_field,
+            agent="crop_advisor",
+        )
+    else:
+        data, usage, elapsed = chat_json_with_usage(
+            model=settings.model_small,
+            system=SYSTEM_PROMPT,
+            user=user_prompt,
+            agent="crop_advisor",
+        )
 
     data.setdefault("location", location)
     data.setdefault("greenhouse_area_m2", area)
     data.setdefault("season", season)
 
-    valid_names = set(c.strip().lower() for c in catalog["crop"].tolist())
     filtered = []
     for c in data.get("crops", []):
         name = c.get("name", "").strip()
-        if name.lower() in valid_names:
+        if name.lower() in catalog.index:
             filtered.append(c)
     data["crops"] = filtered
 
@@ -103,3 +120,42 @@ Return JSON ONLY with keys: location, greenhouse_area_m2, season, crops, rationa
             "rationale": "Fallback plan due to validation error.",
         }
         return CropPlan(**fallback)
+
+@tracing.traced("crop_advisor.explain")
+def explain_crop_plan(plan: CropPlan, user_inputs: dict, weather: dict | None = None,
+                      on_field: Optional[Callable[[tuple, object], None]] = None) -> str:
+    """LLM-written rationale for a solver-chosen plan; falls back to the plan's own rationale on any error."""
+    mix = "; ".join(f"{c.name}: {c.area_m2} m², {c.cycle_days}-day cycle" for c in plan.crops)
+    weather_note = ""
+    if weather:
+        weather_note = f"Weather (approx): avg_temp={weather.get('avg_temp_c','n/a')}°C, avg_precip={weather.get('avg_precip_mm','n/a')}mm\n"
+    user_prompt = f"""
+Location: {plan.location}
+Season: {plan.season}
+Total greenhouse area: {plan.greenhouse_area_m2} m2
+User goal: {user_inputs.get("goal", "balanced")}
+Organic preference: {bool(user_inputs.get("organic", True))}
+{weather_note}Chosen mix: {mix}
+Optimizer summary: {plan.rationale}
+
+Return JSON ONLY with key: rationale.
+"""
+    try:
+        if on_field is not None:
+            data, usage, elapsed = chat_json_streaming(
+                model=settings.model_small,
+                system=RATIONALE_SYSTEM_PROMPT,
+                user=user_prompt,
+                on_field=on_field,
+                agent="crop_advisor",
+            )
+        else:
+            data, usage, elapsed = chat_json_with_usage(
+                model=settings.model_small,
+                system=RATIONALE_SYSTEM_PROMPT,
+                user=user_prompt,
+                agent="crop_advisor",
+            )
+        return str(data.get("rationale") or plan.rationale)
+    except Exception:
+        return plan.rationale
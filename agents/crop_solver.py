@@ -0,0 +1,140 @@
+# agents/crop_solver.py
+"""
+Deterministic CropAdvisor: choose 2–4 crops and their area split by scoring every
+candidate mix with the same ops cost model and price table the rest of the pipeline uses.
+
+Search space:
+  - the TOP_K crops by per-m² objective density (so a 400-crop catalog stays cheap)
+  - every subset of MIN_CROPS..MAX_CROPS of them
+  - every split with shares in [MIN_SHARE, MAX_SHARE] on a SHARE_STEP grid summing to 1
+All candidates are evaluated in one NumPy pass through ops_engine.evaluate; rounding and
+revenue/COGS/margin follow OpsOptimizer and MarketAnalyst exactly.
+
+Objective: highest margin % (ties broken by profit) among the candidates the goal allows:
+  balanced       -> every candidate
+  maximize_yield -> expected yield (kg) within GOAL_TOLERANCE of the highest
+  minimize_cost  -> COGS within GOAL_TOLERANCE of the lowest
+so the yield / cost goals never trade away margin for a marginally better yield or cost.
+"""
+from functools import lru_cache
+from itertools import combinations, product
+from typing import Mapping, NamedTuple, Optional
+import numpy as np
+from agents.crop_advisor import CropPlan
+from agents.ops_engine import crop_table, evaluate, goal_codes, plan_costs, round2, unit_rates
+from agents.market_analyst import load_price_map
+from services.catalog import TableView, crops_catalog
+from services import tracing
+
+MIN_CROPS, MAX_CROPS = 2, 4
+MIN_SHARE, MAX_SHARE, SHARE_STEP = 0.10, 0.60, 0.05
+TOP_K = 8
+GOAL_TOLERANCE = 0.05
+DEFAULT_PRICE = 2.0  # same fallback as compute_market_numbers
+
+class Solution(NamedTuple):
+    crop_idx: np.ndarray   # (k,)
+    areas: np.ndarray      # (k,)
+    revenue_usd: float
+    cogs_usd: float
+    margin_pct: float
+    yield_kg: float
+    candidates: int
+
+@lru_cache(maxsize=None)
+def share_grid(k: int, min_share: float = MIN_SHARE, max_share: float = MAX_SHARE, step: float = SHARE_STEP) -> np.ndarray:
+    """All k-part splits on the step grid with every share in [min_share, max_share]; shape (n, k)."""
+    total = int(round(1 / step))
+    lo, hi = int(round(min_share / step)), int(round(max_share / step))
+    if k == 1:
+        return np.ones((1, 1))
+    rows = [p for p in product(range(lo, hi + 1), repeat=k) if sum(p) == total]
+    if not rows:  # bounds infeasible for this k: fall back to an even split
+        return np.full((1, k), 1.0 / k)
+    return np.array(rows, dtype=float) / total
+
+def solve(area_m2: float, goal: str = "balanced", organic: bool = True, temp_c: float = 22.0,
+          catalog: Optional[TableView] = None, price_map: Optional[Mapping[str, float]] = None) -> Solution:
+    table = crop_table(catalog or crops_catalog())
+    price_map = load_price_map() if price_map is None else price_map
+    n = len(table.names)
+    if n == 0:
+        raise ValueError("Crop catalog is empty")
+    gcode = int(goal_codes(goal)[0])
+    all_idx = np.arange(n)
+    prices = np.array([float(price_map.get(name.strip().lower(), DEFAULT_PRICE)) for name in table.names])
+
+    rates = unit_rates(all_idx, gcode, organic, temp_c, table)
+    cost = rates["water_usd"] + rates["nutrients_usd"]
+    if goal == "maximize_yield":
+        density = rates["yield_kg"]
+    elif goal == "minimize_cost":
+        density = -cost
+    else:
+        density = prices * rates["yield_kg"] - cost
+    pool = all_idx[np.argsort(-density, kind="stable")[:TOP_K]]
+
+    evaluated = []
+    total_candidates = 0
+    for k in range(min(MIN_CROPS, len(pool)), min(MAX_CROPS, len(pool)) + 1):
+        subsets = np.array(list(combinations(pool, k)), dtype=np.intp)   # (S, k)
+        shares = share_grid(k)                                             # (W, k)
+        idx = np.repeat(subsets, len(shares), axis=0)                      # (S*W, k)
+        areas = round2(np.tile(shares, (len(subsets), 1)) * area_m2)
+        areas[:, -1] = round2(area_m2 - areas[:, :-1].sum(axis=1))  # splits always add up to the full area
+        ops = evaluate(idx, areas, table.cycle_days[idx], goal=gcode, organic=organic, temp_c=temp_c, table=table)
+        raw_revenue = (prices[idx] * ops.expected_yield_kg).sum(axis=1)
+        revenue = round2(raw_revenue)
+        cogs = plan_costs(ops)["total_usd"]
+        margin = np.where(raw_revenue > 0, round2((raw_revenue - cogs) / np.where(raw_revenue > 0, raw_revenue, 1) * 100.0), 0.0)
+        yields = ops.expected_yield_kg.sum(axis=1)
+        evaluated.append((idx, areas, revenue, cogs, margin, yields))
+        total_candidates += len(idx)
+
+    if goal == "maximize_yield":
+        floor = max(float(e[5].max()) for e in evaluated) * (1 - GOAL_TOLERANCE)
+        allowed = lambda revenue, cogs, yields: yields >= floor
+    elif goal == "minimize_cost":
+        ceiling = min(float(e[3].min()) for e in evaluated) * (1 + GOAL_TOLERANCE)
+        allowed = lambda revenue, cogs, yields: cogs <= ceiling
+    else:
+        allowed = lambda revenue, cogs, yields: np.ones(len(revenue), dtype=bool)
+
+    best = None
+    for idx, areas, revenue, cogs, margin, yields in evaluated:
+        cand = np.flatnonzero(allowed(revenue, cogs, yields))
+        if not cand.size:
+            continue
+        i = int(cand[np.lexsort((revenue[cand] - cogs[cand], margin[cand]))[-1]])  # last key is primary
+        score = (float(margin[i]), float(revenue[i] - cogs[i]))
+        if best is None or score > best[0]:
+            best = (score, Solution(idx[i], areas[i], float(revenue[i]), float(cogs[i]), float(margin[i]), float(yields[i]), 0))
+    return best[1]._replace(candidates=total_candidates)
+
+def template_rationale(plan: CropPlan, sol: Solution, goal: str) -> str:
+    objective = {"maximize_yield": "margin at near-top yield", "minimize_cost": "margin at near-lowest cost"}.get(goal, "expected margin")
+    mix = ", ".join(f"{c.name} {c.area_m2:g} m²" for c in plan.crops)
+    return (f"Solver pick for {objective}: {mix}. Projected margin {sol.margin_pct:.1f}% on "
+            f"${sol.revenue_usd:,.0f} revenue over the ~10-week horizon.")
+
+@tracing.traced("crop_solver.solve")
+def solve_crop_plan(user_inputs: dict, weather: dict | None = None, catalog: TableView | None = None,
+                    price_map: Optional[Mapping[str, float]] = None) -> CropPlan:
+    """Deterministic drop-in for generate_crop_plan; the rationale is a template until the LLM rewrites it."""
+    catalog = catalog or crops_catalog()
+    area = float(user_inputs["area"])
+    goal = str(user_inputs.get("goal", "balanced"))
+    temp = float((weather or {}).get("avg_temp_c", 22.0))
+    sol = solve(area, goal, bool(user_inputs.get("organic", True)), temp, catalog, price_map)
+    table = crop_table(catalog)
+    plan = CropPlan(
+        location=str(user_inputs["location"]),
+        greenhouse_area_m2=area,
+        season=str(user_inputs["season"]),
+        crops=[
+            {"name": table.names[i], "area_m2": float(a), "cycle_days": int(table.cycle_days[i])}
+            for i, a in zip(sol.crop_idx, sol.areas)
+        ],
+    )
+    plan.rationale = template_rationale(plan, sol, goal)
+    return plan
@@ -1,8 +1,10 @@
 # agents/market_analyst.py
 from pydantic import BaseModel
-from typing import List
+from typing import Callable, List, Mapping, Optional
 import pandas as pd
-from services.llm import chat_json_with_usage
+from services.llm import chat_json_with_usage, chat_json_streaming
+from services.catalog import normalize_frame, price_table
+from services import tracing
 from config import settings
 
 class PricingAssumption(BaseModel):
@@ -21,24 +23,24 @@ propose 2–3 short go-to-market tactics focused on small to medium greenhouse b
 Return STRICT JSON with keys: go_to_market (list of strings).
 """
 
-def _load_prices() -> pd.DataFrame:
-    df = pd.read_csv("data/prices.csv")
-    df.columns = [c.strip().lower() for c in df.columns]
-    return df
+def price_map_from_df(df: pd.DataFrame) -> Mapping[str, float]:
+    # Expect columns: crop, price_usd_per_kg
+    if "crop" not in df.columns or "price_usd_per_kg" not in df.columns:
+        return {}
+    names = df["crop"].astype(str).str.strip().str.lower()
+    return dict(zip(names, df["price_usd_per_kg"].astype(float)))
 
-def analyze_market(ops_plan, pricing_source: str = "csv", pricing_df: pd.DataFrame | None = None) -> MarketPlan:
+def load_price_map(pricing_df: pd.DataFrame | None = None) -> Mapping[str, float]:
     if pricing_df is not None:
-        df = pricing_df.copy()
-        df.columns = [c.strip().lower() for c in df.columns]
-    else:
-        df = _load_prices()
-
-    # Expect columns: crop, price_usd_per_kg
-    price_map = {}
-    for _, row in df.iterrows():
-        if "crop" in row and "price_usd_per_kg" in row:
-            price_map[str(row["crop"]).strip().lower()] = float(row["price_usd_per_kg"])
+        return price_map_from_df(normalize_frame(pricing_df))
+    return price_table().numeric("price_usd_per_kg")
 
+@tracing.traced("market_analyst.numbers")
+def compute_market_numbers(ops_plan, price_map: Mapping[str, float]) -> dict:
+    """
+    Deterministic part of the analysis: pricing assumptions, revenue, COGS and margin.
+    Returns the MarketPlan fields except go_to_market.
+    """
     pricing_assumptions: List[PricingAssumption] = []
     revenue = 0.0
     for c in ops_plan.crops:
@@ -51,7 +53,19 @@ def analyze_market(ops_plan, pricing_source: str = "csv", pricing_df: pd.DataFra
     if revenue > 0:
         margin_pct = round((revenue - cogs) / revenue * 100.0, 2)
 
-    items = []
+    return {
+        "revenue_usd": round(revenue, 2),
+        "cogs_usd": round(cogs, 2),
+        "margin_pct": margin_pct,
+        "pricing_assumptions": pricing_assumptions,
+    }
+
+@tracing.traced("market_analyst.go_to_market")
+def suggest_go_to_market(ops_plan, on_field: Optional[Callable[[tuple, object], None]] = None) -> List[str]:
+    """
+    LLM part of the analysis; only needs crop names and expected yields.
+    With `on_field`, ideas are streamed as (("go_to_market", i), idea) while they complete.
+    """
     try:
         user_prompt = f"""
 Crops and expected yields:
@@ -63,23 +77,29 @@ Constraints:
 - 2–3 ideas max.
 Return JSON with key go_to_market: ["idea1", "idea2", ...]
 """
-        ideas, usage, elapsed = chat_json_with_usage(
-            model=settings.model_small,
-            system=SYSTEM_PROMPT,
-            user=user_prompt,
-        )
-        items = [str(x) for x in ideas.get("go_to_market", [])][:3]
+        if on_field is not None:
+            ideas, usage, elapsed = chat_json_streaming(
+                model=settings.model_small,
+                system=SYSTEM_PROMPT,
+                user=user_prompt,
+                on_field=on_field,
+                agent="market_analyst",
+            )
+        else:
+            ideas, usage, elapsed = chat_json_with_usage(
+                model=settings.model_small,
+                system=SYSTEM_PROMPT,
+                user=user_prompt,
+                agent="market_analyst",
+            )
+        return [str(x) for x in ideas.get("go_to_market", [])][:3]
     except Exception:
-        items = [
+        return [
             "Bundle basil with tomatoes for caprese kits; sell to cafes.",
             "Offer weekly CSA-style subscription boxes.",
             "Target farm-to-table restaurants with consistent supply contracts.",
         ]
 
-    return MarketPlan(
-        revenue_usd=round(revenue, 2),
-        cogs_usd=round(cogs, 2),
-        margin_pct=margin_pct,
-        pricing_assumptions=pricing_assumptions,
-        go_to_market=items,
-    )
+def analyze_market(ops_plan, pricing_source: str = "csv", pricing_df: pd.DataFrame | None = None) -> MarketPlan:
+    numbers = compute_market_numbers(ops_plan, load_price_map(pricing_df))
+    return MarketPlan(**numbers, go_to_market=suggest_go_to_market(ops_plan))
@@ -0,0 +1,174 @@
+# agents/ops_engine.py
+"""
+NumPy engine behind OpsOptimizer.
+
+All inputs are broadcastable arrays, so one call can evaluate a single plan,
+N plans of k crops (shape (N, k)) or a flat batch grouped by plan_id.
+"""
+import threading
+from typing import Dict, NamedTuple, Optional, Sequence
+import numpy as np
+from services.catalog import TableView, crops_catalog
+
+# Simple per-m2 heuristics (can tune later)
+WATER_L_PER_M2_DAY_DEFAULTS = {
+    "tomato": 3.0,
+    "basil": 1.2,
+    "cucumber": 2.8,
+    "lettuce": 1.5,
+}
+FERT_G_PER_M2_WEEK_DEFAULTS = {
+    "tomato": 45.0,
+    "basil": 12.0,
+    "cucumber": 35.0,
+    "lettuce": 15.0,
+}
+DEFAULT_YIELD_KG_PER_M2 = 3.0
+DEFAULT_WATER_L_PER_M2_DAY = 2.0
+DEFAULT_FERT_G_PER_M2_WEEK = 15.0
+DEFAULT_CYCLE_DAYS = 60
+
+WATER_PRICE_PER_L = 0.0010  # USD
+NUTRIENT_PRICE_PER_G = 0.01 # USD
+LABOR_COST_BASE = 120.0     # USD per cycle, simple flat assumption
+MISC_COST = 25.0            # USD
+
+HORIZON_DAYS = 70
+HORIZON_WEEKS = 10
+BASELINE_TEMP_C = 22.0
+
+# goal code -> multipliers; unknown goals behave like "balanced"
+GOALS = ("balanced", "maximize_yield", "minimize_cost")
+_GOAL_WATER = np.array([1.0, 1.1, 0.9])
+_GOAL_FERT = np.array([1.0, 1.15, 0.85])
+ORGANIC_FERT_FACTOR = 0.9
+
+class CropTable(NamedTuple):
+    """Per-crop parameters; the extra last row holds the defaults, so index -1 = unknown crop."""
+    names: tuple
+    index: Dict[str, int]
+    yield_kg_per_m2: np.ndarray
+    cycle_days: np.ndarray
+    water_l_per_m2_day: np.ndarray
+    fert_g_per_m2_week: np.ndarray
+
+    def lookup(self, names: Sequence[str]) -> np.ndarray:
+        return np.array([self.index.get(str(n).strip().lower(), -1) for n in names], dtype=np.intp)
+
+class OpsArrays(NamedTuple):
+    watering_l_per_day: np.ndarray
+    fertilizer_g_per_week: np.ndarray
+    expected_yield_kg: np.ndarray
+    water_usd: np.ndarray
+    nutrients_usd: np.ndarray
+
+_tables: Dict[str, CropTable] = {}
+_tables_lock = threading.Lock()
+
+def crop_table(catalog: Optional[TableView] = None) -> CropTable:
+    """Array form of the crop catalog, built once per catalog version."""
+    catalog = catalog or crops_catalog()
+    with _tables_lock:
+        table = _tables.get(catalog.digest)
+        if table is not None:
+            return table
+        keys = list(catalog.index.keys())
+        rows = [catalog.index[k] for k in keys]
+        table = CropTable(
+            names=tuple(r["crop"] for r in rows),
+            index={k: i for i, k in enumerate(keys)},
+            yield_kg_per_m2=np.array([float(r.get("yield_kg_per_m2", DEFAULT_YIELD_KG_PER_M2)) for r in rows] + [DEFAULT_YIELD_KG_PER_M2]),
+            cycle_days=np.array([int(r.get("cycle_days", DEFAULT_CYCLE_DAYS)) for r in rows] + [DEFAULT_CYCLE_DAYS]),
+            water_l_per_m2_day=np.array([WATER_L_PER_M2_DAY_DEFAULTS.get(k, DEFAULT_WATER_L_PER_M2_DAY) for k in keys] + [DEFAULT_WATER_L_PER_M2_DAY]),
+            fert_g_per_m2_week=np.array([FERT_G_PER_M2_WEEK_DEFAULTS.get(k, DEFAULT_FERT_G_PER_M2_WEEK) for k in keys] + [DEFAULT_FERT_G_PER_M2_WEEK]),
+        )
+        if catalog.digest:
+            _tables[catalog.digest] = table
+        return table
+
+def round2(values) -> np.ndarray:
+    """np.round(values, 2), but ties resolved like Python's round() so results match the scalar model."""
+    a = np.asarray(values, dtype=float)
+    flat = np.round(a, 2).reshape(-1)
+    scaled = a.reshape(-1) * 100.0
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if near_tie.any():
+        flat[near_tie] = [round(float(v), 2) for v in a.reshape(-1)[near_tie]]
+    return flat.reshape(a.shape)
+
+def goal_codes(goals) -> np.ndarray:
+    if isinstance(goals, str):
+        goals = [goals]
+    return np.array([GOALS.index(g) if g in GOALS else 0 for g in goals], dtype=np.intp)
+
+def temp_factor(temp_c) -> np.ndarray:
+    """Water multiplier: +10% per 5°C above the 22°C baseline, clamped to ±30%."""
+    t = np.asarray(temp_c, dtype=float)
+    return 1.0 + np.clip((t - BASELINE_TEMP_C) / 5.0 * 0.10, -0.30, 0.30)
+
+def evaluate(crop_idx, area_m2, cycle_days, goal=0, organic=True, temp_c=BASELINE_TEMP_C,
+             table: Optional[CropTable] = None) -> OpsArrays:
+    """
+    Element-wise ops model. `goal` is a code from goal_codes(); every argument broadcasts.
+    Rounding matches the scalar model: cadences and yields to 2 decimals, costs from the rounded cadences.
+    """
+    table = table or crop_table()
+    idx = np.asarray(crop_idx, dtype=np.intp)
+    area = np.asarray(area_m2, dtype=float)
+    cycles = np.maximum(HORIZON_DAYS / np.maximum(1, np.asarray(cycle_days).astype(np.int64)), 0.5)
+    goal = np.asarray(goal, dtype=np.intp)
+
+    expected_yield = round2(table.yield_kg_per_m2[idx] * area * cycles)
+    water_per_m2_day = table.water_l_per_m2_day[idx] * _GOAL_WATER[goal] * temp_factor(temp_c)
+    fert_per_m2_week = table.fert_g_per_m2_week[idx] * _GOAL_FERT[goal] * np.where(organic, ORGANIC_FERT_FACTOR, 1.0)
+
+    water_l_day = round2(water_per_m2_day * area)
+    fert_g_week = round2(fert_per_m2_week * area)
+    return OpsArrays(
+        watering_l_per_day=water_l_day,
+        fertilizer_g_per_week=fert_g_week,
+        expected_yield_kg=expected_yield,
+        water_usd=water_l_day * HORIZON_DAYS * WATER_PRICE_PER_L,
+        nutrients_usd=fert_g_week * HORIZON_WEEKS * NUTRIENT_PRICE_PER_G,
+    )
+
+def unit_rates(crop_idx, goal=0, organic=True, temp_c=BASELINE_TEMP_C, table: Optional[CropTable] = None) -> Dict[str, np.ndarray]:
+    """Unrounded per-m² yield (kg), water / nutrient cost (USD) over the horizon and daily / weekly cadences."""
+    table = table or crop_table()
+    idx = np.asarray(crop_idx, dtype=np.intp)
+    goal = np.asarray(goal, dtype=np.intp)
+    cycles = np.maximum(HORIZON_DAYS / np.maximum(1, table.cycle_days[idx]), 0.5)
+    water_l = table.water_l_per_m2_day[idx] * _GOAL_WATER[goal] * temp_factor(temp_c)
+    fert = table.fert_g_per_m2_week[idx] * _GOAL_FERT[goal] * np.where(organic, ORGANIC_FERT_FACTOR, 1.0)
+    return {
+        "yield_kg": table.yield_kg_per_m2[idx] * cycles,
+        "water_usd": water_l * HORIZON_DAYS * WATER_PRICE_PER_L,
+        "nutrients_usd": fert * HORIZON_WEEKS * NUTRIENT_PRICE_PER_G,
+        "water_l_per_m2_day": water_l,
+        "fert_g_per_m2_week": fert,
+    }
+
+def plan_costs(ops: OpsArrays, plan_id=None, n_plans: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """
+    Aggregate per-crop costs into per-plan cost components.
+    Without plan_id the last axis is the crop axis; with plan_id, a flat batch is grouped by it.
+    """
+    if plan_id is None:
+        water = ops.water_usd.sum(axis=-1)
+        nutrients = ops.nutrients_usd.sum(axis=-1)
+    else:
+        plan_id = np.asarray(plan_id, dtype=np.intp)
+        n = n_plans if n_plans is not None else int(plan_id.max()) + 1 if plan_id.size else 0
+        water = np.bincount(plan_id, weights=ops.water_usd, minlength=n)
+        nutrients = np.bincount(plan_id, weights=ops.nutrients_usd, minlength=n)
+    water = round2(water)
+    nutrients = round2(nutrients)
+    labor = np.full(np.shape(water), LABOR_COST_BASE)
+    misc = np.full(np.shape(water), MISC_COST)
+    return {
+        "water_usd": water,
+        "nutrients_usd": nutrients,
+        "labor_usd": labor,
+        "misc_usd": misc,
+        "total_usd": round2(water + nutrients + labor + misc),
+    }
@@ -0,0 +1,178 @@
+# agents/production_sim.py
+"""
+Day-by-day production simulator with staggered plantings.
+
+Each crop's area is split into `beds` equal beds. Bed b of crop k is first planted on day
+offsets[k, b] and replanted as soon as it is harvested, so it cycles every cycle_days[k]:
+  planted      day >= offset
+  planting     (day - offset) % cycle == 0
+  harvest      the last `harvest_window` days of each cycle, yield spread evenly over them
+  water        water_l_per_m2_day * bed area on every planted day
+  fertilizer   fert_g_per_m2_week / 7 * bed area on every planted day
+  labor        planting + per-kg harvest + per-m² upkeep hours
+Rates come from ops_engine.unit_rates, so goal / organic / temperature act as in OpsOptimizer.
+Unlike OpsOptimizer's fractional cycles_in_horizon, only cycles that finish inside the
+horizon yield anything.
+
+All schedules are evaluated on an (S, K, B, D) grid (schedules x crops x beds x days), so
+one simulation takes well under a millisecond and search_staggers can score thousands of
+schedules per call, `chunk_size` at a time.
+
+Harvest smoothness is the coefficient of variation of weekly harvest (kg) from the first
+week any crop can be harvested; the search score adds `yield_weight` x the fraction of
+in-horizon yield lost relative to planting everything on day 0.
+"""
+from typing import NamedTuple, Optional, Tuple
+import numpy as np
+from agents.ops_engine import BASELINE_TEMP_C, HORIZON_DAYS, crop_table, goal_codes, unit_rates
+from services.catalog import TableView, crops_catalog
+from services import tracing
+
+PLANTING_HOURS_PER_M2 = 0.05
+HARVEST_HOURS_PER_KG = 0.02
+UPKEEP_HOURS_PER_M2_DAY = 0.01
+DEFAULT_BEDS = 4
+
+class BedSpec(NamedTuple):
+    crops: Tuple[str, ...]           # (K,)
+    bed_area_m2: np.ndarray          # (K,) area of one bed
+    beds: int
+    cycle_days: np.ndarray           # (K,)
+    yield_kg_per_m2: np.ndarray      # (K,) per cycle
+    water_l_per_m2_day: np.ndarray   # (K,)
+    fert_g_per_m2_week: np.ndarray   # (K,)
+
+class ProductionSim(NamedTuple):
+    """Daily series for one schedule; harvest / water / fertilizer / planted area are (D, K)."""
+    crops: Tuple[str, ...]
+    offsets: np.ndarray              # (K, B)
+    harvest_kg: np.ndarray
+    water_l: np.ndarray
+    fertilizer_g: np.ndarray
+    planted_m2: np.ndarray
+    labor_h: np.ndarray              # (D,)
+    smoothness_cv: float
+
+    @property
+    def total_harvest_kg(self) -> float:
+        return float(self.harvest_kg.sum())
+
+    @property
+    def peak_labor_h(self) -> float:
+        return float(self.labor_h.max()) if self.labor_h.size else 0.0
+
+class StaggerSearch(NamedTuple):
+    best: ProductionSim
+    baseline: ProductionSim          # everything planted on day 0
+    best_score: float
+    baseline_score: float
+    evaluated: int
+
+def bed_spec(plan: dict, beds: int = DEFAULT_BEDS, goal: str = "balanced", organic: bool = True,
+             catalog: Optional[TableView] = None) -> BedSpec:
+    """Beds for the crops of a results dict (crop_plan areas / cycles, weather temperature)."""
+    table = crop_table(catalog or crops_catalog())
+    crops = plan["crop_plan"]["crops"]
+    idx = table.lookup([c["name"] for c in crops])
+    temp = float((plan.get("weather") or {}).get("avg_temp_c", BASELINE_TEMP_C))
+    rates = unit_rates(idx, goal_codes(goal)[0], organic, temp, table)
+    return BedSpec(
+        crops=tuple(c["name"] for c in crops),
+        bed_area_m2=np.array([float(c["area_m2"]) for c in crops]) / beds,
+        beds=beds,
+        cycle_days=np.maximum(1, np.array([int(c["cycle_days"]) for c in crops])),
+        yield_kg_per_m2=table.yield_kg_per_m2[idx],
+        water_l_per_m2_day=rates["water_l_per_m2_day"],
+        fert_g_per_m2_week=rates["fert_g_per_m2_week"],
+    )
+
+def _run(spec: BedSpec, offsets: np.ndarray, horizon_days: int, harvest_window: int):
+    """offsets (S, K, B) -> harvest/water/fert/planted (S, D, K) and labor (S, D)."""
+    days = np.arange(horizon_days)
+    cycle = spec.cycle_days[None, :, None, None]
+    age = days - offsets[..., None]                                   # (S, K, B, D)
+    planted = age >= 0
+    phase = np.mod(age, cycle)
+    window = np.minimum(harvest_window, spec.cycle_days)[None, :, None, None]
+    harvesting = planted & (phase >= cycle - window)
+    planting = planted & (phase == 0)
+
+    area = spec.bed_area_m2[None, :, None]                            # (1, K, 1) after the bed sum
+    kg_per_day = (spec.yield_kg_per_m2 * spec.bed_area_m2 / np.minimum(harvest_window, spec.cycle_days))[None, :, None]
+    planted_m2 = planted.sum(axis=2) * area                           # (S, K, D)
+    harvest = harvesting.sum(axis=2) * kg_per_day
+    water = planted_m2 * spec.water_l_per_m2_day[None, :, None]
+    fert = planted_m2 * (spec.fert_g_per_m2_week / 7.0)[None, :, None]
+    labor = (planting.sum(axis=2) * area * PLANTING_HOURS_PER_M2
+             + harvest * HARVEST_HOURS_PER_KG
+             + planted_m2 * UPKEEP_HOURS_PER_M2_DAY).sum(axis=1)      # (S, D)
+    swap = lambda a: np.swapaxes(a, 1, 2)
+    return swap(harvest), swap(water), swap(fert), swap(planted_m2), labor
+
+def smoothness(harvest_kg: np.ndarray, first_day: int) -> np.ndarray:
+    """CV of weekly harvest from the week containing first_day; harvest_kg is (..., D, K)."""
+    daily = harvest_kg.sum(axis=-1)
+    weeks = daily.shape[-1] // 7
+    weekly = daily[..., :weeks * 7].reshape(daily.shape[:-1] + (weeks, 7)).sum(axis=-1)[..., first_day // 7:]
+    if weekly.shape[-1] == 0:
+        return np.zeros(weekly.shape[:-1])
+    mean = weekly.mean(axis=-1)
+    return np.divide(weekly.std(axis=-1), mean, out=np.full(mean.shape, np.inf), where=mean > 0)
+
+def _first_harvest_day(spec: BedSpec, harvest_window: int) -> int:
+    return int((spec.cycle_days - np.minimum(harvest_window, spec.cycle_days)).min())
+
+def simulate(spec: BedSpec, offsets=None, horizon_days: int = HORIZON_DAYS, harvest_window: int = 1) -> ProductionSim:
+    """One schedule; offsets is (K, B) days, default all zeros (no staggering)."""
+    k = len(spec.crops)
+    offsets = np.zeros((k, spec.beds), dtype=np.int64) if offsets is None else np.asarray(offsets, dtype=np.int64).reshape(k, spec.beds)
+    harvest, water, fert, planted, labor = _run(spec, offsets[None], horizon_days, harvest_window)
+    cv = float(smoothness(harvest, _first_harvest_day(spec, harvest_window))[0])
+    return ProductionSim(spec.crops, offsets, harvest[0], water[0], fert[0], planted[0], labor[0], cv)
+
+def even_offsets(spec: BedSpec) -> np.ndarray:
+    """Beds of each crop spread evenly across its cycle: offset_b = b * cycle / beds."""
+    return (np.arange(spec.beds)[None, :] * spec.cycle_days[:, None]) // spec.beds
+
+@tracing.traced("production_sim.search")
+def search_staggers(spec: BedSpec, n_schedules: int = 2000, horizon_days: int = HORIZON_DAYS, harvest_window: int = 1,
+                    yield_weight: float = 1.0, max_offset: Optional[int] = None, seed: int = 0,
+                    chunk_size: int = 512) -> StaggerSearch:
+    """
+    Random search over per-bed planting offsets (plus the no-stagger and even-stagger schedules).
+    Offsets for crop k are drawn from [0, min(cycle_k, max_offset)); lowest score wins.
+    """
+    k, b = len(spec.crops), spec.beds
+    rng = np.random.default_rng(seed)
+    limit = spec.cycle_days if max_offset is None else np.minimum(spec.cycle_days, max(1, max_offset))
+    first_day = _first_harvest_day(spec, harvest_window)
+
+    base_harvest, *_ = _run(spec, np.zeros((1, k, b), dtype=np.int64), horizon_days, harvest_window)
+    base_total = float(base_harvest.sum())
+    base_cv = float(smoothness(base_harvest, first_day)[0])
+
+    best_score, best_offsets = np.inf, np.zeros((k, b), dtype=np.int64)
+    fixed = np.stack([np.zeros((k, b), dtype=np.int64), np.minimum(even_offsets(spec), (limit - 1)[:, None])])
+    remaining = max(0, n_schedules - len(fixed))
+    evaluated = 0
+    while evaluated < len(fixed) + remaining:
+        if evaluated == 0:
+            batch = fixed
+        else:
+            n = min(chunk_size, len(fixed) + remaining - evaluated)
+            batch = (rng.random((n, k, b)) * limit[None, :, None]).astype(np.int64)
+        harvest, *_ = _run(spec, batch, horizon_days, harvest_window)
+        lost = 1.0 - harvest.sum(axis=(1, 2)) / base_total if base_total > 0 else np.zeros(len(batch))
+        scores = smoothness(harvest, first_day) + yield_weight * np.maximum(lost, 0.0)
+        i = int(np.argmin(scores))
+        if scores[i] < best_score:
+            best_score, best_offsets = float(scores[i]), batch[i]
+        evaluated += len(batch)
+
+    return StaggerSearch(
+        best=simulate(spec, best_offsets, horizon_days, harvest_window),
+        baseline=simulate(spec, None, horizon_days, harvest_window),
+        best_score=best_score,
+        baseline_score=base_cv,
+        evaluated=evaluated,
+    )
@@ -1,13 +1,19 @@
-import json
-from copy import deepcopy
+import queue
+import threading
+import numpy as np
 import pandas as pd
+import plotly.express as px
 import streamlit as st
 
-from orchestrator.workflow import run as run_workflow
+from orchestrator.singleflight import run_coalesced as run_workflow
+from orchestrator.workflow import refine_rationale
 from storage.db import init_db, save_scenario, list_scenarios, load_scenario, delete_scenario
-from services.weather import get_weather_summary
-from services.report import build_pdf
+from services import artifacts, profitability
+from services.risk import RiskConfig, simulate as simulate_risk
+from agents.production_sim import bed_spec, search_staggers
+from services.whatif import apply_what_if, sensitivity_grid, break_even_price_factor
 from services.forex import get_rate, SUPPORTED as FX_SUPPORTED
+from services import metrics
 from config import settings
 from services.auth0 import build_login_url, build_logout_url, exchange_code_for_tokens, verify_id_token, new_state
 
@@ -115,7 +121,8 @@ with st.sidebar:
     scen_name = st.text_input("Scenario name", value="")
     save_btn = st.button("💾 Save Current Scenario", disabled=("results" not in st.session_state or not scen_name), use_container_width=True)
 
-    scenarios = list_scenarios()
+    scen_filter = st.text_input("Filter saved scenarios", value="", placeholder="name contains…")
+    scenarios = list_scenarios(name=scen_filter.strip() or None)
     if scenarios:
         options = {f"[{s.id}] {s.name} — {s.created_at:%Y-%m-%d %H:%M}": s.id for s in scenarios}
         pick = st.selectbox("Saved scenarios", list(options.keys()))
@@ -125,32 +132,97 @@ with st.sidebar:
         st.caption("No saved scenarios yet.")
 
 # ---------- Generate ----------
+def run_streaming(user_inputs: dict, **kwargs) -> dict:
+    """
+    Run the workflow on a worker thread and render its events as they arrive.
+    Streamlit elements may only be touched from this (script) thread, so callbacks
+    just enqueue events and this loop drains the queue into placeholders.
+    """
+    events: "queue.Queue" = queue.Queue()
+    outcome = {}
+
+    def work():
+        try:
+            outcome["results"] = run_workflow(user_inputs, on_event=lambda *ev: events.put(ev), **kwargs)
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            events.put(None)
+
+    threading.Thread(target=work, daemon=True).start()
+    draft_crops, ideas = {}, {}
+    with st.status("Planning…", expanded=True) as status:
+        crops_ph, rationale_ph, ops_ph, market_ph, gtm_ph = (st.empty() for _ in range(5))
+        while (ev := events.get()) is not None:
+            stage, path, value = ev
+            if stage == "crop_plan" and path[:1] == ("crops",) and len(path) == 2 and isinstance(value, dict):
+                draft_crops[path[1]] = value
+                crops_ph.dataframe(pd.DataFrame([
+                    {"Crop": c.get("name"), "Area (m²)": c.get("area_m2"), "Cycle (days)": c.get("cycle_days")}
+                    for _, c in sorted(draft_crops.items())
+                ]), use_container_width=True)
+            elif stage == "crop_plan" and path == ("rationale",):
+                rationale_ph.caption(f"Rationale: {value}")
+            elif stage == "crop_plan" and path == ():
+                crops_ph.dataframe(pd.DataFrame([
+                    {"Crop": c.name, "Area (m²)": c.area_m2, "Cycle (days)": c.cycle_days} for c in value.crops
+                ]), use_container_width=True)
+                rationale_ph.caption(f"Rationale: {value.rationale}")
+                status.update(label="Crop plan ready — optimizing operations…")
+            elif stage == "ops_plan" and path == ():
+                ops_ph.caption("Expected yield: " + ", ".join(f"{c.name} {c.expected_yield_kg:.0f} kg" for c in value.crops))
+            elif stage == "market_numbers" and path == ():
+                market_ph.caption(f"Revenue ${value['revenue_usd']:.2f} | COGS ${value['cogs_usd']:.2f} | margin {value['margin_pct']:.2f}%")
+                status.update(label="Numbers ready — drafting go-to-market ideas…")
+            elif stage == "go_to_market" and path[:1] == ("go_to_market",) and len(path) == 2:
+                ideas[path[1]] = value
+                gtm_ph.markdown("\n".join(f"- {idea}" for _, idea in sorted(ideas.items())))
+        if "error" in outcome:
+            status.update(label="Planning failed", state="error")
+            raise outcome["error"]
+        status.update(label="Plan ready", state="complete", expanded=False)
+    return outcome["results"]
+
 if generate_clicked:
-    with st.spinner("Thinking..."):
-        wx = get_weather_summary(location) if use_weather else None
-        results = run_workflow(
-            {
-                "location": location,
-                "area": area,
-                "season": season,
-                "goal": goal,
-                "organic": organic,
-            },
-            weather=wx,
-            pricing_df=custom_prices_df,
-        )
-    st.session_state["inputs"] = {"location": location, "area": area, "season": season, "goal": goal, "organic": organic}
+    user_inputs = {"location": location, "area": area, "season": season, "goal": goal, "organic": organic}
+    if settings.llm_stream:
+        results = run_streaming(user_inputs, pricing_df=custom_prices_df, fetch_weather=use_weather)
+    else:
+        with st.spinner("Thinking..."):
+            results = run_workflow(user_inputs, pricing_df=custom_prices_df, fetch_weather=use_weather)
+    st.session_state["inputs"] = user_inputs
     st.session_state["results"] = results
+    st.session_state["results_fp"] = st.session_state["artifacts_fp"] = artifacts.plan_fingerprint(results)
+    # the LLM rationale arrives after the plan; await_rationale() reruns the page when it is ready
+    st.session_state["rationale_future"] = refine_rationale(results, user_inputs)
+
+# Merge a finished rationale before anything saves or renders the plan. Only the artifacts
+# (which print the rationale) get a new fingerprint; results_fp keys the numeric caches
+# (profitability, risk, stagger search), which the rationale does not change.
+rationale_future = st.session_state.get("rationale_future")
+if rationale_future is not None and rationale_future.done():
+    st.session_state["results"]["crop_plan"]["rationale"] = rationale_future.result()
+    st.session_state["artifacts_fp"] = artifacts.plan_fingerprint(st.session_state["results"])
+    del st.session_state["rationale_future"]
+    rationale_future = None
 
 # ---------- Save / Load / Delete ----------
 if "results" in st.session_state and save_btn and scen_name:
     sid = save_scenario(scen_name, st.session_state.get("inputs", {}), st.session_state["results"])
+    artifacts.prefetch(st.session_state["results"], fp=st.session_state.get("artifacts_fp"))
     st.success(f"Saved scenario #{sid} ✅")
 
 if scenarios and 'pick' in locals():
     chosen_id = options.get(pick)
     if chosen_id and load_btn:
         st.session_state["results"] = load_scenario(chosen_id)
+        st.session_state.pop("rationale_future", None)
+        rationale_future = None
+        meta = next(s for s in scenarios if s.id == chosen_id)
+        # later tabs (e.g. the stagger search) read goal / organic from the inputs of the loaded plan
+        st.session_state["inputs"] = {"location": meta.location, "area": meta.area, "season": meta.season,
+                                      "goal": meta.goal, "organic": meta.organic}
+        st.session_state["results_fp"] = st.session_state["artifacts_fp"] = artifacts.prefetch(st.session_state["results"])
         st.success(f"Loaded scenario #{chosen_id} ✅")
     if chosen_id and delete_btn:
         delete_scenario(chosen_id)
@@ -161,60 +233,10 @@ results = st.session_state.get("results")
 if not results:
     st.info("Fill inputs → enable integrations → **Generate Plan**.")
     st.stop()
+results_fp = st.session_state.get("results_fp") or artifacts.plan_fingerprint(results)
+artifacts_fp = st.session_state.get("artifacts_fp") or results_fp
 
 # ---------- Helpers ----------
-def compute_per_crop_profitability(results_dict: dict) -> pd.DataFrame:
-    mk = results_dict["market_plan"]
-    op = results_dict["ops_plan"]
-    price_map = {p["crop"].strip().lower(): float(p["unit_price_usd_per_kg"]) for p in mk["pricing_assumptions"]}
-    crops = op["crops"]
-    total_cogs = float(mk["cogs_usd"])
-    total_yield = sum(float(c["expected_yield_kg"]) for c in crops) or 1.0
-    rows = []
-    for c in crops:
-        name = c["name"]
-        y = float(c["expected_yield_kg"])
-        price = float(price_map.get(name.strip().lower(), 2.0))
-        revenue = price * y
-        cogs_alloc = total_cogs * (y / total_yield)
-        profit = revenue - cogs_alloc
-        margin_pct = (profit / revenue * 100.0) if revenue > 0 else 0.0
-        rows.append({
-            "Crop": name,
-            "Expected Yield (kg)": round(y, 2),
-            "Price (USD/kg)": round(price, 2),
-            "Revenue (USD)": round(revenue, 2),
-            "Allocated COGS (USD)": round(cogs_alloc, 2),
-            "Profit (USD)": round(profit, 2),
-            "Margin (%)": round(margin_pct, 2),
-        })
-    return pd.DataFrame(rows)
-
-def apply_what_if(base: dict, area_factor: float, price_factor: float) -> dict:
-    """Create an adjusted plan WITHOUT extra LLM calls."""
-    plan = deepcopy(base)
-    # Scale ops crops: yields & variable cadences
-    for c in plan["ops_plan"]["crops"]:
-        c["expected_yield_kg"] = round(float(c["expected_yield_kg"]) * area_factor, 2)
-        c["watering_l_per_day"] = round(float(c["watering_l_per_day"]) * area_factor, 2)
-        c["fertilizer_g_per_week"] = round(float(c["fertilizer_g_per_week"]) * area_factor, 2)
-    # Scale variable costs; keep labor & misc constant
-    costs = plan["ops_plan"]["costs"]
-    costs["water_usd"] = round(float(costs["water_usd"]) * area_factor, 2)
-    costs["nutrients_usd"] = round(float(costs["nutrients_usd"]) * area_factor, 2)
-    # Recompute revenue (apply price factor to USD/kg)
-    mk = plan["market_plan"]
-    for p in mk["pricing_assumptions"]:
-        p["unit_price_usd_per_kg"] = round(float(p["unit_price_usd_per_kg"]) * (1.0 + price_factor), 4)
-    price_map = {p["crop"].strip().lower(): float(p["unit_price_usd_per_kg"]) for p in mk["pricing_assumptions"]}
-    revenue = 0.0
-    for c in plan["ops_plan"]["crops"]:
-        revenue += price_map.get(c["name"].strip().lower(), 0.0) * float(c["expected_yield_kg"])
-    mk["revenue_usd"] = round(revenue, 2)
-    mk["cogs_usd"] = round(sum(plan["ops_plan"]["costs"].values()), 2)
-    mk["margin_pct"] = round(((revenue - mk["cogs_usd"]) / revenue * 100.0) if revenue > 0 else 0.0, 2)
-    return plan
-
 @st.cache_data(ttl=3600)
 def fx_rate_cached(target: str) -> float:
     try:
@@ -222,6 +244,23 @@ def fx_rate_cached(target: str) -> float:
     except Exception:
         return 1.0
 
+@st.cache_data(max_entries=32)
+def risk_cached(fp: str, config: tuple, _plan: dict):
+    """Monte Carlo summary per (plan fingerprint, config); the plan itself is not hashed."""
+    return simulate_risk(_plan, RiskConfig(*config))
+
+@st.cache_data(max_entries=32)
+def stagger_cached(fp: str, beds: int, horizon_days: int, goal: str, organic: bool, _plan: dict):
+    """Best staggered-planting schedule per (plan fingerprint, beds, horizon)."""
+    return search_staggers(bed_spec(_plan, beds, goal, organic), horizon_days=horizon_days)
+
+@st.fragment(run_every=1.0)
+def await_rationale() -> None:
+    """Polls the background rationale; a full rerun merges it (above) once it is done."""
+    fut = st.session_state.get("rationale_future")
+    if fut is not None and fut.done():
+        st.rerun()
+
 def as_ccy(amount_usd: float, rate: float) -> float:
     return round(float(amount_usd) * rate, 2)
 
@@ -241,13 +280,15 @@ colD.metric("Avg Temp (°C)", f"{wx.get('avg_temp_c','—')}")
 st.caption(f"Selected crops: {chosen_crops}")
 
 # ---------- Tabs ----------
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["Crop Plan", "Operations", "Market & Profit", "Charts", "What-if & Currency"])
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["Crop Plan", "Operations", "Market & Profit", "Charts", "What-if & Currency", "Risk"])
 
 with tab1:
     with st.expander("Recommended Crops & Area Split", expanded=True):
         df = pd.DataFrame([{"Crop": c["name"], "Area (m²)": c["area_m2"], "Cycle (days)": c["cycle_days"]} for c in cp["crops"]])
         st.dataframe(df, use_container_width=True)
-        st.caption(f"Rationale: {cp.get('rationale', '')}")
+        st.caption(f"Rationale: {cp.get('rationale', '')}" + (" (refining…)" if rationale_future is not None else ""))
+        if rationale_future is not None:
+            await_rationale()
 
 with tab2:
     with st.expander("Resource Cadence & Expected Yield (~10 weeks)", expanded=True):
@@ -269,9 +310,28 @@ with tab2:
         c4.metric("Misc", f"${costs['misc_usd']:.2f}")
         st.caption(op.get("notes", ""))
 
+    with st.expander("Production calendar (staggered plantings)"):
+        s1, s2 = st.columns(2)
+        beds = s1.slider("Beds per crop", 1, 8, 4)
+        horizon = s2.slider("Horizon (days)", 70, 210, 140, step=7)
+        plan_inputs = st.session_state.get("inputs", {})
+        stagger = stagger_cached(results_fp, beds, horizon, plan_inputs.get("goal", "balanced"),
+                                 bool(plan_inputs.get("organic", True)), results)
+        best, base = stagger.best, stagger.baseline
+        cal = pd.DataFrame({"All planted day 0": base.harvest_kg.sum(axis=1), "Best stagger": best.harvest_kg.sum(axis=1)})
+        cal.index.name = "Day"
+        st.line_chart(cal)
+        m1, m2, m3 = st.columns(3)
+        m1.metric("Harvest smoothness (weekly CV)", f"{best.smoothness_cv:.2f}", f"{best.smoothness_cv - base.smoothness_cv:+.2f}", delta_color="inverse")
+        m2.metric("Harvest in horizon (kg)", f"{best.total_harvest_kg:,.0f}", f"{best.total_harvest_kg - base.total_harvest_kg:+,.0f}")
+        m3.metric("Peak labor (h/day)", f"{best.peak_labor_h:.1f}", f"{best.peak_labor_h - base.peak_labor_h:+.1f}", delta_color="inverse")
+        st.dataframe(pd.DataFrame(best.offsets, index=list(best.crops), columns=[f"Bed {i + 1} start day" for i in range(beds)]),
+                     use_container_width=True)
+        st.caption(f"{stagger.evaluated:,} schedules searched.")
+
 with tab3:
     with st.expander("Profitability & Go-To-Market", expanded=True):
-        per_crop = compute_per_crop_profitability(results)
+        per_crop = profitability.per_crop(results, results_fp).to_frame()
         st.dataframe(per_crop, use_container_width=True)
 
         st.markdown("**Pricing Assumptions (USD/kg)**")
@@ -284,7 +344,7 @@ with tab3:
 
 with tab4:
     # Charts (base)
-    per_crop = compute_per_crop_profitability(results)
+    per_crop = profitability.per_crop(results, results_fp).to_frame()
     st.subheader("Revenue vs Allocated COGS (per crop) — Base")
     try:
         rv_cost = per_crop[["Crop", "Revenue (USD)", "Allocated COGS (USD)"]].set_index("Crop")
@@ -321,7 +381,7 @@ with tab5:
     st.caption(f"Applied: area ×{area_factor:.2f}, prices ×{1+price_factor:.2f}, FX USD→{target_ccy} @ {rate:.4f}")
 
     # Per-crop table (converted)
-    per_crop2 = compute_per_crop_profitability(adj)
+    per_crop2 = profitability.per_crop(adj).to_frame()
     # Convert monetary columns
     for col in ["Revenue (USD)", "Allocated COGS (USD)", "Profit (USD)"]:
         per_crop2[col.replace("USD", target_ccy)] = (per_crop2[col] * rate).round(2)
@@ -347,26 +407,72 @@ with tab5:
     except Exception:
         st.info("Adjusted chart data not available.")
 
+    st.subheader("Margin sensitivity (area × price)")
+    grid_area = np.arange(50, 151, 5) / 100.0
+    grid_price = np.arange(-30, 31, 5) / 100.0
+    grid = sensitivity_grid(results, grid_area, grid_price)
+    heat = grid.margin_table()
+    fig = px.imshow(
+        heat.values,
+        x=[f"{p:+.0%}" for p in grid_price],
+        y=[f"×{a:.2f}" for a in grid_area],
+        labels={"x": "Price adjustment", "y": "Area factor", "color": "Margin (%)"},
+        color_continuous_scale="RdYlGn",
+        aspect="auto",
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    be = float(break_even_price_factor(results, [area_factor])[0])
+    st.caption(f"Break-even price adjustment at area ×{area_factor:.2f}: {be:+.1%}")
+
+with tab6:
+    st.markdown("### Monte Carlo risk (yield, price and temperature uncertainty)")
+    r1, r2, r3 = st.columns(3)
+    yield_cv = r1.slider("Yield variability (CV %)", 0, 50, 15, step=5) / 100.0
+    price_cv = r2.slider("Price variability (CV %)", 0, 50, 12, step=2) / 100.0
+    temp_sd = r3.slider("Temperature SD (°C)", 0.0, 6.0, 2.0, step=0.5)
+    r4, r5 = st.columns(2)
+    draws = r4.select_slider("Draws", options=[10_000, 50_000, 100_000, 250_000, 1_000_000], value=100_000)
+    seed = int(r5.number_input("Seed", min_value=0, value=0, step=1))
+    risk = risk_cached(results_fp, (draws, yield_cv, price_cv, temp_sd, seed), results)
+
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Margin P5 / P50 / P95 (%)", f"{risk.margin_pct[5]:.1f} / {risk.margin_pct[50]:.1f} / {risk.margin_pct[95]:.1f}")
+    k2.metric("Probability of loss", f"{risk.probability_of_loss:.1%}")
+    k3.metric("Profit P5 (USD)", f"{risk.profit_usd[5]:,.0f}")
+    k4.metric("Worst-5% avg profit (USD)", f"{risk.expected_shortfall_usd:,.0f}")
+
+    counts, edges = risk.margin_hist
+    st.plotly_chart(px.bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, labels={"x": "Margin (%)", "y": "Draws"}),
+                    use_container_width=True)
+    st.markdown("**Contribution to profit variance**")
+    st.bar_chart(pd.DataFrame({"Share of variance": risk.variance_share}))
+    st.caption(f"{risk.draws:,} draws, seed {seed}. Point-estimate margin: {mk['margin_pct']:.2f}%")
+
 # ---------- Downloads ----------
 st.divider()
 colX, colY, colZ = st.columns(3)
 
+def artifact_download(kind: str, label: str) -> None:
+    """Download button for an artifact; until it has been built (or prefetched), a button that builds it."""
+    data = artifacts.peek(artifacts_fp, kind)
+    if data is None and st.button(f"Prepare {label}", key=f"prepare_{kind}"):
+        data = artifacts.get(results, kind, artifacts_fp)
+    if data is not None:
+        spec = artifacts.KINDS[kind]
+        st.download_button(label, data=data, file_name=spec.file_name, mime=spec.mime, key=f"download_{kind}")
+
 with colX:
     st.subheader("Download JSON")
-    json_bytes = json.dumps(results, indent=2).encode("utf-8")
-    st.download_button("⬇️ Full plan (JSON)", data=json_bytes, file_name="greenhouse_plan.json", mime="application/json")
+    artifact_download("json", "⬇️ Full plan (JSON)")
 
 with colY:
     st.subheader("Download CSVs")
-    crops_csv = pd.DataFrame(results["crop_plan"]["crops"]).to_csv(index=False).encode("utf-8")
-    st.download_button("⬇️ Crop Plan (CSV)", data=crops_csv, file_name="crop_plan.csv", mime="text/csv")
-    ops_csv = pd.DataFrame(results["ops_plan"]["crops"]).to_csv(index=False).encode("utf-8")
-    st.download_button("⬇️ Ops Plan (CSV)", data=ops_csv, file_name="ops_plan.csv", mime="text/csv")
+    artifact_download("crops_csv", "⬇️ Crop Plan (CSV)")
+    artifact_download("ops_csv", "⬇️ Ops Plan (CSV)")
 
 with colZ:
     st.subheader("Export PDF")
-    pdf_bytes = build_pdf(results)
-    st.download_button("📄 Strategy Report (PDF)", data=pdf_bytes, file_name="greenhouse_strategy.pdf", mime="application/pdf")
+    artifact_download("pdf", "📄 Strategy Report (PDF)")
 
 # ---------- Diagnostics ----------
 st.divider()
@@ -375,5 +481,36 @@ cp_meta = results.get("crop_plan", {}).get("_meta", {})
 advisor_elapsed = cp_meta.get("advisor_elapsed_s")
 if advisor_elapsed is not None:
     st.caption(f"CropAdvisor latency: {advisor_elapsed}s (approx)")
+run_meta = results.get("_meta", {})
+if run_meta.get("critical_path"):
+    st.caption(
+        f"Workflow: {run_meta['elapsed_s']}s total | critical path: " + " → ".join(
+            f"{name} ({run_meta['stages'][name]['elapsed_s']}s)" for name in run_meta["critical_path"]
+        )
+    )
 if results.get("weather", {}).get("source"):
-    st.caption(f"Weather source: {results['weather']['source']}")
\ No newline at end of file
+    st.caption(f"Weather source: {results['weather']['source']}")
+
+with st.expander("Metrics (this process)"):
+    summary = metrics.summary()
+    if summary["stages"]:
+        st.markdown("**Stage latency** (slowest p95 first)")
+        st.dataframe(pd.DataFrame(summary["stages"]), use_container_width=True)
+    if summary["agents"]:
+        st.markdown("**LLM latency by agent**")
+        st.dataframe(pd.DataFrame(summary["agents"]), use_container_width=True)
+    if summary["llm"]:
+        st.markdown("**Tokens & estimated cost**")
+        st.dataframe(pd.DataFrame(summary["llm"]), use_container_width=True)
+    hit_rate = summary["llm_cache_hit_rate"]
+    st.caption(
+        f"LLM cache hit rate: {'—' if hit_rate is None else f'{hit_rate:.0%}'} | "
+        f"LLM errors: {summary['errors']['llm_errors_total']:.0f} | HTTP errors: {summary['errors']['http_errors_total']:.0f}"
+    )
+    plans = summary["plans"]
+    st.caption(
+        f"Plans computed: {plans['leader']:.0f} | shared with a concurrent identical run: {plans['coalesced']:.0f} | "
+        f"served from the recent-result memo: {plans['memo']:.0f}"
+    )
+    st.download_button("⬇️ Metrics (Prometheus text)", data=metrics.to_prometheus().encode("utf-8"),
+                       file_name="metrics.prom", mime="text/plain")
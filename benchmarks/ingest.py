@@ -0,0 +1,94 @@
+# benchmarks/ingest.py
+"""
+Scenario ingest throughput into a scratch SQLite file.
+
+    python -m benchmarks.ingest --rows 2000
+
+Compares per-row save_scenario without SQLite tuning (the old setup), per-row with
+WAL/synchronous=NORMAL, and the bulk save_scenarios path.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from storage import db
+from config import settings
+
+SAMPLE_INPUTS = {"location": "Colombo, Sri Lanka", "area": 120.0, "season": "Oct–Dec", "goal": "balanced", "organic": True}
+SAMPLE_PLAN = {
+    "crop_plan": {
+        "location": "Colombo, Sri Lanka", "greenhouse_area_m2": 120.0, "season": "Oct–Dec",
+        "crops": [
+            {"name": "Tomato", "area_m2": 60.0, "cycle_days": 75},
+            {"name": "Basil", "area_m2": 30.0, "cycle_days": 30},
+            {"name": "Lettuce", "area_m2": 30.0, "cycle_days": 35},
+        ],
+        "rationale": "Tomato and basil pair well; lettuce adds a quick cycle.",
+    },
+    "ops_plan": {
+        "crops": [
+            {"name": "Tomato", "watering_l_per_day": 198.0, "fertilizer_g_per_week": 2430.0, "expected_yield_kg": 364.0},
+            {"name": "Basil", "watering_l_per_day": 39.6, "fertilizer_g_per_week": 324.0, "expected_yield_kg": 84.0},
+            {"name": "Lettuce", "watering_l_per_day": 49.5, "fertilizer_g_per_week": 405.0, "expected_yield_kg": 180.0},
+        ],
+        "costs": {"water_usd": 20.13, "nutrients_usd": 315.9, "labor_usd": 120.0, "misc_usd": 25.0},
+        "notes": "Parameters tuned for a ~10-week horizon. Weather-adjusted watering applied.",
+    },
+    "market_plan": {
+        "revenue_usd": 2657.2, "cogs_usd": 481.03, "margin_pct": 81.9,
+        "pricing_assumptions": [
+            {"crop": "Tomato", "unit_price_usd_per_kg": 2.8},
+            {"crop": "Basil", "unit_price_usd_per_kg": 12.0},
+            {"crop": "Lettuce", "unit_price_usd_per_kg": 3.5},
+        ],
+        "go_to_market": ["Caprese kits for cafes.", "Weekly salad boxes.", "Supply contracts with restaurants."],
+    },
+    "weather": {"avg_temp_c": 27.5, "avg_precip_mm": 6.1, "source": "open-meteo"},
+}
+
+def _fresh_db(path: str, tuning: bool) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    if db._engine is not None:
+        db._engine.dispose()
+    db._engine = None
+    settings.db_url = f"sqlite:///{path}"
+    settings.sqlite_tuning = tuning
+    db.init_db()
+
+def bench_ingest(rows: int, chunk_size: int = 500) -> dict:
+    path = os.path.join(tempfile.mkdtemp(prefix="gh-ingest-"), "bench.db")
+    items = [(f"bench-{i}", SAMPLE_INPUTS, SAMPLE_PLAN) for i in range(rows)]
+    out = {}
+
+    for label, tuning in (("per_row_untuned", False), ("per_row_wal", True)):
+        _fresh_db(path, tuning)
+        t0 = time.perf_counter()
+        for name, inputs, results in items:
+            db.save_scenario(name, inputs, results)
+        out[label] = rows / (time.perf_counter() - t0)
+
+    _fresh_db(path, True)
+    t0 = time.perf_counter()
+    db.save_scenarios(items, chunk_size=chunk_size)
+    out["bulk_wal"] = rows / (time.perf_counter() - t0)
+    return {k: round(v, 1) for k, v in out.items()}
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark scenario ingest (rows/sec)")
+    ap.add_argument("--rows", type=int, default=2000)
+    ap.add_argument("--chunk-size", type=int, default=500)
+    args = ap.parse_args(argv)
+    saved = (settings.db_url, settings.sqlite_tuning)
+    try:
+        result = bench_ingest(args.rows, args.chunk_size)
+    finally:
+        settings.db_url, settings.sqlite_tuning = saved
+        db._engine = None
+    print(json.dumps({"rows": args.rows, "rows_per_s": result}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
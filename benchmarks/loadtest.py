@@ -0,0 +1,129 @@
+# benchmarks/loadtest.py
+"""
+Concurrency load test: N virtual users run orchestrator.workflow.run back to back against a
+local OpenAI-compatible stub (benchmarks.openai_stub) through the real OpenAI client.
+
+    python -m benchmarks.loadtest --levels 1,4,16,64 --duration 20 --latency-ms 800 --sigma 0.35
+    python -m benchmarks.loadtest --levels 8,32 --stream --llm-concurrency 16 --error-rate 0.02
+    python -m benchmarks.loadtest --planner solver    # solver CropAdvisor: MarketAnalyst is the only LLM call
+
+Every iteration uses distinct inputs and the LLM cache is disabled. With --planner llm (the
+default here, whatever CROP_PLANNER says) each plan pays for both the CropAdvisor and the
+MarketAnalyst LLM calls. A plan counts as an error when workflow.run raises. Per level the table
+shows plans completed, throughput, p50/p95/p99 latency, error rate and the LLM requests the stub served.
+"""
+import argparse
+import json
+import threading
+import time
+from typing import List, Optional
+import numpy as np
+from benchmarks.openai_stub import StubConfig, start
+from config import settings
+from orchestrator.workflow import run
+from services import llm
+
+WEATHER = {"avg_temp_c": 27.5, "avg_precip_mm": 4.0, "source": "stub"}
+
+def run_level(users: int, duration_s: float, stream: bool, config: StubConfig) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration_s
+    served0, injected0 = config.requests, config.errors
+
+    def user(vu: int):
+        nonlocal errors
+        i = 0
+        while time.perf_counter() < deadline:
+            inputs = {"location": f"Loadtown {vu}-{i}", "area": 100 + (i % 7) * 20, "season": "Oct–Dec",
+                      "goal": "balanced", "organic": bool(i % 2)}
+            i += 1
+            t0 = time.perf_counter()
+            ok = True
+            try:
+                run(inputs, weather=WEATHER, on_event=(lambda *ev: None) if stream else None)
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors += 1
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(vu,), name=f"vu-{vu}") for vu in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+
+    done = len(latencies) + errors
+    lat = np.asarray(latencies) if latencies else np.zeros(1)
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    return {
+        "users": users,
+        "plans": done,
+        "errors": errors,
+        "error_rate": errors / done if done else 0.0,
+        "throughput_per_s": len(latencies) / wall,
+        "p50_s": float(p50), "p95_s": float(p95), "p99_s": float(p99),
+        "llm_requests": config.requests - served0,
+        "llm_injected_errors": config.errors - injected0,
+        "wall_s": wall,
+    }
+
+def format_table(rows: List[dict]) -> str:
+    lines = [f"{'users':>6} {'plans':>7} {'plans/s':>8} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'err %':>6} {'LLM req':>8} {'injected':>8}"]
+    for r in rows:
+        lines.append(
+            f"{r['users']:>6} {r['plans']:>7} {r['throughput_per_s']:>8.2f} {r['p50_s']:>7.2f} {r['p95_s']:>7.2f} "
+            f"{r['p99_s']:>7.2f} {r['error_rate'] * 100:>6.1f} {r['llm_requests']:>8} {r['llm_injected_errors']:>8}"
+        )
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Workflow load test against a local OpenAI stub")
+    ap.add_argument("--levels", default="1,2,4,8,16,32", help="comma-separated virtual-user counts")
+    ap.add_argument("--duration", type=float, default=15.0, help="seconds per level")
+    ap.add_argument("--latency-ms", type=float, default=800.0, help="median stub LLM latency")
+    ap.add_argument("--sigma", type=float, default=0.3, help="lognormal latency spread (0 = fixed)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of LLM requests answered 429/500")
+    ap.add_argument("--stream", action="store_true", help="use the streaming LLM path (as the UI does)")
+    ap.add_argument("--planner", choices=("llm", "solver"), default="llm",
+                    help="CropAdvisor implementation (llm = CropAdvisor prompts are load-tested too)")
+    ap.add_argument("--llm-concurrency", type=int, default=None, help="override LLM_MAX_CONCURRENCY")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--json", help="also write results here")
+    args = ap.parse_args(argv)
+
+    config = StubConfig(args.latency_ms, args.sigma, args.error_rate, seed=args.seed)
+    server, base_url = start(config)
+    saved = (settings.openai_base_url, settings.openai_api_key, settings.llm_cache_enabled, settings.crop_planner, llm._client)
+    settings.openai_base_url = base_url
+    settings.openai_api_key = settings.openai_api_key or "stub"
+    settings.llm_cache_enabled = False
+    settings.crop_planner = args.planner
+    llm._client = None
+    if args.llm_concurrency is not None:
+        llm.set_max_concurrency(args.llm_concurrency)
+    rows = []
+    print(f"planner={args.planner} stream={args.stream}", flush=True)
+    print(format_table(rows), flush=True)
+    try:
+        for users in (int(x) for x in args.levels.split(",") if x.strip()):
+            rows.append(run_level(users, args.duration, args.stream, config))
+            print(format_table(rows[-1:]).splitlines()[-1], flush=True)
+    finally:
+        server.shutdown()
+        settings.openai_base_url, settings.openai_api_key, settings.llm_cache_enabled, settings.crop_planner, llm._client = saved
+        llm.set_max_concurrency(settings.llm_max_concurrency)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"config": vars(args), "levels": rows}, fh, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,146 @@
+# benchmarks/openai_stub.py
+"""
+Local OpenAI-compatible HTTP stub for load tests (POST /v1/chat/completions, plain or stream=true).
+
+    python -m benchmarks.openai_stub --port 8799 --latency-ms 800 --sigma 0.35 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:8799/v1 OPENAI_API_KEY=stub streamlit run app.py
+
+Answers come from benchmarks.stubs.canned_completion. Latency per request is lognormal
+around --latency-ms (sigma 0 = fixed); streamed responses send the first chunk after
+--ttft-fraction of it and spread the rest over the chunks. --error-rate injects 500s
+(half of them as 429s).
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from benchmarks.stubs import STREAM_CHUNK_CHARS, canned_completion
+
+class StubConfig:
+    def __init__(self, latency_ms: float = 500.0, sigma: float = 0.0, error_rate: float = 0.0,
+                 ttft_fraction: float = 0.3, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.ttft_fraction = ttft_fraction
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def draw(self):
+        """(latency seconds, injected error status or None) for one request."""
+        with self.lock:
+            self.requests += 1
+            latency = self.latency_ms / 1000.0 * math.exp(self.sigma * self.rng.gauss(0.0, 1.0))
+            status = None
+            if self.rng.random() < self.error_rate:
+                self.errors += 1
+                status = 429 if self.rng.random() < 0.5 else 500
+            return latency, status
+
+def _usage(body: dict, content: str) -> dict:
+    prompt = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+    completion = len(content) // 4
+    return {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, fmt, *args):
+            pass
+
+        def _json(self, status: int, payload: dict) -> None:
+            raw = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            messages = body.get("messages", [])
+            system = next((m["content"] for m in messages if m.get("role") == "system"), "")
+            user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+            content = json.dumps(canned_completion(system, user))
+            latency, error = config.draw()
+            cid, created, model = f"chatcmpl-{uuid.uuid4().hex[:12]}", int(time.time()), body.get("model", "stub")
+
+            if error is not None:
+                time.sleep(latency * config.ttft_fraction)
+                self._json(error, {"error": {"message": "injected failure", "type": "server_error"}})
+                return
+            if not body.get("stream"):
+                time.sleep(latency)
+                self._json(200, {
+                    "id": cid, "object": "chat.completion", "created": created, "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": _usage(body, content),
+                })
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            pieces = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+            time.sleep(latency * config.ttft_fraction)
+            gap = latency * (1 - config.ttft_fraction) / max(1, len(pieces))
+
+            def event(payload: dict) -> None:
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            base = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model}
+            for i, piece in enumerate(pieces):
+                delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+                event({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                time.sleep(gap)
+            event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if (body.get("stream_options") or {}).get("include_usage"):
+                event({**base, "choices": [], "usage": _usage(body, content)})
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+    return Handler
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # the default of 5 refuses connections under load
+
+def start(config: StubConfig, host: str = "127.0.0.1", port: int = 0):
+    """Start in a background thread; returns (server, base_url). Call server.shutdown() to stop."""
+    server = _Server((host, port), make_handler(config))
+    threading.Thread(target=server.serve_forever, name="openai-stub", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="OpenAI-compatible stub server")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--latency-ms", type=float, default=500.0)
+    ap.add_argument("--sigma", type=float, default=0.0, help="lognormal spread of latency (0 = fixed)")
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--ttft-fraction", type=float, default=0.3)
+    args = ap.parse_args(argv)
+    server, url = start(StubConfig(args.latency_ms, args.sigma, args.error_rate, args.ttft_fraction), args.host, args.port)
+    print(f"OpenAI stub listening on {url}  (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
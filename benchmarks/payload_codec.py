@@ -0,0 +1,75 @@
+# benchmarks/payload_codec.py
+"""
+Plan payload size and encode/decode time: legacy json.dumps text vs storage.codec
+(default: plans below COMPRESS_MIN_BYTES stay uncompressed) vs storage.codec with zlib forced.
+
+    python -m benchmarks.payload_codec --rows 2000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import timeit
+from benchmarks.ingest import SAMPLE_PLAN
+from storage.codec import encode_payload, decode_payload
+
+def _per_call_us(fn, n: int) -> float:
+    # best of 5 rounds: the comparison is about CPU cost, not scheduler noise
+    return round(min(timeit.repeat(fn, number=n, repeat=5)) / n * 1e6, 2)
+
+def _db_size_and_load(payloads, decode) -> tuple:
+    """File size after VACUUM, and mean microseconds to fetch + decode every row by id."""
+    path = os.path.join(tempfile.mkdtemp(prefix="gh-codec-"), "size.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE scenario (id INTEGER PRIMARY KEY, result_json BLOB NOT NULL)")
+    conn.executemany("INSERT INTO scenario (result_json) VALUES (?)", [(p,) for p in payloads])
+    conn.commit()
+    conn.execute("VACUUM")
+    size = os.path.getsize(path)
+
+    def load_all():
+        for sid in range(1, len(payloads) + 1):
+            decode(conn.execute("SELECT result_json FROM scenario WHERE id = ?", (sid,)).fetchone()[0])
+    load_us = min(timeit.repeat(load_all, number=1, repeat=3)) / len(payloads) * 1e6
+    conn.close()
+    os.remove(path)
+    return size, round(load_us, 2)
+
+def _plans(rows: int):
+    # vary numbers and text a little so rows don't compress as exact duplicates
+    for i in range(rows):
+        plan = json.loads(json.dumps(SAMPLE_PLAN))
+        plan["crop_plan"]["location"] = f"Site {i}"
+        for c in plan["ops_plan"]["crops"]:
+            c["expected_yield_kg"] = round(c["expected_yield_kg"] * (1 + (i % 37) / 100), 2)
+        plan["market_plan"]["revenue_usd"] = round(plan["market_plan"]["revenue_usd"] + i * 0.37, 2)
+        yield plan
+
+def bench_codec(rows: int) -> dict:
+    plans = list(_plans(rows))
+    variants = {
+        "legacy_json": (json.dumps, json.loads),
+        "codec": (encode_payload, decode_payload),
+        "codec_zlib": (lambda p: encode_payload(p, compress_min_bytes=0), decode_payload),
+    }
+    n = 2000
+    out = {"payload_bytes": {}, "db_bytes": {}, "load_us": {}, "decode_us": {}, "encode_us": {}}
+    for name, (encode, decode) in variants.items():
+        payloads = [encode(p) for p in plans]
+        one = payloads[0]
+        out["payload_bytes"][name] = len(one.encode("utf-8") if isinstance(one, str) else one)
+        out["db_bytes"][name], out["load_us"][name] = _db_size_and_load(payloads, decode)
+        out["decode_us"][name] = _per_call_us(lambda: decode(one), n)
+        out["encode_us"][name] = _per_call_us(lambda: encode(plans[0]), n)
+    return out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Benchmark plan payload encoding")
+    ap.add_argument("--rows", type=int, default=2000)
+    args = ap.parse_args(argv)
+    print(json.dumps({"rows": args.rows, **bench_codec(args.rows)}, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
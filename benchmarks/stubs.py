@@ -0,0 +1,178 @@
+# benchmarks/stubs.py
+"""
+Offline, deterministic stand-ins for OpenAI and the outbound HTTP services.
+
+    with offline(llm_latency_s=0.05):
+        run(user_inputs, fetch_weather=True)   # no network, no API key
+
+- StubOpenAI mimics client.chat.completions.create (plain and stream=True) and answers
+  CropAdvisor / MarketAnalyst prompts with canned JSON derived from the prompt itself.
+- stub_request replaces services.http_client.request for Open-Meteo and Frankfurter URLs.
+- offline() installs both, points CACHE_DIR at a scratch directory and disables the
+  LLM cache so every call pays the configured latency; everything is restored on exit.
+"""
+import datetime as dt
+import json
+import random
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Optional
+from urllib.parse import urlsplit
+from config import settings
+
+STREAM_CHUNK_CHARS = 16
+
+def canned_completion(system: str, user: str) -> dict:
+    """Deterministic JSON answer for the agents' prompts (first 3 available crops, 50/30/20 split)."""
+    if "CropRationale" in system:
+        return {"rationale": "Stub rationale: the optimizer's mix balances margin and cycle length."}
+    if "CropAdvisor" in system:
+        crops_line = re.search(r"Available crops:\s*(.*)", user)
+        area_line = re.search(r"Total greenhouse area:\s*([\d.]+)", user)
+        location = re.search(r"Location:\s*(.*)", user)
+        season = re.search(r"Season:\s*(.*)", user)
+        names = [n.strip() for n in (crops_line.group(1) if crops_line else "Tomato, Basil").split(",") if n.strip()][:3]
+        area = float(area_line.group(1)) if area_line else 100.0
+        shares = (0.5, 0.3, 0.2)[:len(names)]
+        scale = 1.0 / sum(shares)
+        return {
+            "location": location.group(1).strip() if location else "",
+            "greenhouse_area_m2": area,
+            "season": season.group(1).strip() if season else "",
+            "crops": [
+                {"name": n, "area_m2": round(area * s * scale, 2), "cycle_days": 45 + 10 * i}
+                for i, (n, s) in enumerate(zip(names, shares))
+            ],
+            "rationale": "Stub plan: the first available crops with a fixed area split.",
+        }
+    if "MarketAnalyst" in system:
+        return {"go_to_market": [
+            "Weekly salad boxes for nearby households.",
+            "Standing orders with two local cafes.",
+            "Saturday farmers-market stall.",
+        ]}
+    return {}
+
+def _usage(system: str, user: str, content: str) -> SimpleNamespace:
+    prompt, completion = (len(system) + len(user)) // 4, len(content) // 4
+    data = {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+    return SimpleNamespace(model_dump=lambda: dict(data), **data)
+
+class _Completions:
+    def __init__(self, latency_s: float, jitter_s: float, seed: int):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    def _sleep(self) -> None:
+        delay = self.latency_s + (self._rng.uniform(0, self.jitter_s) if self.jitter_s else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def create(self, model, messages, stream=False, **kwargs):
+        self.calls += 1
+        system = messages[0]["content"]
+        user = messages[-1]["content"]
+        content = json.dumps(canned_completion(system, user))
+        usage = _usage(system, user, content)
+        self._sleep()
+        if not stream:
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+                usage=usage,
+            )
+
+        def chunks():
+            for i in range(0, len(content), STREAM_CHUNK_CHARS):
+                delta = SimpleNamespace(content=content[i:i + STREAM_CHUNK_CHARS])
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+            yield SimpleNamespace(choices=[], usage=usage)
+        return chunks()
+
+class StubOpenAI:
+    def __init__(self, latency_s: float = 0.0, jitter_s: float = 0.0, seed: int = 0):
+        self.chat = SimpleNamespace(completions=_Completions(latency_s, jitter_s, seed))
+
+class StubResponse:
+    def __init__(self, url: str, status_code: int, payload: dict):
+        self.url = url
+        self.status_code = status_code
+        self._payload = payload
+        self.raw = None
+
+    def json(self) -> dict:
+        return self._payload
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            import requests
+            raise requests.HTTPError(f"{self.status_code} for {self.url}", response=self)
+
+def _daily(params: dict) -> dict:
+    start = dt.date.fromisoformat(params["start_date"])
+    end = dt.date.fromisoformat(params["end_date"])
+    days = (end - start).days + 1
+    return {
+        "time": [(start + dt.timedelta(days=i)).isoformat() for i in range(days)],
+        "temperature_2m_max": [31.0 + (i % 3) * 0.5 for i in range(days)],
+        "temperature_2m_min": [24.0 + (i % 2) * 0.5 for i in range(days)],
+        "precipitation_sum": [float(i % 5) for i in range(days)],
+    }
+
+def make_stub_request(latency_s: float = 0.0):
+    """Replacement for services.http_client.request with canned Open-Meteo / Frankfurter payloads."""
+    def stub_request(method: str, url: str, timeout=None, params: Optional[dict] = None, **kwargs):
+        if latency_s > 0:
+            time.sleep(latency_s)
+        params = params or {}
+        host, path = urlsplit(url).netloc, urlsplit(url).path
+        if host.startswith("geocoding-api.open-meteo"):
+            return StubResponse(url, 200, {"results": [{"latitude": 6.9271, "longitude": 79.8612}]})
+        if host.startswith("api.open-meteo") and path.endswith("/forecast"):
+            return StubResponse(url, 200, {"daily": _daily(params)})
+        if host.startswith("api.frankfurter"):
+            from services.forex import PUBLISHED, SUPPORTED
+            base = params.get("from", "USD")
+            wanted = set(str(params.get("to", "")).split(","))
+            if base not in PUBLISHED or not wanted <= PUBLISHED:  # like the ECB feed: LKR is unknown
+                return StubResponse(url, 404, {"message": "not found"})
+            rates = {c: round(1.0 + 0.1 * i, 4) for i, c in enumerate(SUPPORTED) if c in wanted}
+            return StubResponse(url, 200, {"base": base, "rates": rates})
+        return StubResponse(url, 404, {})
+    return stub_request
+
+@contextmanager
+def offline(llm_latency_s: float = 0.0, http_latency_s: float = 0.0, llm_jitter_s: float = 0.0,
+            cache_dir: Optional[str] = None, seed: int = 0):
+    from services import forex, http_client, llm, weather
+
+    saved = {
+        "client": llm._client, "get_client": llm.get_client, "request": http_client.request,
+        "cache_dir": settings.cache_dir, "llm_cache": settings.llm_cache_enabled,
+        "weather_conn": weather._conn, "fx_tables": dict(forex._tables),
+    }
+    client = StubOpenAI(llm_latency_s, llm_jitter_s, seed)
+    llm._client = client
+    llm.get_client = lambda: client
+    http_client.request = make_stub_request(http_latency_s)
+    settings.cache_dir = cache_dir or tempfile.mkdtemp(prefix="gh-bench-cache-")
+    settings.llm_cache_enabled = False
+    weather._conn = None
+    forex._tables.clear()
+    try:
+        yield client
+    finally:
+        if weather._conn is not None:
+            weather._conn.close()
+        weather._conn = saved["weather_conn"]
+        forex._tables.clear()
+        forex._tables.update(saved["fx_tables"])
+        llm._client = saved["client"]
+        llm.get_client = saved["get_client"]
+        http_client.request = saved["request"]
+        settings.cache_dir = saved["cache_dir"]
+        settings.llm_cache_enabled = saved["llm_cache"]
@@ -0,0 +1,273 @@
+# benchmarks/suite.py
+"""
+Offline benchmark suite (no OpenAI key, no network; see benchmarks.stubs).
+
+    python -m benchmarks.suite run --out bench.json
+    python -m benchmarks.suite run --only workflow --llm-latency 0.05
+    python -m benchmarks.suite run --out new.json --baseline bench.json --threshold 0.15
+    python -m benchmarks.suite compare bench.json new.json --threshold 0.15
+
+Each case runs at several data sizes (crops in the catalog / plan, rows in the DB).
+workflow.run cases use the configured CROP_PLANNER; the (llm planner) variants force the
+LLM CropAdvisor so its prompt path stays covered whatever the default is.
+A case is timed in rounds of auto-sized loops; the per-call median is compared.
+compare exits 1 when any case got slower than baseline * (1 + threshold)
+by more than --min-delta-us.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+import pandas as pd
+from agents.crop_advisor import CropPlan
+from agents.market_analyst import MarketPlan, analyze_market, compute_market_numbers, load_price_map
+from agents.ops_optimizer import optimize_operations
+from benchmarks import ingest
+from benchmarks.stubs import offline
+from config import settings
+from orchestrator.workflow import run
+from services import catalog
+from services.report import build_pdf
+from services.whatif import apply_what_if
+from storage import db
+
+SIZES = {"full": (4, 40, 400), "quick": (4, 40)}
+DB_ROWS = {"full": (100, 2000, 20000), "quick": (100, 2000)}
+USER_INPUTS = {"location": "Colombo, Sri Lanka", "area": 120.0, "season": "Oct–Dec", "goal": "balanced", "organic": True}
+
+# ---------- fixtures ----------
+
+def write_catalog(directory: str, n: int) -> Tuple[str, str]:
+    """crops.csv / prices.csv with the 4 real crops first, then synthetic ones up to n."""
+    crops = pd.read_csv(catalog.CROPS_PATH)
+    prices = pd.read_csv(catalog.PRICES_PATH)
+    extra = max(0, n - len(crops))
+    if extra:
+        names = [f"Crop{i:04d}" for i in range(extra)]
+        crops = pd.concat([crops, pd.DataFrame({
+            "crop": names,
+            "yield_kg_per_m2": [1.0 + (i % 17) * 0.4 for i in range(extra)],
+            "cycle_days": [30 + (i % 9) * 7 for i in range(extra)],
+            "notes": ["synthetic"] * extra,
+        })], ignore_index=True)
+        prices = pd.concat([prices, pd.DataFrame({
+            "crop": names, "price_usd_per_kg": [1.5 + (i % 13) * 0.75 for i in range(extra)],
+        })], ignore_index=True)
+    crops_path = os.path.join(directory, f"crops_{n}.csv")
+    prices_path = os.path.join(directory, f"prices_{n}.csv")
+    crops.head(n).to_csv(crops_path, index=False)
+    prices.head(n).to_csv(prices_path, index=False)
+    return crops_path, prices_path
+
+def use_catalog(paths: Tuple[str, str]) -> None:
+    catalog.CROPS_PATH, catalog.PRICES_PATH = paths
+
+def make_plan(n_crops: int, area: float = 120.0) -> dict:
+    """A full results dict with n_crops crops, built from the current catalog without the LLM."""
+    view = catalog.crops_catalog()
+    names = view.names[:n_crops]
+    crop_plan = CropPlan(
+        location=USER_INPUTS["location"], greenhouse_area_m2=area, season=USER_INPUTS["season"],
+        crops=[{"name": n, "area_m2": round(area / len(names), 2), "cycle_days": int(view.index[n.lower()]["cycle_days"])} for n in names],
+        rationale="benchmark plan",
+    )
+    weather = {"avg_temp_c": 28.0, "avg_precip_mm": 3.0, "source": "stub"}
+    ops = optimize_operations(crop_plan, {"goal": "balanced", "organic": True}, weather=weather, catalog=view)
+    market = MarketPlan(**compute_market_numbers(ops, load_price_map()), go_to_market=["a", "b", "c"])
+    return {"crop_plan": crop_plan.model_dump(), "ops_plan": ops.model_dump(), "market_plan": market.model_dump(), "weather": weather}
+
+# ---------- timing ----------
+
+def measure(fn: Callable[[], object], rounds: int = 5, min_round_s: float = 0.05) -> dict:
+    """Per-call seconds: loop count is doubled until one round takes >= min_round_s."""
+    fn()  # warm-up (imports, caches, first-connection costs)
+    number = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - t0
+        if elapsed >= min_round_s or number >= 1 << 16:
+            break
+        number *= 2
+    per_call = [elapsed / number]
+    for _ in range(rounds - 1):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - t0) / number)
+    return {
+        "median_s": statistics.median(per_call),
+        "min_s": min(per_call),
+        "stdev_s": statistics.stdev(per_call) if len(per_call) > 1 else 0.0,
+        "loops": number,
+        "rounds": rounds,
+    }
+
+# ---------- cases ----------
+
+def with_planner(planner: str, fn: Callable) -> Callable:
+    """fn with settings.crop_planner set to `planner` for the duration of each call."""
+    def call():
+        saved = settings.crop_planner
+        settings.crop_planner = planner
+        try:
+            return fn()
+        finally:
+            settings.crop_planner = saved
+    return call
+
+def _plan_cases(workdir: str, sizes) -> List[Tuple[str, Callable, Callable[[], None]]]:
+    """(name, fn, setup) for everything that scales with the number of crops."""
+    cases = []
+    for n in sizes:
+        paths = write_catalog(workdir, n)
+        setup = (lambda p: lambda: use_catalog(p))(paths)
+        setup()
+        plan_n = min(n, 40)  # a plan lists at most a few dozen crops; the catalog size still varies
+        plan = make_plan(plan_n)
+        crop_plan = CropPlan(**plan["crop_plan"])
+        ops = optimize_operations(crop_plan, {"goal": "balanced", "organic": True}, weather=plan["weather"])
+        cases += [
+            (f"workflow.run[catalog={n}]", lambda: run(USER_INPUTS, weather={"avg_temp_c": 28.0}), setup),
+            (f"workflow.run+weather[catalog={n}]", lambda: run(USER_INPUTS, fetch_weather=True), setup),
+            (f"workflow.run(llm planner)[catalog={n}]",
+             with_planner("llm", lambda: run(USER_INPUTS, weather={"avg_temp_c": 28.0})), setup),
+            (f"optimize_operations[crops={plan_n}]",
+             (lambda cp, w: lambda: optimize_operations(cp, {"goal": "balanced", "organic": True}, weather=w))(crop_plan, plan["weather"]), setup),
+            (f"analyze_market[crops={plan_n}]", (lambda o: lambda: analyze_market(o))(ops), setup),
+            (f"build_pdf[crops={plan_n}]", (lambda p: lambda: build_pdf(p))(plan), setup),
+            (f"apply_what_if[crops={plan_n}]", (lambda p: lambda: apply_what_if(p, 1.2, 0.1))(plan), setup),
+        ]
+    return cases
+
+def _db_cases(workdir: str, sizes) -> List[Tuple[str, Callable, Callable[[], None]]]:
+    cases = []
+    for rows in sizes:
+        path = os.path.join(workdir, f"bench_{rows}.db")
+        ingest._fresh_db(path, tuning=True)
+        ids = db.save_scenarios((f"bench-{i}", ingest.SAMPLE_INPUTS, ingest.SAMPLE_PLAN) for i in range(rows))
+        setup = (lambda p: lambda: _use_db(p))(path)
+        probe = ids[len(ids) // 2]
+        cases += [
+            (f"db.save_scenario[rows={rows}]", lambda: db.save_scenario("bench-new", ingest.SAMPLE_INPUTS, ingest.SAMPLE_PLAN), setup),
+            (f"db.load_scenario[rows={rows}]", (lambda sid: lambda: db.load_scenario(sid))(probe), setup),
+            (f"db.list_scenarios[rows={rows}]", lambda: db.list_scenarios(limit=50), setup),
+            (f"db.list_scenarios(name)[rows={rows}]", lambda: db.list_scenarios(limit=50, name="bench-1"), setup),
+        ]
+    bulk_path = os.path.join(workdir, "bench_bulk.db")
+    for rows in sizes[:2]:
+        items = [(f"bulk-{i}", ingest.SAMPLE_INPUTS, ingest.SAMPLE_PLAN) for i in range(rows)]
+        cases.append((f"db.save_scenarios[rows={rows}]", (lambda it: lambda: db.save_scenarios(it))(items),
+                      lambda: ingest._fresh_db(bulk_path, tuning=True)))
+    return cases
+
+def _use_db(path: str) -> None:
+    if db._engine is not None:
+        db._engine.dispose()
+    db._engine = None
+    settings.db_url = f"sqlite:///{path}"
+
+def run_suite(mode: str = "full", only: Optional[str] = None, rounds: int = 5,
+              llm_latency_s: float = 0.0, http_latency_s: float = 0.0) -> dict:
+    workdir = tempfile.mkdtemp(prefix="gh-bench-")
+    saved = (catalog.CROPS_PATH, catalog.PRICES_PATH, settings.db_url, settings.sqlite_tuning)
+    results: Dict[str, dict] = {}
+    try:
+        with offline(llm_latency_s=llm_latency_s, http_latency_s=http_latency_s):
+            cases = _plan_cases(workdir, SIZES[mode])
+            use_catalog(saved[:2])
+            cases += _db_cases(workdir, DB_ROWS[mode])
+            for name, fn, setup in cases:
+                if only and only not in name:
+                    continue
+                setup()
+                results[name] = measure(fn, rounds=rounds)
+                print(f"  {name:<44} {results[name]['median_s'] * 1e3:10.3f} ms", file=sys.stderr)
+    finally:
+        catalog.CROPS_PATH, catalog.PRICES_PATH, settings.db_url, settings.sqlite_tuning = saved
+        if db._engine is not None:
+            db._engine.dispose()
+        db._engine = None
+    return {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mode": mode,
+            "crop_planner": settings.crop_planner,
+            "llm_latency_s": llm_latency_s,
+            "http_latency_s": http_latency_s,
+        },
+        "results": results,
+    }
+
+# ---------- comparison ----------
+
+def compare(baseline: dict, current: dict, threshold: float = 0.15, min_delta_s: float = 20e-6) -> Tuple[List[dict], bool]:
+    """Rows for every case present in both runs, and whether any of them regressed."""
+    rows, regressed = [], False
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        ratio = new["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+        slow = ratio > 1 + threshold and new["median_s"] - old["median_s"] > min_delta_s
+        regressed |= slow
+        rows.append({"name": name, "baseline_s": old["median_s"], "current_s": new["median_s"], "ratio": ratio, "regressed": slow})
+    return rows, regressed
+
+def format_comparison(rows: List[dict]) -> str:
+    lines = [f"{'case':<44} {'baseline ms':>12} {'current ms':>12} {'ratio':>7}"]
+    for r in rows:
+        flag = "  REGRESSED" if r["regressed"] else ""
+        lines.append(f"{r['name']:<44} {r['baseline_s'] * 1e3:>12.3f} {r['current_s'] * 1e3:>12.3f} {r['ratio']:>7.2f}{flag}")
+    return "\n".join(lines)
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Offline benchmark suite")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="run the suite")
+    r.add_argument("--out", help="write results JSON here")
+    r.add_argument("--quick", action="store_true", help="smaller sizes")
+    r.add_argument("--only", help="substring filter on case names")
+    r.add_argument("--rounds", type=int, default=5)
+    r.add_argument("--llm-latency", type=float, default=0.0, help="seconds added to every stub LLM call")
+    r.add_argument("--http-latency", type=float, default=0.0, help="seconds added to every stub HTTP call")
+    r.add_argument("--baseline", help="compare against this results JSON after running")
+    c = sub.add_parser("compare", help="compare two results files")
+    c.add_argument("baseline")
+    c.add_argument("current")
+    for p in (r, c):
+        p.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown ratio (0.15 = 15%%)")
+        p.add_argument("--min-delta-us", type=float, default=20.0, help="ignore slowdowns smaller than this")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "run":
+        current = run_suite("quick" if args.quick else "full", args.only, args.rounds, args.llm_latency, args.http_latency)
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as fh:
+                json.dump(current, fh, indent=2)
+        else:
+            print(json.dumps(current, indent=2))
+        if not args.baseline:
+            return 0
+        baseline = _load(args.baseline)
+    else:
+        baseline, current = _load(args.baseline), _load(args.current)
+
+    rows, regressed = compare(baseline, current, args.threshold, args.min_delta_us / 1e6)
+    print(format_comparison(rows), file=sys.stderr)
+    return 1 if regressed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,11 +6,34 @@ load_dotenv()
 
 class Settings(BaseModel):
     openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    openai_base_url: str = os.getenv("OPENAI_BASE_URL", "")  # e.g. a local OpenAI-compatible server; empty = api.openai.com
     weather_provider: str = os.getenv("WEATHER_PROVIDER", "open-meteo")
     market_data_source: str = os.getenv("MARKET_DATA_SOURCE", "csv")
     db_url: str = os.getenv("DB_URL", "sqlite:///greenhouse.db")
+    sqlite_tuning: bool = os.getenv("SQLITE_TUNING", "true").lower() == "true"
+    sqlite_busy_timeout_ms: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "10000"))
     model_small: str = os.getenv("MODEL_SMALL", "gpt-4o-mini")
+    crop_planner: str = os.getenv("CROP_PLANNER", "solver")  # solver (deterministic, ms) | llm
+    solver_llm_rationale: bool = os.getenv("SOLVER_LLM_RATIONALE", "true").lower() == "true"
     log_tokens: bool = os.getenv("LOG_TOKENS", "false").lower() == "true"
+    trace_enabled: bool = os.getenv("TRACE", "false").lower() == "true"
+    trace_path: str = os.getenv("TRACE_PATH", "")  # default: <cache_dir>/traces.ndjson
+    trace_max_mb: float = float(os.getenv("TRACE_MAX_MB", "50"))  # rotated to .1 beyond this
+    metrics_dir: str = os.getenv("METRICS_DIR", "")  # metrics.prom / metrics.json written here after each run
+    singleflight_ttl_s: float = float(os.getenv("SINGLEFLIGHT_TTL_S", "30"))  # identical plans reuse a result this long; 0 = only coalesce in-flight
+    llm_stream: bool = os.getenv("LLM_STREAM", "true").lower() == "true"  # progressive rendering in the UI
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "0"))  # 0 = unlimited
+    artifact_cache_max_entries: int = int(os.getenv("ARTIFACT_CACHE_MAX_ENTRIES", "64"))  # built PDF/JSON/CSV downloads kept in memory
+    cache_dir: str = os.getenv("CACHE_DIR", ".cache")
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE", "true").lower() == "true"
+    llm_cache_ttl_s: float = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+    llm_cache_max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    weather_forecast_ttl_s: float = float(os.getenv("WEATHER_FORECAST_TTL_S", "3600"))
+    fx_ttl_s: float = float(os.getenv("FX_TTL_S", "3600"))
+    http_timeout_s: float = float(os.getenv("HTTP_TIMEOUT_S", "15"))
+    http_retries: int = int(os.getenv("HTTP_RETRIES", "3"))
+    http_backoff_s: float = float(os.getenv("HTTP_BACKOFF_S", "0.3"))
+    http_max_per_host: int = int(os.getenv("HTTP_MAX_PER_HOST", "8"))
 
     auth0_domain: str = os.getenv("AUTH0_DOMAIN", "")
     auth0_client_id: str = os.getenv("AUTH0_CLIENT_ID", "")
@@ -0,0 +1,277 @@
+# orchestrator/batch.py
+"""
+Batch scenario runner around orchestrator.workflow.run.
+
+    python -m orchestrator.batch scenarios.csv --out plans.ndjson --workers 8 --llm-concurrency 4
+    python -m orchestrator.batch scenarios.ndjson --db --prefix "client-a:" --weather
+
+Inputs are CSV or NDJSON rows with location, area, season, goal, organic.
+Each row gets a stable key (hash of its normalized inputs); rows whose key is already
+in the output (NDJSON file or storage.db) are skipped, so a crashed run can simply be restarted.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterable, Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field
+from orchestrator.workflow import run
+from services import llm
+from services.risk import RiskConfig, simulate as simulate_risk
+
+_TRUE = {"1", "true", "yes", "y", "on"}
+
+def normalize_inputs(row: dict) -> dict:
+    organic = row.get("organic", True)
+    if isinstance(organic, str):
+        organic = organic.strip().lower() in _TRUE
+    return {
+        "location": str(row["location"]).strip(),
+        "area": float(row["area"]),
+        "season": str(row.get("season", "")).strip(),
+        "goal": str(row.get("goal") or "balanced").strip(),
+        "organic": bool(organic),
+    }
+
+def input_key(user_inputs: dict) -> str:
+    blob = json.dumps(normalize_inputs(user_inputs), sort_keys=True)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+def _row_key(row) -> str:
+    # key for rows that do not normalize; keeps their error records distinct
+    blob = json.dumps(row, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()[:16]
+
+def read_inputs(path: str) -> Iterator[dict]:
+    """Stream rows from a .csv or .ndjson/.jsonl file."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as fh:
+            for row in csv.DictReader(fh):
+                yield {k.strip().lower(): v for k, v in row.items() if k}
+    else:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+
+def _truncate_torn_tail(path: str, block: int = 1 << 16) -> None:
+    """Cut a file back to its last complete line (a crash mid-write leaves a partial one)."""
+    with open(path, "rb+") as fh:
+        end = pos = fh.seek(0, os.SEEK_END)
+        cut = 0
+        while pos > 0:
+            step = min(block, pos)
+            fh.seek(pos - step)
+            nl = fh.read(step).rfind(b"\n")
+            if nl != -1:
+                cut = pos - step + nl + 1
+                break
+            pos -= step
+        if cut != end:
+            fh.truncate(cut)
+
+class NdjsonSink:
+    """Appends one line per finished scenario; existing successful lines count as done."""
+    def __init__(self, path: str):
+        self.path = path
+        self._fh = None
+
+    def done_keys(self) -> set:
+        keys = set()
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        rec = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from a crash
+                    if "result" in rec:
+                        keys.add(rec["key"])
+        return keys
+
+    def write(self, key: str, inputs: dict, result: Optional[dict], error: Optional[str]) -> None:
+        if self._fh is None:
+            if os.path.exists(self.path):
+                # done_keys skipped the torn line, so its scenario is re-run and written below
+                _truncate_torn_tail(self.path)
+            self._fh = open(self.path, "a", encoding="utf-8")
+        rec = {"key": key, "inputs": inputs}
+        if error is None:
+            rec["result"] = result
+        else:
+            rec["error"] = error
+        self._fh.write(json.dumps(rec) + "\n")
+        self._fh.flush()
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+class DbSink:
+    """Saves each successful plan as a scenario named `<prefix><key>`."""
+    def __init__(self, prefix: str = "batch:"):
+        from storage.db import init_db
+        self.prefix = prefix
+        init_db()
+
+    def done_keys(self) -> set:
+        from storage.db import scenario_names
+        return {n[len(self.prefix):] for n in scenario_names(self.prefix)}
+
+    def write(self, key: str, inputs: dict, result: Optional[dict], error: Optional[str]) -> None:
+        from storage.db import save_scenario
+        if error is None:
+            save_scenario(f"{self.prefix}{key}", inputs, result)
+
+    def close(self) -> None:
+        pass
+
+class BatchReport(BaseModel):
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed_s: float = 0.0
+    plans_per_min: float = 0.0
+    latency_s: Dict[str, Dict[str, float]] = Field(default_factory=dict)  # stage -> {p50, p95}
+    errors: List[str] = Field(default_factory=list)
+
+def _percentiles(samples: Dict[str, List[float]]) -> Dict[str, Dict[str, float]]:
+    out = {}
+    for name, values in samples.items():
+        arr = np.asarray(values, dtype=float)
+        out[name] = {
+            "p50": round(float(np.percentile(arr, 50)), 4),
+            "p95": round(float(np.percentile(arr, 95)), 4),
+        }
+    return out
+
+def run_batch(
+    rows: Iterable[dict],
+    sink,
+    workers: int = 4,
+    llm_concurrency: Optional[int] = None,
+    fetch_weather: bool = False,
+    pricing_df: Optional[pd.DataFrame] = None,
+    risk: Optional[RiskConfig] = None,
+) -> BatchReport:
+    """
+    Run the workflow for every row with `workers` threads, writing results to `sink`
+    as they complete. `llm_concurrency` caps in-flight OpenAI calls across all workers.
+    With `risk`, each result also gets a Monte Carlo summary under result["risk"].
+    """
+    if llm_concurrency:
+        llm.set_max_concurrency(llm_concurrency)
+
+    report = BatchReport()
+    samples: Dict[str, List[float]] = {}
+    seen = sink.done_keys()
+    t0 = time.perf_counter()
+
+    def job(inputs: dict) -> dict:
+        result = run(inputs, pricing_df=pricing_df, fetch_weather=fetch_weather)
+        if risk is not None:
+            result["risk"] = simulate_risk(result, risk).as_dict()
+        return result
+
+    def collect(fut, key, inputs):
+        try:
+            result = fut.result()
+        except Exception as e:
+            report.failed += 1
+            report.errors.append(f"{key}: {e}")
+            sink.write(key, inputs, None, str(e))
+            return
+        report.completed += 1
+        meta = result.get("_meta", {})
+        samples.setdefault("total", []).append(meta.get("elapsed_s", 0.0))
+        for name, t in meta.get("stages", {}).items():
+            samples.setdefault(name, []).append(t["elapsed_s"])
+        sink.write(key, inputs, result, None)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            inflight = {}
+            for row in rows:
+                try:
+                    inputs = normalize_inputs(row)
+                    key = input_key(inputs)
+                except Exception as e:
+                    key = _row_key(row)
+                    report.failed += 1
+                    report.errors.append(f"{key}: invalid row: {e!r}")
+                    sink.write(key, row, None, f"invalid row: {e!r}")
+                    continue
+                if key in seen:
+                    report.skipped += 1
+                    continue
+                seen.add(key)
+                inflight[pool.submit(job, inputs)] = (key, inputs)
+                # keep the input stream lazy: never queue more than 2x workers
+                while len(inflight) >= workers * 2:
+                    finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                    for fut in finished:
+                        collect(fut, *inflight.pop(fut))
+            while inflight:
+                finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    collect(fut, *inflight.pop(fut))
+    finally:
+        sink.close()
+
+    report.elapsed_s = round(time.perf_counter() - t0, 3)
+    if report.elapsed_s > 0:
+        report.plans_per_min = round(report.completed / report.elapsed_s * 60.0, 2)
+    report.latency_s = _percentiles(samples)
+    return report
+
+def format_report(report: BatchReport) -> str:
+    lines = [
+        f"completed={report.completed} failed={report.failed} skipped={report.skipped} "
+        f"elapsed={report.elapsed_s}s throughput={report.plans_per_min} plans/min",
+        f"{'stage':<16}{'p50 (s)':>10}{'p95 (s)':>10}",
+    ]
+    for name, q in report.latency_s.items():
+        lines.append(f"{name:<16}{q['p50']:>10.4f}{q['p95']:>10.4f}")
+    for err in report.errors[:10]:
+        lines.append(f"error: {err}")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Run GreenHouseAI plans for many scenarios.")
+    ap.add_argument("inputs", help="CSV or NDJSON file of user_inputs")
+    ap.add_argument("--out", help="NDJSON output file (appended; used for resume)")
+    ap.add_argument("--db", action="store_true", help="save plans into storage.db instead of NDJSON")
+    ap.add_argument("--prefix", default="batch:", help="scenario name prefix when using --db")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--llm-concurrency", type=int, default=None, help="max in-flight OpenAI calls")
+    ap.add_argument("--weather", action="store_true", help="fetch weather for each location")
+    ap.add_argument("--prices", help="custom prices CSV (crop, price_usd_per_kg)")
+    ap.add_argument("--risk-draws", type=int, default=0, help="Monte Carlo draws per plan (0 = skip risk)")
+    ap.add_argument("--risk-seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    if not args.db and not args.out:
+        ap.error("one of --out or --db is required")
+    sink = DbSink(args.prefix) if args.db else NdjsonSink(args.out)
+    pricing_df = pd.read_csv(args.prices) if args.prices else None
+
+    report = run_batch(
+        read_inputs(args.inputs),
+        sink,
+        workers=args.workers,
+        llm_concurrency=args.llm_concurrency,
+        fetch_weather=args.weather,
+        pricing_df=pricing_df,
+        risk=RiskConfig(draws=args.risk_draws, seed=args.risk_seed) if args.risk_draws > 0 else None,
+    )
+    print(format_report(report))
+    return 1 if report.failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+# orchestrator/dag.py
+import asyncio
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from services import tracing
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One unit of work in the workflow.
+    `fn` is called with keyword arguments named after `inputs` (context keys);
+    its return value is stored in the context under `output` (defaults to `name`).
+    """
+    name: str
+    fn: Callable[..., Any]
+    inputs: Tuple[str, ...] = ()
+    output: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return self.output or self.name
+
+def _dependencies(stages: List[Stage], initial: Dict[str, Any]) -> Dict[str, set]:
+    """Map stage name -> names of stages it waits on. Validates keys and cycles."""
+    producers: Dict[str, str] = {}
+    for s in stages:
+        if s.key in producers or s.key in initial:
+            raise ValueError(f"Context key '{s.key}' produced more than once")
+        producers[s.key] = s.name
+
+    deps: Dict[str, set] = {}
+    for s in stages:
+        deps[s.name] = set()
+        for key in s.inputs:
+            if key in producers:
+                deps[s.name].add(producers[key])
+            elif key not in initial:
+                raise ValueError(f"Stage '{s.name}' needs '{key}' which nothing provides")
+
+    # Kahn's algorithm, only to reject cycles up front
+    remaining = {name: set(d) for name, d in deps.items()}
+    while remaining:
+        ready = [name for name, d in remaining.items() if not d]
+        if not ready:
+            raise ValueError(f"Cycle between stages: {sorted(remaining)}")
+        for name in ready:
+            remaining.pop(name)
+        for d in remaining.values():
+            d.difference_update(ready)
+    return deps
+
+def _run_stage(stage: Stage, kwargs: Dict[str, Any], t0: float):
+    start = time.perf_counter() - t0
+    with tracing.span(f"stage.{stage.name}"):
+        result = stage.fn(**kwargs)
+    end = time.perf_counter() - t0
+    return result, start, end
+
+def _timing(start: float, end: float) -> dict:
+    return {"start_s": round(start, 4), "end_s": round(end, 4), "elapsed_s": round(end - start, 4)}
+
+def execute(stages: List[Stage], initial: Optional[Dict[str, Any]] = None, max_workers: Optional[int] = None,
+            on_done: Optional[Callable[[str, Any], None]] = None):
+    """
+    Run stages on a thread pool as soon as their inputs are available.
+    Each stage runs in a copy of the caller's contextvars (so trace spans nest under the caller's).
+    Returns (context, timings) where timings maps stage name -> start/end/elapsed seconds.
+    on_done(stage_name, result) is called from the calling thread as each stage finishes.
+    """
+    ctx: Dict[str, Any] = dict(initial or {})
+    deps = _dependencies(stages, ctx)
+    pending = {s.name: s for s in stages}
+    done: set = set()
+    timings: Dict[str, dict] = {}
+    t0 = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers or max(1, len(stages))) as pool:
+        running = {}
+        while pending or running:
+            for name in [n for n in pending if deps[n] <= done]:
+                stage = pending.pop(name)
+                kwargs = {k: ctx[k] for k in stage.inputs}
+                running[pool.submit(contextvars.copy_context().run, _run_stage, stage, kwargs, t0)] = stage
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                stage = running.pop(fut)
+                try:
+                    result, start, end = fut.result()
+                except Exception:
+                    for other in running:
+                        other.cancel()
+                    raise
+                ctx[stage.key] = result
+                timings[stage.name] = _timing(start, end)
+                done.add(stage.name)
+                if on_done is not None:
+                    on_done(stage.name, result)
+    return ctx, timings
+
+async def execute_async(stages: List[Stage], initial: Optional[Dict[str, Any]] = None,
+                        on_done: Optional[Callable[[str, Any], None]] = None):
+    """
+    asyncio flavour of `execute`. Coroutine functions are awaited directly,
+    plain functions run in the default executor via `asyncio.to_thread`.
+    on_done is called on the event loop as each stage finishes.
+    """
+    ctx: Dict[str, Any] = dict(initial or {})
+    deps = _dependencies(stages, ctx)
+    by_name = {s.name: s for s in stages}
+    timings: Dict[str, dict] = {}
+    tasks: Dict[str, asyncio.Task] = {}
+    t0 = time.perf_counter()
+
+    async def run_one(stage: Stage):
+        if deps[stage.name]:
+            await asyncio.gather(*(tasks[d] for d in deps[stage.name]))
+        kwargs = {k: ctx[k] for k in stage.inputs}
+        start = time.perf_counter() - t0
+        with tracing.span(f"stage.{stage.name}"):
+            if asyncio.iscoroutinefunction(stage.fn):
+                result = await stage.fn(**kwargs)
+            else:
+                result = await asyncio.to_thread(stage.fn, **kwargs)
+        end = time.perf_counter() - t0
+        ctx[stage.key] = result
+        timings[stage.name] = _timing(start, end)
+        if on_done is not None:
+            on_done(stage.name, result)
+
+    # create tasks in dependency order so every awaited task already exists
+    created: set = set()
+    while len(created) < len(stages):
+        for name, d in deps.items():
+            if name not in created and d <= created:
+                tasks[name] = asyncio.create_task(run_one(by_name[name]))
+                created.add(name)
+
+    try:
+        await asyncio.gather(*tasks.values())
+    except Exception:
+        for t in tasks.values():
+            t.cancel()
+        raise
+    return ctx, timings
+
+def critical_path(stages: List[Stage], timings: Dict[str, dict]) -> List[str]:
+    """Walk back from the last stage to finish, always through the latest-finishing dependency."""
+    if not timings:
+        return []
+    producers = {s.key: s.name for s in stages}
+    by_name = {s.name: s for s in stages}
+    current = max(timings, key=lambda n: timings[n]["end_s"])
+    path = [current]
+    while True:
+        preds = [producers[k] for k in by_name[current].inputs if k in producers]
+        if not preds:
+            break
+        current = max(preds, key=lambda n: timings[n]["end_s"])
+        path.append(current)
+    return list(reversed(path))
@@ -0,0 +1,129 @@
+# orchestrator/singleflight.py
+"""
+Process-wide single-flight around orchestrator.workflow.run.
+
+    results = run_coalesced(user_inputs, pricing_df=df, fetch_weather=True)
+
+Calls are keyed on the normalized inputs plus a fingerprint of the weather / pricing
+they would use (and the planner settings that change the answer):
+- the first caller (leader) runs the workflow;
+- identical calls arriving while it runs wait for it and share its result (coalesced);
+- identical calls within SINGLEFLIGHT_TTL_S of it finishing get the memoized result (memo).
+Failures are shared with the waiters but never memoized. Every caller gets its own deep
+copy of the result, with result["_meta"]["singleflight"] set to leader / coalesced / memo.
+Counts land in metrics as plan_requests_total{result=...}; stats() returns them too.
+"""
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+import pandas as pd
+from config import settings
+from orchestrator.batch import normalize_inputs
+from orchestrator.workflow import EventCallback, run
+from services import metrics
+
+def pricing_fingerprint(pricing_df: Optional[pd.DataFrame]) -> str:
+    if pricing_df is None:
+        return ""
+    rows = pd.util.hash_pandas_object(pricing_df, index=False).values.tobytes()
+    cols = "|".join(map(str, pricing_df.columns)).encode("utf-8")
+    return hashlib.sha1(cols + rows).hexdigest()[:16]
+
+def plan_key(user_inputs: dict, weather: Optional[dict] = None, pricing_df: Optional[pd.DataFrame] = None,
+             fetch_weather: bool = False) -> str:
+    blob = json.dumps({
+        "inputs": normalize_inputs(user_inputs),
+        # explicit weather wins over fetching; a fetched forecast is keyed by location (already in inputs)
+        "weather": weather if weather is not None else ("fetch" if fetch_weather else None),
+        "prices": pricing_fingerprint(pricing_df),
+        "planner": [settings.crop_planner, settings.model_small],
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[dict] = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    def __init__(self, ttl_s: float = 30.0, max_entries: int = 256):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, _Call] = {}
+        self._memo: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, result)
+        self._stats = {"leader": 0, "coalesced": 0, "memo": 0}
+
+    def _count(self, kind: str) -> None:
+        self._stats[kind] += 1  # under self._lock
+        metrics.inc("plan_requests_total", result=kind)
+
+    def do(self, key: str, fn: Callable[[], dict]) -> dict:
+        with self._lock:
+            hit = self._memo.get(key)
+            if hit is not None and hit[0] > time.monotonic():
+                self._memo.move_to_end(key)
+                self._count("memo")
+                return self._share(hit[1], "memo")
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+            self._count("leader" if leader else "coalesced")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return self._share(call.result, "coalesced")
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if call.error is None and self.ttl_s > 0:
+                    self._memo[key] = (time.monotonic() + self.ttl_s, call.result)
+                    self._memo.move_to_end(key)
+                    while len(self._memo) > self.max_entries:
+                        self._memo.popitem(last=False)
+            call.done.set()
+        return self._share(call.result, "leader")
+
+    @staticmethod
+    def _share(result: dict, kind: str) -> dict:
+        out = copy.deepcopy(result)
+        out.setdefault("_meta", {})["singleflight"] = kind
+        return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "inflight": len(self._inflight), "memoized": len(self._memo)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memo.clear()
+
+GROUP = SingleFlight(settings.singleflight_ttl_s)
+
+def run_coalesced(user_inputs: dict, weather: Optional[dict] = None, pricing_df: Optional[pd.DataFrame] = None,
+                  fetch_weather: bool = False, on_event: Optional[EventCallback] = None) -> dict:
+    """
+    workflow.run through the process-wide single-flight group.
+    Only the leader's on_event sees streamed fields; coalesced and memoized callers
+    just get the finished result.
+    """
+    key = plan_key(user_inputs, weather=weather, pricing_df=pricing_df, fetch_weather=fetch_weather)
+    return GROUP.do(key, lambda: run(user_inputs, weather=weather, pricing_df=pricing_df,
+                                     fetch_weather=fetch_weather, on_event=on_event))
+
+def stats() -> dict:
+    return GROUP.stats()
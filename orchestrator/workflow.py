@@ -1,23 +1,132 @@
 # orchestrator/workflow.py
-from typing import Optional
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
 import pandas as pd
-from agents.crop_advisor import generate_crop_plan
+from agents.crop_advisor import CropPlan, explain_crop_plan, generate_crop_plan
+from agents.crop_solver import solve_crop_plan
 from agents.ops_optimizer import optimize_operations
-from agents.market_analyst import analyze_market
+from agents.market_analyst import MarketPlan, compute_market_numbers, suggest_go_to_market, load_price_map
+from orchestrator.dag import Stage, execute, execute_async, critical_path
+from services.weather import get_weather_summary
+from services.catalog import crops_catalog
+from config import settings
+from services import metrics, tracing
 
-def run(user_inputs: dict, weather: Optional[dict] = None, pricing_df: Optional[pd.DataFrame] = None) -> dict:
+# on_event(stage, path, value): path is a tuple into a streamed LLM field, e.g. ("crops", 0),
+# or () when the stage has finished and value is its full result.
+EventCallback = Callable[[str, tuple, Any], None]
+
+def build_stages(user_inputs: dict, weather: Optional[dict] = None, pricing_df: Optional[pd.DataFrame] = None,
+                 fetch_weather: bool = False, on_event: Optional[EventCallback] = None) -> List[Stage]:
     """
-    1) CropAdvisor -> CropPlan (uses weather if provided)
-    2) OpsOptimizer -> OpsPlan (uses weather if provided)
-    3) MarketAnalyst -> MarketPlan (uses pricing_df if provided)
+    Workflow as a stage DAG:
+      catalog, weather[, prices]  -> crop_plan
+      crop_plan, catalog, weather -> ops_plan
+      ops_plan, prices            -> market_numbers (revenue / COGS / margin)
+      ops_plan                    -> go_to_market (LLM)
+      market_numbers, go_to_market -> market_plan
+    catalog, prices and weather have no inputs and start together; the MarketAnalyst
+    LLM call overlaps with the deterministic revenue/COGS math.
+    With CROP_PLANNER=solver (default) the crop plan comes from agents.crop_solver in
+    milliseconds with a template rationale; see refine_rationale for the LLM rewrite.
+    With `on_event`, the LLM stages stream and report fields as they complete.
     """
-    crop_plan = generate_crop_plan(user_inputs, weather=weather)
-    ops_plan = optimize_operations(crop_plan, {"goal": user_inputs["goal"], "organic": user_inputs["organic"]}, weather=weather)
-    market_plan = analyze_market(ops_plan, pricing_source="csv", pricing_df=pricing_df)
+    prefs = {"goal": user_inputs["goal"], "organic": user_inputs["organic"]}
+
+    def fields_of(stage: str):
+        if on_event is None:
+            return None
+        return lambda path, value: on_event(stage, path, value)
+
+    def load_weather():
+        if weather is not None:
+            return weather
+        if fetch_weather:
+            return get_weather_summary(str(user_inputs["location"]))
+        return None
 
+    if settings.crop_planner == "llm":
+        crop_stage = Stage("crop_plan", lambda catalog, weather: generate_crop_plan(user_inputs, weather=weather, catalog=catalog,
+                                                                                     on_field=fields_of("crop_plan")),
+                           inputs=("catalog", "weather"))
+    else:
+        crop_stage = Stage("crop_plan", lambda catalog, weather, price_map: solve_crop_plan(user_inputs, weather, catalog, price_map),
+                           inputs=("catalog", "weather", "price_map"))
+
+    stages = [
+        Stage("catalog", crops_catalog),
+        Stage("prices", lambda: load_price_map(pricing_df), output="price_map"),
+        Stage("weather", load_weather),
+        crop_stage,
+        Stage("ops_plan", lambda crop_plan, catalog, weather: optimize_operations(crop_plan, prefs, weather=weather, catalog=catalog),
+              inputs=("crop_plan", "catalog", "weather")),
+        Stage("market_numbers", compute_market_numbers, inputs=("ops_plan", "price_map")),
+        Stage("go_to_market", lambda ops_plan: suggest_go_to_market(ops_plan, on_field=fields_of("go_to_market")),
+              inputs=("ops_plan",)),
+        Stage("market_plan", lambda market_numbers, go_to_market: MarketPlan(**market_numbers, go_to_market=go_to_market),
+              inputs=("market_numbers", "go_to_market")),
+    ]
+    return stages
+
+def _assemble(stages: List[Stage], ctx: dict, timings: dict, elapsed: float) -> dict:
+    for name, t in timings.items():
+        metrics.observe("stage_seconds", t["elapsed_s"], stage=name)
+    metrics.observe("workflow_seconds", elapsed)
+    metrics.export()
     return {
-        "crop_plan": crop_plan.model_dump(),
-        "ops_plan": ops_plan.model_dump(),
-        "market_plan": market_plan.model_dump(),
-        "weather": weather or {},
+        "crop_plan": ctx["crop_plan"].model_dump(),
+        "ops_plan": ctx["ops_plan"].model_dump(),
+        "market_plan": ctx["market_plan"].model_dump(),
+        "weather": ctx["weather"] or {},
+        "_meta": {
+            "elapsed_s": round(elapsed, 4),
+            "stages": timings,
+            "critical_path": critical_path(stages, timings),
+        },
     }
+
+def _stage_done(on_event: Optional[EventCallback]):
+    if on_event is None:
+        return None
+    return lambda name, result: on_event(name, (), result)
+
+def run(user_inputs: dict, weather: Optional[dict] = None, pricing_df: Optional[pd.DataFrame] = None,
+        fetch_weather: bool = False, on_event: Optional[EventCallback] = None) -> dict:
+    """
+    1) CropAdvisor -> CropPlan (solver or LLM per CROP_PLANNER; uses weather if provided,
+       or fetched when fetch_weather=True)
+    2) OpsOptimizer -> OpsPlan (uses weather if provided)
+    3) MarketAnalyst -> MarketPlan (uses pricing_df if provided)
+    Independent stages run concurrently; per-stage timings land in result["_meta"].
+    on_event receives streamed LLM fields (from worker threads) and stage completions.
+    """
+    stages = build_stages(user_inputs, weather=weather, pricing_df=pricing_df, fetch_weather=fetch_weather, on_event=on_event)
+    t0 = time.perf_counter()
+    with tracing.span("workflow.run", location=str(user_inputs.get("location", ""))):
+        ctx, timings = execute(stages, on_done=_stage_done(on_event))
+    return _assemble(stages, ctx, timings, time.perf_counter() - t0)
+
+async def run_async(user_inputs: dict, weather: Optional[dict] = None, pricing_df: Optional[pd.DataFrame] = None,
+                    fetch_weather: bool = False, on_event: Optional[EventCallback] = None) -> dict:
+    """Same as `run`, for callers already inside an event loop."""
+    stages = build_stages(user_inputs, weather=weather, pricing_df=pricing_df, fetch_weather=fetch_weather, on_event=on_event)
+    t0 = time.perf_counter()
+    with tracing.span("workflow.run_async", location=str(user_inputs.get("location", ""))):
+        ctx, timings = await execute_async(stages, on_done=_stage_done(on_event))
+    return _assemble(stages, ctx, timings, time.perf_counter() - t0)
+
+_rationale_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rationale")  # threads start on first submit
+
+def refine_rationale(results: dict, user_inputs: dict,
+                     on_field: Optional[Callable[[tuple, Any], None]] = None) -> Optional[Future]:
+    """
+    LLM rewrite of a solver plan's template rationale, off the workflow's critical path:
+    returns a Future resolving to the new text (the template on any LLM error), or None when
+    the plan came from the LLM planner or SOLVER_LLM_RATIONALE is off. `results` is not modified.
+    """
+    if settings.crop_planner == "llm" or not settings.solver_llm_rationale:
+        return None
+    plan = CropPlan(**results["crop_plan"])
+    weather = results.get("weather") or None
+    return _rationale_pool.submit(explain_crop_plan, plan, user_inputs, weather, on_field)
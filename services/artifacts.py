@@ -0,0 +1,112 @@
+# services/artifacts.py
+"""
+Download artifacts (PDF report, JSON, CSVs) built on demand and memoized per plan.
+
+    fp = plan_fingerprint(results)
+    data = peek(fp, "pdf")                # bytes if already built, else None (never builds)
+    data = get(results, "pdf", fp)        # builds once per fingerprint; waits for a running prefetch
+    prefetch(results)                     # build every kind on a background thread
+
+Entries are keyed on (fingerprint, kind) in a bounded LRU (ARTIFACT_CACHE_MAX_ENTRIES);
+concurrent requests for the same entry share one build.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, NamedTuple, Optional
+import pandas as pd
+from config import settings
+from services import metrics, tracing
+from services.report import build_pdf
+
+class Artifact(NamedTuple):
+    build: Callable[[dict], bytes]
+    file_name: str
+    mime: str
+
+KINDS: Dict[str, Artifact] = {
+    "json": Artifact(lambda plan: json.dumps(plan, indent=2).encode("utf-8"), "greenhouse_plan.json", "application/json"),
+    "crops_csv": Artifact(lambda plan: pd.DataFrame(plan["crop_plan"]["crops"]).to_csv(index=False).encode("utf-8"),
+                          "crop_plan.csv", "text/csv"),
+    "ops_csv": Artifact(lambda plan: pd.DataFrame(plan["ops_plan"]["crops"]).to_csv(index=False).encode("utf-8"),
+                        "ops_plan.csv", "text/csv"),
+    "pdf": Artifact(build_pdf, "greenhouse_strategy.pdf", "application/pdf"),
+}
+
+def plan_fingerprint(plan: dict) -> str:
+    blob = json.dumps(plan, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+class ArtifactCache:
+    def __init__(self, max_entries: int = 64, workers: int = 2):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[tuple, bytes]" = OrderedDict()
+        self._building: Dict[tuple, Future] = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="artifacts")
+
+    def peek(self, fp: str, kind: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._data.get((fp, kind))
+            if data is not None:
+                self._data.move_to_end((fp, kind))
+            return data
+
+    def _build(self, key: tuple, plan: dict) -> bytes:
+        try:
+            with tracing.span("artifacts.build", kind=key[1]):
+                data = KINDS[key[1]].build(plan)
+            metrics.inc("artifact_builds_total", kind=key[1])
+            with self._lock:
+                self._data[key] = data
+                self._data.move_to_end(key)
+                while len(self._data) > self.max_entries:
+                    self._data.popitem(last=False)
+            return data
+        finally:
+            with self._lock:
+                self._building.pop(key, None)
+
+    def _submit(self, plan: dict, kind: str, fp: str) -> Future:
+        """Future for (fp, kind): a finished one on a hit, the running build, or a newly queued build."""
+        key = (fp, kind)
+        with self._lock:
+            data = self._data.get(key)
+            if data is not None:
+                self._data.move_to_end(key)
+                metrics.inc("artifact_cache_total", result="hit")
+                done: Future = Future()
+                done.set_result(data)
+                return done
+            fut = self._building.get(key)
+            if fut is None:
+                metrics.inc("artifact_cache_total", result="miss")
+                fut = self._building[key] = self._pool.submit(self._build, key, plan)
+            return fut
+
+    def get(self, plan: dict, kind: str, fp: Optional[str] = None) -> bytes:
+        return self._submit(plan, kind, fp or plan_fingerprint(plan)).result()
+
+    def prefetch(self, plan: dict, kinds: Optional[Iterable[str]] = None, fp: Optional[str] = None) -> str:
+        """Queue background builds for any missing kinds; returns the fingerprint."""
+        fp = fp or plan_fingerprint(plan)
+        for kind in kinds or KINDS:
+            self._submit(plan, kind, fp)
+        return fp
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+CACHE = ArtifactCache(settings.artifact_cache_max_entries)
+
+def peek(fp: str, kind: str) -> Optional[bytes]:
+    return CACHE.peek(fp, kind)
+
+def get(plan: dict, kind: str, fp: Optional[str] = None) -> bytes:
+    return CACHE.get(plan, kind, fp)
+
+def prefetch(plan: dict, kinds: Optional[Iterable[str]] = None, fp: Optional[str] = None) -> str:
+    return CACHE.prefetch(plan, kinds, fp)
@@ -1,6 +1,6 @@
 import os, time, json, base64, hashlib
 import secrets
-import requests
+from services import http_client
 from urllib.parse import urlencode
 from jose import jwt
 from jose.utils import base64url_decode
@@ -45,7 +45,7 @@ def exchange_code_for_tokens(code: str) -> dict:
         "code": code,
         "redirect_uri": REDIRECT_URI,
     }
-    resp = requests.post(_auth0_base("/oauth/token"), data=data, timeout=15)
+    resp = http_client.post(_auth0_base("/oauth/token"), data=data)
     resp.raise_for_status()
     return resp.json()  # contains access_token, id_token, token_type, expires_in
 
@@ -57,7 +57,9 @@ def _get_jwks() -> dict:
     global _JWKS_CACHE, _JWKS_TS
     if _JWKS_CACHE and time.time() - _JWKS_TS < 3600:
         return _JWKS_CACHE
-    jwks = requests.get(_auth0_base("/.well-known/jwks.json"), timeout=10).json()
+    resp = http_client.get(_auth0_base("/.well-known/jwks.json"))
+    resp.raise_for_status()
+    jwks = resp.json()
     _JWKS_CACHE = jwks
     _JWKS_TS = time.time()
     return jwks
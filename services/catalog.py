@@ -0,0 +1,103 @@
+# services/catalog.py
+"""
+Shared in-process registry for the crop catalog and the price table.
+
+Each CSV is parsed once and re-parsed only when its mtime/size changes *and* its
+content hash differs. Agents get immutable views with a lowercase-name index.
+"""
+import hashlib
+import os
+import threading
+from io import BytesIO
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+import pandas as pd
+from services import tracing
+
+CROPS_PATH = "data/crops.csv"
+PRICES_PATH = "data/prices.csv"
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    return df
+
+class TableView:
+    """Read-only view of one normalized CSV, indexed by lowercase `key_col`."""
+    def __init__(self, df: pd.DataFrame, key_col: str, digest: str = ""):
+        self.key_col = key_col
+        self.digest = digest
+        self.columns: Tuple[str, ...] = tuple(df.columns)
+        rows = []
+        index: Dict[str, Mapping[str, Any]] = {}
+        if key_col in df.columns:
+            for rec in df.to_dict("records"):
+                rec[key_col] = str(rec[key_col]).strip()
+                row = MappingProxyType(rec)
+                rows.append(row)
+                index[rec[key_col].lower()] = row
+        self.rows: Tuple[Mapping[str, Any], ...] = tuple(rows)
+        self.index: Mapping[str, Mapping[str, Any]] = MappingProxyType(index)
+        self.names: Tuple[str, ...] = tuple(sorted({r[key_col] for r in rows}))
+        self._columns_cache: Dict[str, Mapping[str, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, name: str) -> bool:
+        return name.strip().lower() in self.index
+
+    def get(self, name: str, default=None):
+        return self.index.get(name.strip().lower(), default)
+
+    def numeric(self, col: str) -> Mapping[str, float]:
+        """lowercase name -> float(col), built once per view."""
+        cached = self._columns_cache.get(col)
+        if cached is None:
+            cached = MappingProxyType({k: float(r[col]) for k, r in self.index.items() if col in r})
+            self._columns_cache[col] = cached
+        return cached
+
+    def frame(self) -> pd.DataFrame:
+        """Fresh DataFrame copy for callers that want pandas."""
+        return pd.DataFrame([dict(r) for r in self.rows], columns=list(self.columns))
+
+class _Entry:
+    __slots__ = ("stamp", "view")
+
+    def __init__(self, stamp, view):
+        self.stamp = stamp
+        self.view = view
+
+_lock = threading.Lock()
+_entries: Dict[Tuple[str, str], _Entry] = {}
+
+def get_view(path: str, key_col: str) -> TableView:
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        entry = _entries.get((path, key_col))
+        if entry is not None and entry.stamp == stamp:
+            return entry.view
+
+        with open(path, "rb") as fh:
+            raw = fh.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        if entry is not None and entry.view.digest == digest:
+            entry.stamp = stamp  # touched, not changed
+            return entry.view
+
+        with tracing.span("catalog.parse", path=path, bytes=len(raw)):
+            view = TableView(normalize_frame(pd.read_csv(BytesIO(raw))), key_col, digest)
+        _entries[(path, key_col)] = _Entry(stamp, view)
+        return view
+
+def crops_catalog(path: Optional[str] = None) -> TableView:
+    return get_view(path or CROPS_PATH, "crop")
+
+def price_table(path: Optional[str] = None) -> TableView:
+    return get_view(path or PRICES_PATH, "crop")
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
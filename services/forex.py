@@ -1,20 +1,145 @@
 # services/forex.py
-from typing import Dict
-import requests
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+from config import settings
+from services import http_client, tracing
 
 SUPPORTED = ["USD", "EUR", "GBP", "LKR", "AUD", "CAD", "JPY", "INR", "SGD"]
+FRANKFURTER_URL = "https://api.frankfurter.app/latest"
+# currencies in the ECB reference feed behind Frankfurter; other SUPPORTED codes (LKR) are never requested
+PUBLISHED = frozenset({
+    "AUD", "BGN", "BRL", "CAD", "CHF", "CNY", "CZK", "DKK", "EUR", "GBP", "HKD", "HUF", "IDR", "ILS", "INR", "ISK",
+    "JPY", "KRW", "MXN", "MYR", "NOK", "NZD", "PHP", "PLN", "RON", "SEK", "SGD", "THB", "TRY", "USD", "ZAR",
+})
+
+class RateUnavailable(LookupError):
+    """The rate table has no rate for a currency (the source does not publish it)."""
+
+class RateTable(BaseModel):
+    """1 base -> rates[code] for every SUPPORTED currency the source publishes (base itself = 1.0)."""
+    base: str
+    rates: Dict[str, float]
+    fetched_at: float
+    source: str = "live"  # live | cache | stale
+
+    def lookup(self, code: str) -> float:
+        """1 table base -> `code`; RateUnavailable if the table has no such rate."""
+        try:
+            return self.rates[code.upper()]
+        except KeyError:
+            raise RateUnavailable(f"no {self.base} -> {code.upper()} rate (not published by the FX source)") from None
+
+    def rate(self, target: str, base: Optional[str] = None) -> float:
+        """Rate to convert 1 `base` (default: table base) -> `target`, crossing through the table base."""
+        return self.lookup(target) / self.lookup(base or self.base)
+
+_lock = threading.Lock()  # guards _tables, _fetch_locks and the disk cache; never held over the network
+_tables: Dict[str, RateTable] = {}
+_fetch_locks: Dict[str, threading.Lock] = {}  # one per base: concurrent refreshes share one request
+
+def _cache_path() -> str:
+    return os.path.join(settings.cache_dir, "fx_rates.json")
+
+def _read_disk() -> Dict[str, dict]:
+    try:
+        with open(_cache_path(), encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return {}
+
+def _write_disk(table: RateTable) -> None:
+    data = _read_disk()
+    data[table.base] = table.model_dump(exclude={"source"})
+    os.makedirs(settings.cache_dir, exist_ok=True)
+    tmp = _cache_path() + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(data, fh)
+    os.replace(tmp, _cache_path())
+
+@tracing.traced("forex.fetch")
+def _fetch(base: str) -> RateTable:
+    # one unpublished code would make the API reject the whole request
+    targets = [c for c in SUPPORTED if c != base and c in PUBLISHED]
+    r = http_client.get(FRANKFURTER_URL, params={"from": base, "to": ",".join(targets)})
+    r.raise_for_status()
+    rates = {k: float(v) for k, v in r.json()["rates"].items() if v is not None}
+    rates[base] = 1.0
+    return RateTable(base=base, rates=rates, fetched_at=time.time())
+
+def get_rate_table(base: str = "USD", max_age_s: Optional[float] = None) -> RateTable:
+    """
+    All SUPPORTED rates for `base` in one request (Frankfurter / ECB, no key required).
+    Served from memory or the on-disk cache while younger than max_age_s; if the fetch fails,
+    the last known good table is returned with source="stale".
+    """
+    base = (base or "USD").upper()
+    max_age_s = settings.fx_ttl_s if max_age_s is None else max_age_s
+
+    def cached() -> Optional[RateTable]:
+        with _lock:
+            table = _tables.get(base)
+            if table is None and base in (disk := _read_disk()):
+                table = _tables[base] = RateTable(**disk[base], source="cache")
+            return table
+
+    table = cached()
+    if table is not None and time.time() - table.fetched_at < max_age_s:
+        return table
+    with _lock:
+        fetch_lock = _fetch_locks.setdefault(base, threading.Lock())
+    with fetch_lock:
+        # another caller may have refreshed the table while we waited
+        table = cached()
+        if table is not None and time.time() - table.fetched_at < max_age_s:
+            return table
+        try:
+            fresh = _fetch(base)
+        except Exception:
+            if table is None:
+                raise
+            return table.model_copy(update={"source": "stale"})
+        with _lock:
+            _tables[base] = fresh
+            _write_disk(fresh)
+        return fresh
 
 def get_rate(base: str = "USD", target: str = "USD") -> float:
     """
-    Live FX via Frankfurter (ECB). No key required.
-    Returns the rate to convert 1 base -> target.
+    Returns the rate to convert 1 base -> target, using the cached USD rate table.
     """
     base = (base or "USD").upper()
     target = (target or "USD").upper()
     if base == target:
         return 1.0
-    r = requests.get("https://api.frankfurter.app/latest",
-                     params={"from": base, "to": target}, timeout=10)
-    r.raise_for_status()
-    data = r.json()
-    return float(data["rates"][target])
+    return get_rate_table("USD").rate(target, base)
+
+def convert(values, target, base="USD", table: Optional[RateTable] = None):
+    """
+    Vectorized conversion. `values` may be a scalar, array or pandas Series;
+    `base` and `target` may be a currency code or a same-length array/Series of codes.
+    """
+    table = table or get_rate_table("USD")
+    def rate_vector(codes):
+        if isinstance(codes, str):
+            return table.lookup(codes)
+        codes = pd.Series(codes).str.upper()
+        for code in codes.unique():
+            table.lookup(code)  # raises RateUnavailable for any code without a rate
+        return codes.map(table.rates).to_numpy(dtype=float)
+    factor = np.asarray(rate_vector(target)) / np.asarray(rate_vector(base))
+    if isinstance(values, pd.Series):
+        return values * factor
+    return np.asarray(values, dtype=float) * factor
+
+def convert_columns(df: pd.DataFrame, columns, target: str, base: str = "USD", table: Optional[RateTable] = None) -> pd.DataFrame:
+    """Copy of df with `columns` converted from base to target."""
+    out = df.copy()
+    factor = float(convert(1.0, target, base, table))
+    out[list(columns)] = out[list(columns)].astype(float) * factor
+    return out
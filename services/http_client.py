@@ -0,0 +1,122 @@
+# services/http_client.py
+"""
+Shared HTTP client for the outbound services (weather, forex, auth0).
+
+- one pooled keep-alive requests.Session per host
+- uniform default timeout
+- retry with exponential backoff for idempotent methods only (GET/HEAD/OPTIONS)
+- per-host concurrency limit
+- per-host request/error/retry/latency counters
+"""
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import settings
+from services import metrics, tracing
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT = frozenset({"GET", "HEAD", "OPTIONS"})
+
+class HostStats:
+    __slots__ = ("requests", "errors", "retries", "total_s", "max_s")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_s": round(self.total_s / self.requests, 4) if self.requests else 0.0,
+            "max_s": round(self.max_s, 4),
+        }
+
+_lock = threading.Lock()
+_sessions: Dict[str, requests.Session] = {}
+_limits: Dict[str, threading.BoundedSemaphore] = {}
+_stats: Dict[str, HostStats] = {}
+
+def _host(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def _new_session() -> requests.Session:
+    retry = Retry(
+        total=settings.http_retries,
+        backoff_factor=settings.http_backoff_s,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=IDEMPOTENT,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.http_max_per_host, max_retries=retry)
+    ses = requests.Session()
+    ses.mount("http://", adapter)
+    ses.mount("https://", adapter)
+    return ses
+
+def _for_host(host: str):
+    with _lock:
+        ses = _sessions.get(host)
+        if ses is None:
+            ses = _sessions[host] = _new_session()
+            _limits[host] = threading.BoundedSemaphore(settings.http_max_per_host)
+            _stats[host] = HostStats()
+        return ses, _limits[host], _stats[host]
+
+def request(method: str, url: str, timeout=None, **kwargs) -> requests.Response:
+    """requests.request with pooling, retries for idempotent methods, a per-host cap and counters."""
+    host = _host(url)
+    ses, limit, stats = _for_host(host)
+    t0 = time.perf_counter()
+    failed = False
+    retries = 0
+    try:
+        with tracing.span(f"http.{method.upper()}", host=host) as sp:
+            with limit:
+                resp = ses.request(method.upper(), url, timeout=timeout or settings.http_timeout_s, **kwargs)
+            history = getattr(getattr(resp.raw, "retries", None), "history", ()) or ()
+            retries = len(history)
+            failed = resp.status_code >= 400
+            sp.set(status=resp.status_code, retries=retries)
+        return resp
+    except requests.RequestException:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        with _lock:
+            stats.requests += 1
+            stats.errors += int(failed)
+            stats.retries += retries
+            stats.total_s += elapsed
+            stats.max_s = max(stats.max_s, elapsed)
+        metrics.observe("http_request_seconds", elapsed, host=host)
+        if failed:
+            metrics.inc("http_errors_total", host=host)
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+def stats() -> Dict[str, dict]:
+    with _lock:
+        return {host: s.as_dict() for host, s in _stats.items()}
+
+def close() -> None:
+    with _lock:
+        for ses in _sessions.values():
+            ses.close()
+        _sessions.clear()
+        _limits.clear()
+        _stats.clear()
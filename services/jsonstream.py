@@ -0,0 +1,116 @@
+# services/jsonstream.py
+"""
+Incremental JSON parser for streamed LLM completions.
+
+Feed text chunks as they arrive; every value that closes at a path no deeper than
+`max_depth` is returned as (path, value) the moment its closing character is seen:
+
+    p = JsonStreamParser(max_depth=2)
+    p.feed('{"crops": [{"name": "Tomato"}, {"na')   # -> [(("crops", 0), {"name": "Tomato"})]
+    p.feed('me": "Basil"}], "rationale": "ok"}')    # -> [(("crops", 1), ...), (("crops",), [...]), (("rationale",), "ok")]
+    p.finish()                                      # -> the whole document
+
+Paths are tuples of object keys and array indexes; the root document itself is not emitted.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+_WS = " \t\r\n"
+_SCALAR_END = ",]}" + _WS
+
+class _Frame:
+    __slots__ = ("is_obj", "start", "key", "index", "awaiting_key")
+
+    def __init__(self, is_obj: bool, start: int):
+        self.is_obj = is_obj
+        self.start = start
+        self.key: Optional[str] = None
+        self.index = 0
+        self.awaiting_key = is_obj
+
+class JsonStreamParser:
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[_Frame] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._scalar_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        return self._buf
+
+    def _path(self) -> Tuple[Any, ...]:
+        return tuple(f.key if f.is_obj else f.index for f in self._stack)
+
+    def _close(self, start: int, end: int, events: list) -> None:
+        path = self._path()
+        if 0 < len(path) <= self.max_depth:
+            events.append((path, json.loads(self._buf[start:end])))
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple[Any, ...], Any]]:
+        """Consume `chunk`; returns the (path, value) pairs completed by it, in document order."""
+        self._buf += chunk
+        buf = self._buf
+        events: list = []
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            c = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._stack[-1].key = json.loads(buf[self._string_start:i + 1])
+                    else:
+                        self._close(self._string_start, i + 1, events)
+                i += 1
+                continue
+            if self._scalar_start is not None:
+                if c not in _SCALAR_END:
+                    i += 1
+                    continue
+                self._close(self._scalar_start, i, events)
+                self._scalar_start = None
+            if c in _WS:
+                pass
+            elif c == "{" or c == "[":
+                self._stack.append(_Frame(c == "{", i))
+            elif c == "}" or c == "]":
+                frame = self._stack.pop()
+                self._close(frame.start, i + 1, events)
+            elif c == '"':
+                self._in_string = True
+                self._string_start = i
+                top = self._stack[-1] if self._stack else None
+                self._string_is_key = bool(top and top.is_obj and top.awaiting_key)
+            elif c == ":":
+                self._stack[-1].awaiting_key = False
+            elif c == ",":
+                top = self._stack[-1]
+                if top.is_obj:
+                    top.awaiting_key = True
+                    top.key = None
+                else:
+                    top.index += 1
+            else:
+                self._scalar_start = i
+            i += 1
+        self._pos = i
+        return events
+
+    def finish(self) -> Any:
+        """Parse the complete buffer (raises ValueError if the stream was cut short)."""
+        return json.loads(self._buf)
+
+def replay(data: Any, max_depth: int = 2) -> List[Tuple[Tuple[Any, ...], Any]]:
+    """Events a stream of `data` would have produced; used to replay cached completions."""
+    return JsonStreamParser(max_depth).feed(json.dumps(data, ensure_ascii=False))
@@ -1,11 +1,32 @@
-import os, json, time
+import os, json, time, threading, logging
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from openai import OpenAI
 from dotenv import load_dotenv
 from config import settings
+from services.llm_cache import get_cache, cache_key
+from services.jsonstream import JsonStreamParser, replay
+from services import metrics, tracing
 
 load_dotenv()
+log = logging.getLogger(__name__)
 _client = None
+_slots: Optional[threading.BoundedSemaphore] = None
+
+def set_max_concurrency(limit: Optional[int]) -> None:
+    """Cap in-flight OpenAI calls across all threads of this process (None/0 = unlimited)."""
+    global _slots
+    _slots = threading.BoundedSemaphore(limit) if limit else None
+
+@contextmanager
+def _llm_slot():
+    slots = _slots
+    if slots is None:
+        yield
+        return
+    with slots:
+        yield
 
 def get_client() -> OpenAI:
     global _client
@@ -13,7 +34,7 @@ def get_client() -> OpenAI:
         api_key = settings.openai_api_key or os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise RuntimeError("OPENAI_API_KEY not set in environment.")
-        _client = OpenAI(api_key=api_key)
+        _client = OpenAI(api_key=api_key, base_url=settings.openai_base_url or None)
     return _client
 
 @retry(
@@ -26,26 +47,139 @@ def chat_json(model: str, system: str, user: str) -> dict:
     data, _, _ = chat_json_with_usage(model, system, user)
     return data
 
-def chat_json_with_usage(model: str, system: str, user: str):
+def _record(agent: str, model: str, elapsed: float, usage: Optional[dict], cache_hit: bool, sp=None,
+            cache_used: bool = True) -> None:
+    metrics.record_llm_call(agent, model, elapsed, usage, cache_hit, cache_used)
+    cache = "hit" if cache_hit else ("miss" if cache_used else "off")
+    if sp is not None:
+        u = usage or {}
+        sp.set(cache=cache, prompt_tokens=u.get("prompt_tokens"), completion_tokens=u.get("completion_tokens"))
+    if settings.log_tokens:
+        u = usage or {}
+        log.info("llm agent=%s model=%s cache=%s elapsed=%.3fs prompt_tokens=%s completion_tokens=%s",
+                 agent, model, cache, elapsed, u.get("prompt_tokens"), u.get("completion_tokens"))
+
+def chat_json_with_usage(model: str, system: str, user: str, temperature: float = 0.4, cache: bool = True,
+                         agent: str = "unknown"):
     """
     Returns (data: dict, usage: dict|None, elapsed_s: float)
+    Identical requests are answered from the persistent LLM cache unless
+    cache=False or LLM_CACHE=false; a hit returns the original usage.
+    Latency, tokens and estimated cost are recorded in services.metrics under `agent`.
+    """
+    with tracing.span("llm.chat", agent=agent, model=model) as sp:
+        use_cache = cache and settings.llm_cache_enabled
+        if use_cache:
+            t0 = time.time()
+            key = cache_key(model, temperature, system, user)
+            hit = get_cache().get(key)
+            if hit is not None:
+                data, usage = hit
+                elapsed = time.time() - t0
+                _record(agent, model, elapsed, usage, cache_hit=True, sp=sp)
+                return data, usage, elapsed
+
+        try:
+            client = get_client()
+            with _llm_slot():
+                t0 = time.time()
+                resp = client.chat.completions.create(
+                    model=model,
+                    temperature=temperature,
+                    response_format={"type": "json_object"},
+                    messages=[
+                        {"role": "system", "content": system},
+                        {"role": "user", "content": user},
+                    ],
+                )
+                elapsed = time.time() - t0
+            content = resp.choices[0].message.content
+            usage = None
+            try:
+                usage = resp.usage.model_dump() if hasattr(resp, "usage") and resp.usage else None
+            except Exception:
+                usage = None
+            data = json.loads(content)
+        except Exception:
+            metrics.inc("llm_errors_total", agent=agent, model=model)
+            raise
+        _record(agent, model, elapsed, usage, cache_hit=False, sp=sp, cache_used=use_cache)
+        if use_cache:
+            get_cache().put(key, model, data, usage)
+        return data, usage, elapsed
+
+def stream_chat(model: str, system: str, user: str, temperature: float = 0.4, usage_out: Optional[dict] = None) -> Iterator[str]:
+    """
+    Yields content deltas of a JSON-mode completion as they arrive.
+    If `usage_out` is given it receives the token usage reported at the end of the stream.
     """
     client = get_client()
-    t0 = time.time()
-    resp = client.chat.completions.create(
-        model=model,
-        temperature=0.4,
-        response_format={"type": "json_object"},
-        messages=[
-            {"role": "system", "content": system},
-            {"role": "user", "content": user},
-        ],
-    )
-    elapsed = time.time() - t0
-    content = resp.choices[0].message.content
-    usage = None
-    try:
-        usage = resp.usage.model_dump() if hasattr(resp, "usage") and resp.usage else None
-    except Exception:
-        usage = None
-    return json.loads(content), usage, elapsed
+    with _llm_slot():
+        stream = client.chat.completions.create(
+            model=model,
+            temperature=temperature,
+            response_format={"type": "json_object"},
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if chunk.choices:
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+            if usage_out is not None and getattr(chunk, "usage", None):
+                try:
+                    usage_out.update(chunk.usage.model_dump())
+                except Exception:
+                    pass
+
+def chat_json_streaming(model: str, system: str, user: str, on_field: Callable[[tuple, object], None],
+                        temperature: float = 0.4, cache: bool = True, max_depth: int = 2, agent: str = "unknown"):
+    """
+    Streaming flavour of chat_json_with_usage with the same return value.
+    on_field(path, value) is called for every JSON value that closes at most `max_depth` levels
+    deep, e.g. (("crops", 0), {...}) as soon as the first crop entry is complete.
+    Cache hits replay the same events before returning.
+    """
+    with tracing.span("llm.chat_stream", agent=agent, model=model) as sp:
+        use_cache = cache and settings.llm_cache_enabled
+        if use_cache:
+            t0 = time.time()
+            key = cache_key(model, temperature, system, user)
+            hit = get_cache().get(key)
+            if hit is not None:
+                data, usage = hit
+                for path, value in replay(data, max_depth):
+                    on_field(path, value)
+                elapsed = time.time() - t0
+                _record(agent, model, elapsed, usage, cache_hit=True, sp=sp)
+                return data, usage, elapsed
+
+        parser = JsonStreamParser(max_depth)
+        usage: dict = {}
+        first_token = None
+        t0 = time.time()
+        try:
+            for delta in stream_chat(model, system, user, temperature, usage_out=usage):
+                if first_token is None:
+                    first_token = time.time() - t0
+                    metrics.observe("llm_first_token_seconds", first_token, agent=agent, model=model)
+                    sp.set(first_token_s=round(first_token, 4))
+                for path, value in parser.feed(delta):
+                    on_field(path, value)
+            data = parser.finish()
+        except Exception:
+            metrics.inc("llm_errors_total", agent=agent, model=model)
+            raise
+        elapsed = time.time() - t0
+        usage = usage or None
+        _record(agent, model, elapsed, usage, cache_hit=False, sp=sp, cache_used=use_cache)
+        if use_cache:
+            get_cache().put(key, model, data, usage)
+        return data, usage, elapsed
+
+set_max_concurrency(settings.llm_max_concurrency)
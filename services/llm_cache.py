@@ -0,0 +1,101 @@
+# services/llm_cache.py
+"""
+Persistent, content-addressed cache for JSON chat completions.
+
+Entries are keyed on sha256(model, temperature, system, user) and stored in SQLite
+with a TTL and a size bound (least-recently-used rows are evicted first).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+from config import settings
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    data TEXT NOT NULL,
+    usage TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_llm_cache_last_used ON llm_cache (last_used);
+"""
+
+def cache_key(model: str, temperature: float, system: str, user: str) -> str:
+    blob = json.dumps([model, round(float(temperature), 4), system, user], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    def __init__(self, path: str, ttl_s: float, max_entries: int):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def get(self, key: str) -> Optional[Tuple[dict, Optional[dict]]]:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT data, usage, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.ttl_s and now - row[2] > self.ttl_s):
+                if row is not None:
+                    db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            db.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0]), (json.loads(row[1]) if row[1] else None)
+
+    def put(self, key: str, model: str, data: dict, usage: Optional[dict]) -> None:
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, data, usage, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, json.dumps(data), json.dumps(usage) if usage else None, now, now),
+            )
+            if self.max_entries:
+                db.execute(
+                    "DELETE FROM llm_cache WHERE key IN "
+                    "(SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db().execute("DELETE FROM llm_cache")
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+_cache = None
+
+def get_cache() -> LLMCache:
+    global _cache
+    if _cache is None:
+        _cache = LLMCache(
+            os.path.join(settings.cache_dir, "llm_cache.sqlite"),
+            ttl_s=settings.llm_cache_ttl_s,
+            max_entries=settings.llm_cache_max_entries,
+        )
+    return _cache
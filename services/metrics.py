@@ -0,0 +1,271 @@
+# services/metrics.py
+"""
+In-process metrics registry: labelled counters and latency histograms.
+
+    metrics.inc("llm_errors_total", agent="crop_advisor")
+    metrics.observe("stage_seconds", 0.42, stage="ops_plan")
+    with metrics.timer("http_request_seconds", host="https://api.open-meteo.com"): ...
+
+Exports:
+- to_prometheus(): text exposition format (for node_exporter's textfile collector)
+- snapshot():      JSON-friendly dict with p50/p95/p99 estimated from histogram buckets
+- export(dir):     writes both files atomically; called after each workflow run when METRICS_DIR is set
+"""
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional, Tuple
+from config import settings
+
+# seconds; covers cache hits (ms) up to slow LLM completions
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# USD per 1M tokens (input, output); unknown models are costed at 0
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+HELP = {
+    "llm_request_seconds": "LLM completion latency (cache hits included, label cache=hit|miss|off)",
+    "llm_first_token_seconds": "Time to first streamed token",
+    "llm_tokens_total": "Prompt/completion tokens by agent and model",
+    "llm_cost_usd_total": "Estimated LLM spend by agent and model",
+    "llm_cache_total": "LLM cache lookups by result",
+    "llm_errors_total": "Failed LLM calls",
+    "stage_seconds": "Workflow stage latency",
+    "workflow_seconds": "End-to-end workflow latency",
+    "artifact_builds_total": "Download artifacts built by kind (pdf, json, crops_csv, ops_csv)",
+    "artifact_cache_total": "Artifact cache lookups by result",
+    "plan_requests_total": "Plan generations by single-flight outcome (leader = computed, coalesced / memo = shared)",
+    "http_request_seconds": "Outbound HTTP latency by host",
+    "http_errors_total": "Outbound HTTP errors (status >= 400 or transport failure) by host",
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    price_in, price_out = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1e6
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "sum")
+
+    def __init__(self, buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Linear interpolation inside the bucket holding the q-th observation (Prometheus-style)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lo
+                return lo + (self.buckets[i] - lo) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.50), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+        }
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = Histogram()
+            hist.observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def grouped(self, name: str, by: str) -> Dict[str, Histogram]:
+        """Histograms of `name` merged across all labels except `by`."""
+        out: Dict[str, Histogram] = {}
+        with self._lock:
+            for labels, h in self._histograms.get(name, {}).items():
+                key = dict(labels).get(by, "")
+                merged = out.get(key)
+                if merged is None:
+                    merged = out[key] = Histogram(h.buckets)
+                merged.counts = [a + b for a, b in zip(merged.counts, h.counts)]
+                merged.count += h.count
+                merged.sum += h.sum
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "generated_at": time.time(),
+                "counters": {
+                    name: [{"labels": dict(k), "value": round(v, 6)} for k, v in sorted(series.items())]
+                    for name, series in sorted(self._counters.items())
+                },
+                "histograms": {
+                    name: [{"labels": dict(k), **h.as_dict()} for k, h in sorted(series.items())]
+                    for name, series in sorted(self._histograms.items())
+                },
+            }
+
+    def to_prometheus(self) -> str:
+        def fmt(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+            pairs = list(labels) + ([extra] if extra else [])
+            if not pairs:
+                return ""
+            escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{fmt(labels)} {value:.10g}")
+            for name, series in sorted(self._histograms.items()):
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, h in sorted(series.items()):
+                    cumulative = 0
+                    for bound, n in zip(h.buckets, h.counts):
+                        cumulative += n
+                        lines.append(f"{name}_bucket{fmt(labels, ('le', f'{bound:g}'))} {cumulative}")
+                    lines.append(f"{name}_bucket{fmt(labels, ('le', '+Inf'))} {h.count}")
+                    lines.append(f"{name}_sum{fmt(labels)} {h.sum:.6f}")
+                    lines.append(f"{name}_count{fmt(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory: Optional[str] = None) -> Optional[str]:
+        """Write metrics.prom and metrics.json into `directory` (default METRICS_DIR); returns the directory."""
+        directory = directory or settings.metrics_dir
+        if not directory:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        for fname, body in (("metrics.prom", self.to_prometheus()), ("metrics.json", json.dumps(self.snapshot(), indent=2))):
+            path = os.path.join(directory, fname)
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"  # concurrent runs may export at once
+            with open(tmp, "w", encoding="utf-8") as fh:
+                fh.write(body)
+            os.replace(tmp, path)
+        return directory
+
+REGISTRY = Registry()
+inc = REGISTRY.inc
+observe = REGISTRY.observe
+timer = REGISTRY.timer
+snapshot = REGISTRY.snapshot
+to_prometheus = REGISTRY.to_prometheus
+export = REGISTRY.export
+reset = REGISTRY.reset
+
+def record_llm_call(agent: str, model: str, elapsed_s: float, usage: Optional[dict], cache_hit: bool,
+                    cache_used: bool = True) -> None:
+    """
+    Latency, cache result and (for real calls) tokens and estimated cost of one LLM call.
+    cache_used=False (cache bypassed) records no cache lookup, so the hit rate only covers real lookups.
+    """
+    cache = "hit" if cache_hit else ("miss" if cache_used else "off")
+    observe("llm_request_seconds", elapsed_s, agent=agent, model=model, cache=cache)
+    if cache_used:
+        inc("llm_cache_total", agent=agent, result=cache)
+    if cache_hit or not usage:
+        return
+    prompt = int(usage.get("prompt_tokens") or 0)
+    completion = int(usage.get("completion_tokens") or 0)
+    inc("llm_tokens_total", prompt, agent=agent, model=model, kind="prompt")
+    inc("llm_tokens_total", completion, agent=agent, model=model, kind="completion")
+    inc("llm_cost_usd_total", estimate_cost(model, prompt, completion), agent=agent, model=model)
+
+def summary() -> dict:
+    """Compact view for the UI: per-stage / per-agent latency, LLM tokens and spend, cache hit rate, errors."""
+    cnt = snapshot()["counters"]
+
+    def latency(name: str, by: str) -> list:
+        rows = [
+            {by: key, "count": h.count, "avg_s": round(h.sum / h.count, 4),
+             "p50_s": round(h.quantile(0.5), 4), "p95_s": round(h.quantile(0.95), 4)}
+            for key, h in REGISTRY.grouped(name, by).items() if h.count
+        ]
+        return sorted(rows, key=lambda r: -r["p95_s"])
+
+    llm: Dict[Tuple[str, str], dict] = {}
+    for name, field in (("llm_tokens_total", None), ("llm_cost_usd_total", "cost_usd")):
+        for c in cnt.get(name, []):
+            lab = c["labels"]
+            row = llm.setdefault((lab["agent"], lab["model"]), {
+                "agent": lab["agent"], "model": lab["model"], "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0,
+            })
+            row[field or f"{lab['kind']}_tokens"] += c["value"]
+
+    cache = {"hit": 0.0, "miss": 0.0}
+    for c in cnt.get("llm_cache_total", []):
+        cache[c["labels"]["result"]] += c["value"]
+    lookups = cache["hit"] + cache["miss"]
+    plans = {"leader": 0.0, "coalesced": 0.0, "memo": 0.0}
+    for c in cnt.get("plan_requests_total", []):
+        plans[c["labels"]["result"]] += c["value"]
+    errors = {
+        name: sum(c["value"] for c in cnt.get(name, []))
+        for name in ("llm_errors_total", "http_errors_total")
+    }
+    return {
+        "stages": latency("stage_seconds", "stage"),
+        "agents": latency("llm_request_seconds", "agent"),
+        "llm": sorted(llm.values(), key=lambda r: -r["cost_usd"]),
+        "llm_cache_hit_rate": round(cache["hit"] / lookups, 4) if lookups else None,
+        "errors": errors,
+        "plans": plans,
+    }
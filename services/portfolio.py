@@ -0,0 +1,208 @@
+# services/portfolio.py
+"""
+Portfolio report: every saved scenario (optionally filtered) in one multi-page PDF on disk.
+
+    python -m services.portfolio portfolio.pdf --workers 4 --chunk-size 200 --location colombo
+
+Layout: summary table page(s) first (id, name, location, area, revenue, COGS, margin and
+portfolio totals), then each scenario with the same content as report.build_pdf.
+
+Memory stays flat in the number of scenarios:
+- scenarios are read from storage.db in keyset-paginated chunks (payloads still encoded);
+- a process pool decodes each payload and renders its pages into compressed content streams,
+  with at most two chunks in flight;
+- pages are appended to the output file as they arrive by a small streaming PDF writer
+  (standard Helvetica fonts, no embedding); only the object offsets and page ids
+  (a few bytes per page) are kept for the xref table and page tree.
+"""
+import argparse
+import os
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, List, Optional, Tuple
+from reportlab.lib.pagesizes import A4
+from services import tracing
+from services.report import FONTS, LEFT_MARGIN, LINE_STEP, PAGE_BOTTOM_MARGIN, PAGE_TOP_MARGIN, TITLE_STEP, paginate, plan_lines
+from storage.codec import decode_payload
+from storage.db import init_db, iter_scenario_payloads, iter_scenario_totals
+
+PAGE_W, PAGE_H = A4
+_FONT_TAGS = {"Helvetica": b"F1", "Helvetica-Bold": b"F2"}
+
+# summary table: (header, x position, width in chars)
+SUMMARY_COLUMNS = (
+    ("ID", 40, 7), ("Name", 85, 26), ("Location", 230, 20), ("Area m²", 345, 9),
+    ("Revenue $", 400, 12), ("COGS $", 470, 12), ("Margin %", 535, 8),
+)
+
+def _pdf_text(text: str) -> bytes:
+    raw = text.encode("cp1252", errors="replace")  # WinAnsiEncoding covers °, ², –, €
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+def content_stream(page: List[Tuple[str, str, float]], x: float = LEFT_MARGIN) -> bytes:
+    """Compressed PDF content stream for one paginated page of (style, text, y) rows."""
+    ops = []
+    for style, text, y in page:
+        font, size = FONTS[style]
+        ops.append(b"BT /%s %d Tf %.2f %.2f Td (%s) Tj ET" % (_FONT_TAGS[font], size, x, y, _pdf_text(text)))
+    return zlib.compress(b"\n".join(ops), 6)
+
+def _table_stream(rows: List[Tuple[str, List[str], float]]) -> bytes:
+    ops = []
+    for style, cells, y in rows:
+        font, size = FONTS[style]
+        for (_, x, width), cell in zip(SUMMARY_COLUMNS, cells):
+            text = cell if style == "title" else cell[:width]
+            ops.append(b"BT /%s %d Tf %.2f %.2f Td (%s) Tj ET" % (_FONT_TAGS[font], size, x, y, _pdf_text(text)))
+    return zlib.compress(b"\n".join(ops), 6)
+
+def render_scenario(item: Tuple[dict, bytes]) -> List[bytes]:
+    """Worker: decode one stored payload and return its pages as compressed content streams."""
+    meta, raw = item
+    title = f"Scenario #{meta['id']} – {meta['name']}"
+    rows = plan_lines(decode_payload(raw), title=title)
+    rows.insert(1, ("p", f"{meta['location']} | {meta['area']:g} m² | {meta['season']} | goal {meta['goal']} | saved {meta['created_at']:%Y-%m-%d}"))
+    return [content_stream(page) for page in paginate(rows, PAGE_H)]
+
+class PdfStreamWriter:
+    """Append-only PDF writer: page objects go straight to the file; the page tree is written on close()."""
+    CATALOG, PAGES, FONT_REGULAR, FONT_BOLD = 1, 2, 3, 4
+
+    def __init__(self, fh: BinaryIO):
+        self.fh = fh
+        self.offsets: List[int] = [0, 0, 0, 0, 0]  # index = object number; 1-4 are reserved above
+        self.page_ids: List[int] = []
+        fh.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _object(self, body: bytes, num: Optional[int] = None) -> int:
+        if num is None:
+            num = len(self.offsets)
+            self.offsets.append(0)
+        self.offsets[num] = self.fh.tell()
+        self.fh.write(b"%d 0 obj\n" % num + body + b"\nendobj\n")
+        return num
+
+    def add_page(self, stream: bytes) -> int:
+        contents = self._object(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page = self._object(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.4f %.4f] "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>"
+            % (self.PAGES, PAGE_W, PAGE_H, self.FONT_REGULAR, self.FONT_BOLD, contents)
+        )
+        self.page_ids.append(page)
+        return page
+
+    def close(self) -> None:
+        for num, font in ((self.FONT_REGULAR, b"Helvetica"), (self.FONT_BOLD, b"Helvetica-Bold")):
+            self._object(b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % font, num)
+        kids = b" ".join(b"%d 0 R" % p for p in self.page_ids)
+        self._object(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.page_ids)), self.PAGES)
+        self._object(b"<< /Type /Catalog /Pages %d 0 R >>" % self.PAGES, self.CATALOG)
+        xref = self.fh.tell()
+        self.fh.write(b"xref\n0 %d\n0000000000 65535 f \n" % len(self.offsets))
+        for off in self.offsets[1:]:
+            self.fh.write(b"%010d 00000 n \n" % off)
+        self.fh.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self.offsets), self.CATALOG, xref))
+
+def _money(v: Optional[float]) -> str:
+    return "n/a" if v is None else f"{v:,.2f}"
+
+def _write_summary(writer: PdfStreamWriter, name: Optional[str], location: Optional[str]) -> dict:
+    """Stream the per-scenario totals into table pages; returns portfolio totals."""
+    totals = {"scenarios": 0, "area_m2": 0.0, "revenue_usd": 0.0, "cogs_usd": 0.0}
+    header = ("h", [col[0] for col in SUMMARY_COLUMNS])
+    page: List[Tuple[str, List[str], float]] = []
+    y = PAGE_H - PAGE_TOP_MARGIN
+
+    def emit(style: str, cells: List[str]):
+        nonlocal page, y
+        if not page:
+            page.append(("title", ["Portfolio Summary"], y))
+            y -= TITLE_STEP
+            page.append((header[0], header[1], y))
+            y -= LINE_STEP
+        page.append((style, cells, y))
+        y -= LINE_STEP
+        if y < PAGE_BOTTOM_MARGIN:
+            writer.add_page(_table_stream(page))
+            page, y = [], PAGE_H - PAGE_TOP_MARGIN
+
+    for chunk in iter_scenario_totals(name=name, location=location):
+        for r in chunk:
+            totals["scenarios"] += 1
+            totals["area_m2"] += float(r["area"])
+            totals["revenue_usd"] += float(r["revenue_usd"] or 0.0)
+            totals["cogs_usd"] += float(r["cogs_usd"] or 0.0)
+            margin = "n/a" if r["margin_pct"] is None else f"{r['margin_pct']:.2f}"
+            emit("p", [str(r["id"]), r["name"], r["location"], f"{r['area']:g}",
+                       _money(r["revenue_usd"]), _money(r["cogs_usd"]), margin])
+    rev, cogs = totals["revenue_usd"], totals["cogs_usd"]
+    totals["margin_pct"] = round((rev - cogs) / rev * 100.0, 2) if rev > 0 else 0.0
+    emit("h", [f"{totals['scenarios']}", "Portfolio total", "", f"{totals['area_m2']:g}",
+               _money(rev), _money(cogs), f"{totals['margin_pct']:.2f}"])
+    if page:
+        writer.add_page(_table_stream(page))
+    return totals
+
+@tracing.traced("report.portfolio")
+def build_portfolio_pdf(path: str, workers: Optional[int] = None, chunk_size: int = 200,
+                        name: Optional[str] = None, location: Optional[str] = None) -> dict:
+    """
+    Write the portfolio PDF to `path` (atomically, via path + ".tmp").
+    workers=0 renders in-process; None uses os.cpu_count(). Returns scenario/page counts and totals.
+    """
+    t0 = time.perf_counter()
+    tmp = path + ".tmp"
+    pool = ProcessPoolExecutor(max_workers=workers) if workers != 0 else None
+    n_workers = workers or os.cpu_count() or 1
+    scenarios = 0
+    try:
+        with open(tmp, "wb") as fh:
+            writer = PdfStreamWriter(fh)
+            totals = _write_summary(writer, name, location)
+            pending: deque = deque()
+
+            def drain():
+                nonlocal scenarios
+                for pages in pending.popleft():
+                    scenarios += 1
+                    for stream in pages:
+                        writer.add_page(stream)
+
+            for chunk in iter_scenario_payloads(chunk_size=chunk_size, name=name, location=location):
+                items = [(meta.model_dump(), raw) for meta, raw in chunk]
+                if pool is None:
+                    pending.append(map(render_scenario, items))
+                else:
+                    pending.append(pool.map(render_scenario, items, chunksize=max(1, len(items) // (n_workers * 4))))
+                if len(pending) > 1:  # keep the next chunk rendering while this one is written
+                    drain()
+            while pending:
+                drain()
+            writer.close()
+        os.replace(tmp, path)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return {"scenarios": scenarios, "pages": len(writer.page_ids), "elapsed_s": round(time.perf_counter() - t0, 3), **totals}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Multi-scenario portfolio PDF from storage.db")
+    ap.add_argument("out", help="output PDF path")
+    ap.add_argument("--workers", type=int, default=None, help="render processes (0 = in-process; default: CPU count)")
+    ap.add_argument("--chunk-size", type=int, default=200, help="scenarios read from the database per query")
+    ap.add_argument("--name", help="case-insensitive substring filter on scenario name")
+    ap.add_argument("--location", help="case-insensitive substring filter on location")
+    args = ap.parse_args(argv)
+    init_db()
+    info = build_portfolio_pdf(args.out, args.workers, args.chunk_size, args.name, args.location)
+    print(f"wrote {args.out}: {info['scenarios']} scenarios, {info['pages']} pages in {info['elapsed_s']}s "
+          f"(revenue ${info['revenue_usd']:,.2f}, margin {info['margin_pct']:.2f}%)")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
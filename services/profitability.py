@@ -0,0 +1,109 @@
+# services/profitability.py
+"""
+Per-crop profitability for one plan or a batch of plans, in array form.
+
+Model (shared by the UI tables, the PDF report and the scenario metric rows):
+  price_i      = plan price for the crop (DEFAULT_PRICE when it has none)
+  revenue_i    = price_i * yield_i
+  COGS alloc_i = plan COGS * yield_i / sum(yield of the plan)
+  profit_i     = revenue_i - COGS alloc_i
+  margin_i     = profit_i / revenue_i * 100   (0 when revenue is 0)
+
+    prof = per_crop(results, fp)      # single plan, memoized per fingerprint
+    prof.to_frame()                   # the app's table (rounded)
+    batch = compute(plans)            # all crops of all plans; rows grouped by batch.plan_id
+"""
+import threading
+from collections import OrderedDict
+from typing import Hashable, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from agents.ops_engine import round2
+
+DEFAULT_PRICE = 2.0
+CACHE_MAX_ENTRIES = 256
+
+FRAME_COLUMNS = {
+    "crop": "Crop",
+    "yield_kg": "Expected Yield (kg)",
+    "price": "Price (USD/kg)",
+    "revenue": "Revenue (USD)",
+    "cogs_alloc": "Allocated COGS (USD)",
+    "profit": "Profit (USD)",
+    "margin_pct": "Margin (%)",
+}
+
+class Profitability(NamedTuple):
+    plan_id: np.ndarray      # (N,) index of the plan each crop row belongs to
+    crop: Tuple[str, ...]    # (N,)
+    yield_kg: np.ndarray     # (N,) values are unrounded
+    price: np.ndarray
+    revenue: np.ndarray
+    cogs_alloc: np.ndarray
+    profit: np.ndarray
+    margin_pct: np.ndarray
+
+    def to_frame(self) -> pd.DataFrame:
+        """Rounded table with the app's column names."""
+        return pd.DataFrame({
+            label: list(self.crop) if key == "crop" else round2(getattr(self, key))
+            for key, label in FRAME_COLUMNS.items()
+        })
+
+    def rows(self) -> List[dict]:
+        """Rounded per-crop dicts keyed like the fields (report / storage)."""
+        cols = {key: round2(getattr(self, key)).tolist() for key in FRAME_COLUMNS if key != "crop"}
+        return [{"crop": name, **{key: cols[key][i] for key in cols}} for i, name in enumerate(self.crop)]
+
+def compute(plans: Sequence[dict]) -> Profitability:
+    """Flatten the ops_plan crops of every plan and evaluate them in one pass."""
+    plan_id, names, yields, prices, totals = [], [], [], [], []
+    for i, plan in enumerate(plans):
+        mk = plan.get("market_plan", {})
+        price_map = {p["crop"].strip().lower(): float(p["unit_price_usd_per_kg"]) for p in mk.get("pricing_assumptions", [])}
+        totals.append(float(mk.get("cogs_usd", 0.0)))
+        for c in plan.get("ops_plan", {}).get("crops", []):
+            plan_id.append(i)
+            names.append(c["name"])
+            yields.append(float(c.get("expected_yield_kg", 0.0)))
+            prices.append(price_map.get(c["name"].strip().lower(), DEFAULT_PRICE))
+
+    pid = np.asarray(plan_id, dtype=np.intp)
+    y = np.asarray(yields, dtype=float)
+    price = np.asarray(prices, dtype=float)
+    plan_yield = np.bincount(pid, weights=y, minlength=len(totals))
+    plan_yield[plan_yield == 0] = 1.0
+    revenue = price * y
+    cogs_alloc = np.asarray(totals, dtype=float)[pid] * (y / plan_yield[pid])
+    profit = revenue - cogs_alloc
+    margin = np.divide(profit, revenue, out=np.zeros_like(profit), where=revenue > 0) * 100.0
+    return Profitability(pid, tuple(names), y, price, revenue, cogs_alloc, profit, margin)
+
+def _content_key(plan: dict) -> Hashable:
+    mk = plan.get("market_plan", {})
+    return (
+        tuple((c["name"], c.get("expected_yield_kg")) for c in plan.get("ops_plan", {}).get("crops", [])),
+        tuple((p["crop"], p["unit_price_usd_per_kg"]) for p in mk.get("pricing_assumptions", [])),
+        mk.get("cogs_usd"),
+    )
+
+_cache: "OrderedDict[Hashable, Profitability]" = OrderedDict()
+_lock = threading.Lock()
+
+def per_crop(plan: dict, fp: Optional[str] = None) -> Profitability:
+    """
+    Profitability of a single plan, memoized. `fp` is the plan fingerprint when the caller
+    has one (services.artifacts.plan_fingerprint); otherwise the inputs the model reads are the key.
+    """
+    key = fp or _content_key(plan)
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+            return hit
+    result = compute([plan])
+    with _lock:
+        _cache[key] = result
+        while len(_cache) > CACHE_MAX_ENTRIES:
+            _cache.popitem(last=False)
+    return result
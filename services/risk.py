@@ -0,0 +1,138 @@
+# services/risk.py
+"""
+Monte Carlo risk engine on top of a finished plan (OpsOptimizer + MarketAnalyst output).
+
+    report = simulate(results, RiskConfig(draws=200_000, yield_cv=0.2, seed=7))
+    report.margin_pct[50], report.probability_of_loss, report.variance_share
+
+Model per draw i and crop k (no extra LLM or catalog calls; the plan's numbers are the means):
+  yield_ik   = expected_yield_k * Y_ik        Y ~ lognormal, mean 1, CV = yield_cv
+  price_ik   = price_k * P_ik                 P ~ lognormal, mean 1, CV = price_cv
+  temp_i     = avg_temp + temp_sd_c * Z       one temperature per draw, shared by all crops
+  water_ik   = water_usd_k * temp_factor(temp_i) / temp_factor(avg_temp)
+  profit_i   = sum_k (price_ik * yield_ik - water_ik - nutrients_k) - labor - misc
+Draws are evaluated `chunk_size` at a time, so the (draws x crops) intermediates stay bounded;
+only per-draw margin and profit (float32) are kept for exact percentiles.
+Yield, price and temperature each get their own child stream of the seed, so results
+depend on `seed` but not on `chunk_size`.
+
+Variance contribution: profit = sum_k X_k + const, so Var(profit) = sum_k Cov(X_k, profit);
+variance_share[k] = Cov(X_k, profit) / Var(profit) (shares sum to 1, can be negative).
+"""
+from typing import Dict, NamedTuple, Optional, Tuple
+import numpy as np
+from agents.ops_engine import BASELINE_TEMP_C, HORIZON_DAYS, HORIZON_WEEKS, NUTRIENT_PRICE_PER_G, WATER_PRICE_PER_L, temp_factor
+from services import tracing
+from services.profitability import DEFAULT_PRICE
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+HIST_BINS = 60
+
+class RiskConfig(NamedTuple):
+    draws: int = 100_000
+    yield_cv: float = 0.15
+    price_cv: float = 0.12
+    temp_sd_c: float = 2.0
+    seed: int = 0
+    chunk_size: int = 50_000
+
+class RiskReport(NamedTuple):
+    draws: int
+    crops: Tuple[str, ...]
+    margin_pct: Dict[int, float]      # percentile -> margin %
+    profit_usd: Dict[int, float]      # percentile -> profit
+    mean_margin_pct: float
+    mean_profit_usd: float
+    probability_of_loss: float        # P(profit < 0)
+    expected_shortfall_usd: float     # mean profit of the worst 5% of draws
+    variance_share: Dict[str, float]  # crop -> share of Var(profit)
+    margin_hist: Tuple[np.ndarray, np.ndarray]  # (counts, bin edges), for charts
+
+    def as_dict(self) -> dict:
+        """JSON-friendly summary (no histogram)."""
+        out = self._asdict()
+        out.pop("margin_hist")
+        out["crops"] = list(self.crops)
+        return out
+
+def _lognormal_factors(rng: np.random.Generator, shape: tuple, cv: float) -> np.ndarray:
+    if cv <= 0:
+        return np.ones(shape)
+    sigma = np.sqrt(np.log1p(cv * cv))
+    return np.exp(sigma * rng.standard_normal(shape) - 0.5 * sigma * sigma)
+
+def plan_inputs(plan: dict) -> dict:
+    """Per-crop means and fixed costs the simulation needs, read from a results dict."""
+    op = plan["ops_plan"]
+    mk = plan["market_plan"]
+    price_map = {p["crop"].strip().lower(): float(p["unit_price_usd_per_kg"]) for p in mk.get("pricing_assumptions", [])}
+    crops = op["crops"]
+    costs = op.get("costs", {})
+    return {
+        "crops": tuple(c["name"] for c in crops),
+        "yield_kg": np.array([float(c["expected_yield_kg"]) for c in crops]),
+        "price": np.array([price_map.get(c["name"].strip().lower(), DEFAULT_PRICE) for c in crops]),
+        "water_usd": np.array([float(c["watering_l_per_day"]) * HORIZON_DAYS * WATER_PRICE_PER_L for c in crops]),
+        "nutrients_usd": np.array([float(c["fertilizer_g_per_week"]) * HORIZON_WEEKS * NUTRIENT_PRICE_PER_G for c in crops]),
+        "fixed_usd": float(costs.get("labor_usd", 0.0)) + float(costs.get("misc_usd", 0.0)),
+        "temp_c": float((plan.get("weather") or {}).get("avg_temp_c", BASELINE_TEMP_C)),
+    }
+
+@tracing.traced("risk.simulate")
+def simulate(plan: dict, config: Optional[RiskConfig] = None) -> RiskReport:
+    config = config or RiskConfig()
+    if config.draws < 1:
+        raise ValueError("draws must be >= 1")
+    p = plan_inputs(plan)
+    k = len(p["crops"])
+    rng_yield, rng_price, rng_temp = (np.random.default_rng(s) for s in np.random.SeedSequence(config.seed).spawn(3))
+    base_tf = float(temp_factor(p["temp_c"]))
+    # deterministic per-crop contribution, used to centre the covariance sums
+    base_x = p["price"] * p["yield_kg"] - p["water_usd"] - p["nutrients_usd"]
+
+    margins = np.empty(config.draws, dtype=np.float32)
+    profits = np.empty(config.draws, dtype=np.float32)
+    sum_x = np.zeros(k)
+    sum_xp = np.zeros(k)
+    sum_p = sum_pp = 0.0
+    base_p = float(base_x.sum()) - p["fixed_usd"]
+
+    for start in range(0, config.draws, config.chunk_size):
+        n = min(config.chunk_size, config.draws - start)
+        yields = p["yield_kg"] * _lognormal_factors(rng_yield, (n, k), config.yield_cv)
+        prices = p["price"] * _lognormal_factors(rng_price, (n, k), config.price_cv)
+        temps = p["temp_c"] + config.temp_sd_c * rng_temp.standard_normal((n, 1)) if config.temp_sd_c > 0 else np.full((n, 1), p["temp_c"])
+        revenue_k = prices * yields
+        x = revenue_k - p["water_usd"] * (temp_factor(temps) / base_tf) - p["nutrients_usd"]  # (n, k)
+        profit = x.sum(axis=1) - p["fixed_usd"]
+        revenue = revenue_k.sum(axis=1)
+        margins[start:start + n] = np.divide(profit, revenue, out=np.zeros(n), where=revenue > 0) * 100.0
+        profits[start:start + n] = profit
+
+        dx, dp = x - base_x, profit - base_p
+        sum_x += dx.sum(axis=0)
+        sum_xp += (dx * dp[:, None]).sum(axis=0)
+        sum_p += float(dp.sum())
+        sum_pp += float((dp * dp).sum())
+
+    n = config.draws
+    mean_dp = sum_p / n
+    cov = sum_xp / n - (sum_x / n) * mean_dp
+    var = sum_pp / n - mean_dp * mean_dp
+    shares = cov / var if var > 1e-12 else np.zeros(k)
+
+    m_q = np.percentile(margins, PERCENTILES)
+    p_q = np.percentile(profits, PERCENTILES)
+    tail = profits[profits <= np.percentile(profits, 5)]
+    return RiskReport(
+        draws=n,
+        crops=p["crops"],
+        margin_pct={q: round(float(v), 2) for q, v in zip(PERCENTILES, m_q)},
+        profit_usd={q: round(float(v), 2) for q, v in zip(PERCENTILES, p_q)},
+        mean_margin_pct=round(float(margins.mean(dtype=np.float64)), 2),
+        mean_profit_usd=round(float(profits.mean(dtype=np.float64)), 2),
+        probability_of_loss=round(float((profits < 0).mean()), 4),
+        expected_shortfall_usd=round(float(tail.mean(dtype=np.float64)), 2) if tail.size else 0.0,
+        variance_share={name: round(float(s), 4) for name, s in zip(p["crops"], shares)},
+        margin_hist=np.histogram(margins, bins=HIST_BINS),
+    )
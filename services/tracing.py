@@ -0,0 +1,275 @@
+# services/tracing.py
+"""
+Lightweight nested spans with a local NDJSON trace store.
+
+    with tracing.span("weather.forecast", lat=lat, lon=lon) as sp:
+        ...
+        sp.set(cache="hit")
+
+    @tracing.traced("report.build_pdf")
+    def build_pdf(plan): ...
+
+The current span lives in a contextvar, so nesting follows the call stack and carries
+into worker threads that run under copy_context() (the DAG executor does this) and
+into asyncio.to_thread. A span with no parent starts a new trace; when that root span
+ends, the whole trace is appended to TRACE_PATH as one JSON line per span.
+
+Tracing is off unless TRACE=true (or set_enabled(True)); when off, span() returns a shared
+no-op object and traced() adds a single flag check per call.
+
+    python -m services.tracing list
+    python -m services.tracing show [TRACE_ID|latest]
+    python -m services.tracing self-time [--last N]
+"""
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+from config import settings
+
+_enabled = settings.trace_enabled
+_current: ContextVar[Optional["Span"]] = ContextVar("trace_span", default=None)
+_lock = threading.Lock()
+_open_traces: Dict[str, List[dict]] = {}
+
+def set_enabled(flag: bool) -> None:
+    global _enabled
+    _enabled = bool(flag)
+
+def enabled() -> bool:
+    return _enabled
+
+def _store_path() -> str:
+    return settings.trace_path or os.path.join(settings.cache_dir, "traces.ndjson")
+
+def _write(records: List[dict]) -> None:
+    path = _store_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    lines = "".join(json.dumps(r, default=str) + "\n" for r in records)
+    with _lock:
+        try:
+            if os.path.getsize(path) > settings.trace_max_mb * 1024 * 1024:
+                os.replace(path, path + ".1")
+        except OSError:
+            pass
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write(lines)
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "start", "_t0", "_token")
+
+    def __init__(self, name: str, attrs: dict):
+        parent = _current.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self.start = time.time()
+        self._t0 = time.perf_counter()
+        self._token = _current.set(self)
+        if self.parent_id is None:
+            with _lock:
+                _open_traces[self.trace_id] = []
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration = time.perf_counter() - self._t0
+        _current.reset(self._token)
+        record = {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "name": self.name, "start": self.start, "duration_s": round(duration, 6),
+            "thread": threading.current_thread().name, "attrs": self.attrs,
+        }
+        if exc_type is not None:
+            record["error"] = f"{exc_type.__name__}: {exc}"
+        with _lock:
+            buffered = _open_traces.get(self.trace_id)
+            if buffered is not None:
+                buffered.append(record)
+            if self.parent_id is None:
+                flush = _open_traces.pop(self.trace_id, [record])
+        if self.parent_id is None:
+            _write(flush)
+        elif buffered is None:
+            _write([record])  # finished after its root (e.g. background work)
+        return False
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+_NOOP = _NoopSpan()
+
+def span(name: str, **attrs):
+    """Context manager for one timed span; a shared no-op when tracing is off."""
+    if not _enabled:
+        return _NOOP
+    return Span(name, attrs)
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Decorator form of span(); defaults to module.function as the span name."""
+    def wrap(fn: Callable) -> Callable:
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(span_name, {}):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+def current_trace_id() -> Optional[str]:
+    sp = _current.get()
+    return sp.trace_id if sp else None
+
+# ---------- reading / CLI ----------
+
+def load_traces(path: Optional[str] = None) -> Dict[str, List[dict]]:
+    """trace_id -> spans (sorted by start), in file order of first appearance."""
+    traces: Dict[str, List[dict]] = {}
+    try:
+        with open(path or _store_path(), encoding="utf-8") as fh:
+            for line in fh:
+                line = line.strip()
+                if line:
+                    rec = json.loads(line)
+                    traces.setdefault(rec["trace_id"], []).append(rec)
+    except FileNotFoundError:
+        return {}
+    for spans in traces.values():
+        spans.sort(key=lambda r: r["start"])
+    return traces
+
+def _root(spans: List[dict]) -> dict:
+    roots = [s for s in spans if s["parent_id"] is None]
+    return roots[0] if roots else spans[0]
+
+def _covered(intervals: List[tuple]) -> float:
+    """Total length of the union of (start, end) intervals; parallel children are not double-counted."""
+    total, cur_start, cur_end = 0.0, None, None
+    for start, end in sorted(intervals):
+        if cur_end is None or start > cur_end:
+            if cur_end is not None:
+                total += cur_end - cur_start
+            cur_start, cur_end = start, end
+        else:
+            cur_end = max(cur_end, end)
+    if cur_end is not None:
+        total += cur_end - cur_start
+    return total
+
+def self_times(spans: List[dict]) -> Dict[str, float]:
+    """span_id -> duration not covered by any child span."""
+    children: Dict[str, List[tuple]] = {}
+    for s in spans:
+        if s["parent_id"]:
+            children.setdefault(s["parent_id"], []).append((s["start"], s["start"] + s["duration_s"]))
+    return {s["span_id"]: max(0.0, s["duration_s"] - _covered(children.get(s["span_id"], []))) for s in spans}
+
+def waterfall(spans: List[dict], width: int = 48) -> str:
+    root = _root(spans)
+    t0, total = root["start"], max(root["duration_s"], 1e-9)
+    by_parent: Dict[Optional[str], List[dict]] = {}
+    ids = {s["span_id"] for s in spans}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        by_parent.setdefault(parent, []).append(s)
+    own = self_times(spans)
+    lines = [f"trace {root['trace_id']}  {root['name']}  {root['duration_s'] * 1000:.1f} ms  ({len(spans)} spans)"]
+
+    def walk(parent: Optional[str], depth: int):
+        for s in by_parent.get(parent, []):
+            offset = max(0.0, s["start"] - t0)
+            lo = min(width - 1, int(offset / total * width))
+            hi = max(lo + 1, min(width, int(round((offset + s["duration_s"]) / total * width))))
+            bar = " " * lo + "█" * (hi - lo) + " " * (width - hi)
+            label = ("  " * depth + s["name"])[:40]
+            flag = "  !" if s.get("error") else ""
+            lines.append(f"{label:<40} |{bar}| {offset * 1000:8.1f} +{s['duration_s'] * 1000:8.1f} ms  self {own[s['span_id']] * 1000:7.1f}{flag}")
+            walk(s["span_id"], depth + 1)
+    walk(None, 0)
+    return "\n".join(lines)
+
+def aggregate(traces: Dict[str, List[dict]]) -> List[dict]:
+    """Per span name: count, total, self time and p95 duration across `traces`."""
+    rows: Dict[str, dict] = {}
+    for spans in traces.values():
+        own = self_times(spans)
+        for s in spans:
+            row = rows.setdefault(s["name"], {"name": s["name"], "count": 0, "total_s": 0.0, "self_s": 0.0, "durations": []})
+            row["count"] += 1
+            row["total_s"] += s["duration_s"]
+            row["self_s"] += own[s["span_id"]]
+            row["durations"].append(s["duration_s"])
+    out = []
+    for row in rows.values():
+        d = sorted(row.pop("durations"))
+        row["p95_s"] = d[min(len(d) - 1, int(0.95 * len(d)))]
+        out.append(row)
+    return sorted(out, key=lambda r: -r["self_s"])
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Inspect recorded traces")
+    ap.add_argument("--path", help="trace store (default: TRACE_PATH or CACHE_DIR/traces.ndjson)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    ls = sub.add_parser("list", help="recent traces")
+    ls.add_argument("--last", type=int, default=20)
+    show = sub.add_parser("show", help="waterfall for one trace")
+    show.add_argument("trace_id", nargs="?", default="latest")
+    agg = sub.add_parser("self-time", help="aggregate self time per span name")
+    agg.add_argument("--last", type=int, default=0, help="only the N most recent traces (0 = all)")
+    args = ap.parse_args(argv)
+
+    traces = load_traces(args.path)
+    if not traces:
+        print("no traces recorded (set TRACE=true)")
+        return 1
+    ordered = sorted(traces.items(), key=lambda kv: _root(kv[1])["start"])
+    if args.cmd == "list":
+        for trace_id, spans in ordered[-args.last:]:
+            root = _root(spans)
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(root["start"]))
+            print(f"{trace_id}  {when}  {root['name']:<24} {root['duration_s'] * 1000:9.1f} ms  {len(spans):4d} spans")
+    elif args.cmd == "show":
+        if args.trace_id == "latest":
+            spans = ordered[-1][1]
+        else:
+            matches = [v for k, v in traces.items() if k.startswith(args.trace_id)]
+            if not matches:
+                print(f"unknown trace {args.trace_id}")
+                return 1
+            spans = matches[0]
+        print(waterfall(spans))
+    else:
+        selected = dict(ordered[-args.last:]) if args.last else traces
+        print(f"{'span':<32} {'count':>6} {'total ms':>10} {'self ms':>10} {'self %':>7} {'p95 ms':>9}")
+        rows = aggregate(selected)
+        grand = sum(r["self_s"] for r in rows) or 1.0
+        for r in rows:
+            print(f"{r['name'][:32]:<32} {r['count']:>6} {r['total_s'] * 1000:>10.1f} {r['self_s'] * 1000:>10.1f} "
+                  f"{r['self_s'] / grand * 100:>6.1f}% {r['p95_s'] * 1000:>9.1f}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
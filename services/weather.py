@@ -1,44 +1,105 @@
 import datetime as dt
+import json
+import os
+import sqlite3
+import threading
+import time
 from typing import Optional, Tuple
-import requests
+from config import settings
+from services import http_client, tracing
 
 GEOCODE_URL = "https://geocoding-api.open-meteo.com/v1/search"
 FORECAST_URL = "https://api.open-meteo.com/v1/forecast"
 
+# Geocodes never expire; names the geocoder does not know (geocode_miss) and forecasts
+# expire after settings.weather_forecast_ttl_s (Open-Meteo updates roughly hourly).
+# Forecasts are keyed by rounded coordinates + date range.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode (name TEXT PRIMARY KEY, lat REAL NOT NULL, lon REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS geocode_miss (name TEXT PRIMARY KEY, fetched_at REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS forecast (key TEXT PRIMARY KEY, daily TEXT NOT NULL, fetched_at REAL NOT NULL);
+"""
+COORD_DECIMALS = 2  # ~1 km; finer than the forecast grid
+
+_lock = threading.Lock()
+_conn = None
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        os.makedirs(settings.cache_dir, exist_ok=True)
+        _conn = sqlite3.connect(os.path.join(settings.cache_dir, "weather.sqlite"), check_same_thread=False, isolation_level=None)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.executescript(_SCHEMA)
+    return _conn
+
+def _normalize_name(location: str) -> str:
+    return " ".join(location.lower().split())
+
+@tracing.traced("weather.geocode")
 def _geocode(location: str) -> Optional[Tuple[float, float]]:
-    r = requests.get(GEOCODE_URL, params={"name": location, "count": 1, "language": "en"}, timeout=15)
+    name = _normalize_name(location)
+    now = time.time()
+    with _lock:
+        row = _db().execute("SELECT lat, lon FROM geocode WHERE name = ?", (name,)).fetchone()
+        miss = _db().execute("SELECT fetched_at FROM geocode_miss WHERE name = ?", (name,)).fetchone()
+    if row:
+        return float(row[0]), float(row[1])
+    if miss and now - miss[0] < settings.weather_forecast_ttl_s:
+        return None
+
+    r = http_client.get(GEOCODE_URL, params={"name": location, "count": 1, "language": "en"})
     r.raise_for_status()
     data = r.json()
     results = data.get("results") or []
     if not results:
+        with _lock:
+            _db().execute("INSERT OR REPLACE INTO geocode_miss (name, fetched_at) VALUES (?, ?)", (name, now))
         return None
-    lat = results[0]["latitude"]
-    lon = results[0]["longitude"]
-    return float(lat), float(lon)
+    lat = float(results[0]["latitude"])
+    lon = float(results[0]["longitude"])
+    with _lock:
+        _db().execute("INSERT OR REPLACE INTO geocode (name, lat, lon) VALUES (?, ?, ?)", (name, lat, lon))
+    return lat, lon
 
-def get_weather_summary(location: str, days: int = 14) -> dict:
-    coords = _geocode(location)
-    if not coords:
-        return {"avg_temp_c": 24.0, "avg_precip_mm": 2.0, "source": "default"}
+@tracing.traced("weather.forecast")
+def _forecast_daily(lat: float, lon: float, start: dt.date, end: dt.date) -> dict:
+    lat, lon = round(lat, COORD_DECIMALS), round(lon, COORD_DECIMALS)
+    key = f"{lat:.{COORD_DECIMALS}f},{lon:.{COORD_DECIMALS}f},{start.isoformat()},{end.isoformat()}"
+    now = time.time()
+    with _lock:
+        row = _db().execute("SELECT daily, fetched_at FROM forecast WHERE key = ?", (key,)).fetchone()
+    if row and now - row[1] < settings.weather_forecast_ttl_s:
+        return json.loads(row[0])
 
-    lat, lon = coords
-    today = dt.date.today()
-    end = today + dt.timedelta(days=max(1, days - 1))
-
-    r = requests.get(
+    r = http_client.get(
         FORECAST_URL,
         params={
             "latitude": lat,
             "longitude": lon,
             "daily": "temperature_2m_max,temperature_2m_min,precipitation_sum",
             "timezone": "auto",
-            "start_date": today.isoformat(),
+            "start_date": start.isoformat(),
             "end_date": end.isoformat(),
         },
-        timeout=15,
     )
     r.raise_for_status()
-    d = r.json().get("daily", {})
+    daily = r.json().get("daily", {})
+    with _lock:
+        db = _db()
+        db.execute("INSERT OR REPLACE INTO forecast (key, daily, fetched_at) VALUES (?, ?, ?)", (key, json.dumps(daily), now))
+        db.execute("DELETE FROM forecast WHERE fetched_at < ?", (now - settings.weather_forecast_ttl_s,))
+    return daily
+
+def get_weather_summary(location: str, days: int = 14) -> dict:
+    coords = _geocode(location)
+    if not coords:
+        return {"avg_temp_c": 24.0, "avg_precip_mm": 2.0, "source": "default"}
+
+    lat, lon = coords
+    today = dt.date.today()
+    end = today + dt.timedelta(days=max(1, days - 1))
+    d = _forecast_daily(lat, lon, today, end)
 
     temps_max = d.get("temperature_2m_max") or []
     temps_min = d.get("temperature_2m_min") or []
@@ -0,0 +1,129 @@
+# services/whatif.py
+"""
+What-if engine: revenue / COGS / margin / per-crop profit for a whole grid of
+area x price x FX factors in one vectorized pass, without copying the plan.
+
+Model (same as the app's single-point what-if):
+  yield_i(a)   = yield_i * a
+  price_i(p)   = price_i * (1 + p)
+  COGS(a)      = (water + nutrients) * a + labor + misc
+  COGS share_i = yield_i / sum(yield)          (independent of a)
+Money is multiplied by the FX rate; margins are FX-independent.
+"""
+from typing import NamedTuple, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+class WhatIfGrid(NamedTuple):
+    area_factors: np.ndarray   # (A,)
+    price_factors: np.ndarray  # (P,)
+    fx_rates: np.ndarray       # (F,)
+    crops: Tuple[str, ...]     # (C,)
+    revenue: np.ndarray        # (A, P, F)
+    cogs: np.ndarray           # (A, P, F)
+    margin_pct: np.ndarray     # (A, P, F)
+    crop_profit: np.ndarray    # (A, P, F, C)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Long format, one row per (area_factor, price_factor, fx_rate)."""
+        a, p, f = np.meshgrid(self.area_factors, self.price_factors, self.fx_rates, indexing="ij")
+        return pd.DataFrame({
+            "area_factor": a.ravel(),
+            "price_factor": p.ravel(),
+            "fx_rate": f.ravel(),
+            "revenue": self.revenue.ravel(),
+            "cogs": self.cogs.ravel(),
+            "profit": (self.revenue - self.cogs).ravel(),
+            "margin_pct": self.margin_pct.ravel(),
+        })
+
+    def margin_table(self, fx_index: int = 0) -> pd.DataFrame:
+        """Area factors as rows, price factors as columns; ready for a heatmap."""
+        return pd.DataFrame(self.margin_pct[:, :, fx_index], index=self.area_factors, columns=self.price_factors)
+
+def _plan_arrays(plan: dict):
+    op = plan["ops_plan"]
+    mk = plan["market_plan"]
+    price_map = {p["crop"].strip().lower(): float(p["unit_price_usd_per_kg"]) for p in mk["pricing_assumptions"]}
+    crops = op["crops"]
+    names = tuple(c["name"] for c in crops)
+    yields = np.array([float(c["expected_yield_kg"]) for c in crops])
+    prices = np.array([price_map.get(c["name"].strip().lower(), 0.0) for c in crops])
+    costs = op["costs"]
+    variable = float(costs["water_usd"]) + float(costs["nutrients_usd"])
+    fixed = float(costs["labor_usd"]) + float(costs["misc_usd"])
+    return names, yields, prices, variable, fixed
+
+def sensitivity_grid(plan: dict, area_factors: Sequence[float], price_factors: Sequence[float],
+                     fx_rates: Sequence[float] = (1.0,)) -> WhatIfGrid:
+    names, yields, prices, variable, fixed = _plan_arrays(plan)
+    a = np.asarray(area_factors, dtype=float)[:, None, None]
+    p = np.asarray(price_factors, dtype=float)[None, :, None]
+    f = np.asarray(fx_rates, dtype=float)[None, None, :]
+
+    base_revenue = prices * yields                       # (C,)
+    share = yields / (yields.sum() or 1.0)               # (C,)
+    revenue_usd = a * (1.0 + p) * base_revenue.sum()     # (A, P, 1)
+    cogs_usd = variable * a + fixed                      # (A, 1, 1)
+    margin = np.divide((revenue_usd - cogs_usd) * 100.0, revenue_usd,
+                       out=np.zeros(np.broadcast_shapes(revenue_usd.shape, cogs_usd.shape)), where=revenue_usd > 0)
+
+    crop_profit = (a * (1.0 + p) * f)[..., None] * base_revenue - (cogs_usd * f)[..., None] * share
+    shape = (a.shape[0], p.shape[1], f.shape[2])
+    return WhatIfGrid(
+        area_factors=a.ravel(),
+        price_factors=p.ravel(),
+        fx_rates=f.ravel(),
+        crops=names,
+        revenue=np.broadcast_to(revenue_usd * f, shape),
+        cogs=np.broadcast_to(cogs_usd * f, shape),
+        margin_pct=np.broadcast_to(margin, shape),
+        crop_profit=np.broadcast_to(crop_profit, shape + (len(names),)),
+    )
+
+def break_even_price_factor(plan: dict, area_factors: Sequence[float]) -> np.ndarray:
+    """Price factor p at which revenue == COGS for each area factor (the zero-margin contour)."""
+    _, yields, prices, variable, fixed = _plan_arrays(plan)
+    a = np.asarray(area_factors, dtype=float)
+    base_revenue = float((prices * yields).sum())
+    if base_revenue <= 0:
+        return np.full(a.shape, np.inf)
+    return (variable * a + fixed) / (base_revenue * a) - 1.0
+
+def apply_what_if(base: dict, area_factor: float, price_factor: float) -> dict:
+    """Adjusted plan WITHOUT extra LLM calls; untouched sections are shared with `base`, not copied."""
+    op = base["ops_plan"]
+    mk = base["market_plan"]
+    crops = [
+        {
+            **c,
+            "expected_yield_kg": round(float(c["expected_yield_kg"]) * area_factor, 2),
+            "watering_l_per_day": round(float(c["watering_l_per_day"]) * area_factor, 2),
+            "fertilizer_g_per_week": round(float(c["fertilizer_g_per_week"]) * area_factor, 2),
+        }
+        for c in op["crops"]
+    ]
+    # Scale variable costs; keep labor & misc constant
+    costs = {
+        **op["costs"],
+        "water_usd": round(float(op["costs"]["water_usd"]) * area_factor, 2),
+        "nutrients_usd": round(float(op["costs"]["nutrients_usd"]) * area_factor, 2),
+    }
+    pricing = [
+        {**p, "unit_price_usd_per_kg": round(float(p["unit_price_usd_per_kg"]) * (1.0 + price_factor), 4)}
+        for p in mk["pricing_assumptions"]
+    ]
+    price_map = {p["crop"].strip().lower(): float(p["unit_price_usd_per_kg"]) for p in pricing}
+    revenue = sum(price_map.get(c["name"].strip().lower(), 0.0) * float(c["expected_yield_kg"]) for c in crops)
+    cogs = round(sum(costs.values()), 2)
+    return {
+        **base,
+        "ops_plan": {**op, "crops": crops, "costs": costs},
+        "market_plan": {
+            **mk,
+            "pricing_assumptions": pricing,
+            "revenue_usd": round(revenue, 2),
+            "cogs_usd": cogs,
+            "margin_pct": round(((revenue - cogs) / revenue * 100.0) if revenue > 0 else 0.0, 2),
+        },
+    }
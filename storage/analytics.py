@@ -0,0 +1,116 @@
+# storage/analytics.py
+"""
+Cross-scenario analytics over the normalized scenario_crop / scenario_cost tables.
+Aggregations run inside the database; nothing here decodes result_json except the backfill.
+
+    python -m storage.analytics backfill       # populate metrics for rows saved before the tables existed
+    python -m storage.analytics top tomato --location Colombo
+"""
+import argparse
+from typing import List, Optional
+from sqlalchemy import func
+from sqlmodel import Session, select
+from storage.db import Scenario, ScenarioCrop, ScenarioCost, get_engine, init_db, metric_rows
+from storage.codec import decode_payload
+
+def top_crop_margins(crop: str, location: Optional[str] = None, limit: int = 20) -> List[dict]:
+    """Best per-crop margins for `crop`, optionally within scenarios whose location contains `location`."""
+    stmt = (
+        select(
+            ScenarioCrop.scenario_id, Scenario.name, Scenario.location, Scenario.created_at,
+            ScenarioCrop.area_m2, ScenarioCrop.yield_kg, ScenarioCrop.revenue_usd,
+            ScenarioCrop.profit_usd, ScenarioCrop.margin_pct,
+        )
+        .join(Scenario, Scenario.id == ScenarioCrop.scenario_id)
+        .where(ScenarioCrop.crop_key == crop.strip().lower())
+    )
+    if location:
+        stmt = stmt.where(Scenario.location.ilike(f"%{location}%"))
+    stmt = stmt.order_by(ScenarioCrop.margin_pct.desc()).limit(limit)
+    with Session(get_engine()) as ses:
+        return [dict(row._mapping) for row in ses.exec(stmt).all()]
+
+def crop_summary(location: Optional[str] = None) -> List[dict]:
+    """Per crop: scenario count, average margin, yield per m2 and total profit."""
+    stmt = select(
+        ScenarioCrop.crop_key.label("crop"),
+        func.count(ScenarioCrop.id).label("scenarios"),
+        func.avg(ScenarioCrop.margin_pct).label("avg_margin_pct"),
+        (func.sum(ScenarioCrop.yield_kg) / func.nullif(func.sum(ScenarioCrop.area_m2), 0)).label("yield_kg_per_m2"),
+        func.sum(ScenarioCrop.profit_usd).label("total_profit_usd"),
+    )
+    if location:
+        stmt = stmt.join(Scenario, Scenario.id == ScenarioCrop.scenario_id).where(Scenario.location.ilike(f"%{location}%"))
+    stmt = stmt.group_by(ScenarioCrop.crop_key).order_by(func.avg(ScenarioCrop.margin_pct).desc())
+    with Session(get_engine()) as ses:
+        return [dict(row._mapping) for row in ses.exec(stmt).all()]
+
+def cost_summary_by_location(limit: int = 50) -> List[dict]:
+    """Average cost components and margin per location."""
+    stmt = (
+        select(
+            Scenario.location,
+            func.count(ScenarioCost.scenario_id).label("scenarios"),
+            func.avg(ScenarioCost.water_usd).label("avg_water_usd"),
+            func.avg(ScenarioCost.nutrients_usd).label("avg_nutrients_usd"),
+            func.avg(ScenarioCost.labor_usd).label("avg_labor_usd"),
+            func.avg(ScenarioCost.misc_usd).label("avg_misc_usd"),
+            func.avg(ScenarioCost.margin_pct).label("avg_margin_pct"),
+        )
+        .join(Scenario, Scenario.id == ScenarioCost.scenario_id)
+        .group_by(Scenario.location)
+        .order_by(func.count(ScenarioCost.scenario_id).desc())
+        .limit(limit)
+    )
+    with Session(get_engine()) as ses:
+        return [dict(row._mapping) for row in ses.exec(stmt).all()]
+
+def backfill_metrics(chunk_size: int = 500) -> int:
+    """Write metric rows for scenarios that have none yet. Safe to re-run; returns rows backfilled."""
+    init_db()
+    engine = get_engine()
+    done = 0
+    last_id = 0
+    while True:
+        with Session(engine) as ses:
+            missing = (
+                select(Scenario.id, Scenario.result_json)
+                .outerjoin(ScenarioCost, ScenarioCost.scenario_id == Scenario.id)
+                .where(ScenarioCost.scenario_id.is_(None), Scenario.id > last_id)
+                .order_by(Scenario.id)
+                .limit(chunk_size)
+            )
+            rows = ses.exec(missing).all()
+            if not rows:
+                return done
+            for scenario_id, payload in rows:
+                crop_rows, cost_row = metric_rows(scenario_id, decode_payload(payload))
+                ses.add_all([ScenarioCrop(**row) for row in crop_rows] + [ScenarioCost(**cost_row)])
+            ses.commit()
+            done += len(rows)
+            last_id = rows[-1][0]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Scenario analytics")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("backfill", help="populate scenario_crop / scenario_cost for existing rows")
+    top = sub.add_parser("top", help="top margins for one crop")
+    top.add_argument("crop")
+    top.add_argument("--location")
+    top.add_argument("--limit", type=int, default=20)
+    crops = sub.add_parser("crops", help="per-crop summary")
+    crops.add_argument("--location")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "backfill":
+        print(f"backfilled {backfill_metrics()} scenarios")
+    elif args.cmd == "top":
+        for row in top_crop_margins(args.crop, args.location, args.limit):
+            print(f"[{row['scenario_id']}] {row['name']:<30} {row['location']:<24} margin {row['margin_pct']:>7.2f}%  profit ${row['profit_usd']:.2f}")
+    else:
+        for row in crop_summary(args.location):
+            print(f"{row['crop']:<16} n={row['scenarios']:<6} avg margin {row['avg_margin_pct']:.2f}%  total profit ${row['total_profit_usd']:.2f}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,13 +1,24 @@
 # storage/db.py
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple, Iterable, Iterator
+from itertools import islice
+from sqlalchemy import Column, Index, LargeBinary, bindparam, or_, and_, delete, event, insert, update
 from sqlmodel import SQLModel, Field, Session, create_engine, select
+from pydantic import BaseModel
 from datetime import datetime
 from config import settings
+from storage.codec import encode_payload, decode_payload, is_current
+from services import tracing
+from services.profitability import compute as compute_profitability
+import argparse
 import json
 
 class Scenario(SQLModel, table=True):
     __tablename__ = "scenario"
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        Index("ix_scenario_created_at_id", "created_at", "id"),
+        Index("ix_scenario_location", "location"),
+        {"extend_existing": True},
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
@@ -17,24 +28,137 @@ class Scenario(SQLModel, table=True):
     season: str
     goal: str
     organic: bool
-    result_json: str  # full plan JSON as string
+    # full plan payload; storage.codec format (legacy rows hold plain JSON text)
+    result_json: bytes = Field(sa_column=Column("result_json", LargeBinary, nullable=False))
+
+class ScenarioCrop(SQLModel, table=True):
+    """One row per crop of a saved plan; written alongside the Scenario row."""
+    __tablename__ = "scenario_crop"
+    __table_args__ = (
+        Index("ix_scenario_crop_crop_margin", "crop_key", "margin_pct"),
+        {"extend_existing": True},
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    scenario_id: int = Field(foreign_key="scenario.id", index=True)
+    crop: str
+    crop_key: str  # lowercase crop name
+    area_m2: float
+    yield_kg: float
+    price_usd_per_kg: float
+    revenue_usd: float
+    cogs_alloc_usd: float
+    profit_usd: float
+    margin_pct: float
+
+class ScenarioCost(SQLModel, table=True):
+    """Plan-level cost components and totals, one row per scenario."""
+    __tablename__ = "scenario_cost"
+    __table_args__ = (
+        Index("ix_scenario_cost_margin", "margin_pct"),
+        {"extend_existing": True},
+    )
+
+    scenario_id: int = Field(foreign_key="scenario.id", primary_key=True)
+    water_usd: float
+    nutrients_usd: float
+    labor_usd: float
+    misc_usd: float
+    cogs_usd: float
+    revenue_usd: float
+    margin_pct: float
+
+class ScenarioSummary(BaseModel):
+    """Scenario metadata without the result_json payload."""
+    id: int
+    name: str
+    created_at: datetime
+    location: str
+    area: float
+    season: str
+    goal: str
+    organic: bool
+
+_SUMMARY_COLUMNS = (
+    Scenario.id, Scenario.name, Scenario.created_at, Scenario.location,
+    Scenario.area, Scenario.season, Scenario.goal, Scenario.organic,
+)
 
 _engine = None
 
+def _sqlite_pragmas(dbapi_conn, _record):
+    # WAL lets readers (Streamlit sessions) run alongside one writer (batch imports);
+    # busy_timeout makes writers wait for the lock instead of failing with "database is locked".
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout_ms)}")
+    cur.execute("PRAGMA cache_size=-65536")  # KiB, i.e. 64 MiB
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.close()
+
 def get_engine():
     global _engine
     if _engine is None:
+        is_sqlite = settings.db_url.startswith("sqlite")
         _engine = create_engine(
             settings.db_url,
             echo=False,
-            connect_args={"check_same_thread": False} if settings.db_url.startswith("sqlite") else {}
+            connect_args={"check_same_thread": False, "timeout": settings.sqlite_busy_timeout_ms / 1000.0} if is_sqlite else {}
         )
+        if is_sqlite and settings.sqlite_tuning:
+            event.listen(_engine, "connect", _sqlite_pragmas)
     return _engine
 
 def init_db():
     engine = get_engine()
     SQLModel.metadata.create_all(engine)
+    # create_all skips indexes on tables that already exist
+    for model in (Scenario, ScenarioCrop, ScenarioCost):
+        for idx in model.__table__.indexes:
+            idx.create(engine, checkfirst=True)
+
+def metric_rows(scenario_id: int, results: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Column values for the ScenarioCrop rows and the ScenarioCost row of one plan."""
+    cp = results.get("crop_plan", {})
+    op = results.get("ops_plan", {})
+    mk = results.get("market_plan", {})
+    area_map = {}
+    for c in cp.get("crops", []):
+        area_map.setdefault(c["name"].strip().lower(), float(c.get("area_m2", 0.0)))
+    total_cogs = float(mk.get("cogs_usd", 0.0))
+    prof = compute_profitability([results])
 
+    crop_rows = []
+    for row, price in zip(prof.rows(), prof.price.tolist()):
+        key = row["crop"].strip().lower()
+        crop_rows.append({
+            "scenario_id": scenario_id,
+            "crop": row["crop"],
+            "crop_key": key,
+            "area_m2": area_map.get(key, 0.0),
+            "yield_kg": row["yield_kg"],
+            "price_usd_per_kg": round(price, 4),
+            "revenue_usd": row["revenue"],
+            "cogs_alloc_usd": row["cogs_alloc"],
+            "profit_usd": row["profit"],
+            "margin_pct": row["margin_pct"],
+        })
+
+    costs = op.get("costs", {})
+    cost_row = {
+        "scenario_id": scenario_id,
+        "water_usd": float(costs.get("water_usd", 0.0)),
+        "nutrients_usd": float(costs.get("nutrients_usd", 0.0)),
+        "labor_usd": float(costs.get("labor_usd", 0.0)),
+        "misc_usd": float(costs.get("misc_usd", 0.0)),
+        "cogs_usd": total_cogs,
+        "revenue_usd": float(mk.get("revenue_usd", 0.0)),
+        "margin_pct": float(mk.get("margin_pct", 0.0)),
+    }
+    return crop_rows, cost_row
+
+@tracing.traced("db.save_scenario")
 def save_scenario(name: str, inputs: Dict[str, Any], results: Dict[str, Any]) -> int:
     engine = get_engine()
     with Session(engine) as ses:
@@ -45,31 +169,216 @@ def save_scenario(name: str, inputs: Dict[str, Any], results: Dict[str, Any]) ->
             season=str(inputs["season"]),
             goal=str(inputs["goal"]),
             organic=bool(inputs["organic"]),
-            result_json=json.dumps(results),
+            result_json=encode_payload(results),
         )
         ses.add(scen)
+        ses.flush()
+        scenario_id = scen.id
+        crop_rows, cost_row = metric_rows(scenario_id, results)
+        ses.add_all([ScenarioCrop(**row) for row in crop_rows] + [ScenarioCost(**cost_row)])
         ses.commit()
-        ses.refresh(scen)
-        return scen.id
+        return scenario_id
+
+def _scenario_row(name: str, inputs: Dict[str, Any], results: Dict[str, Any], created_at: datetime) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "created_at": created_at,
+        "location": str(inputs["location"]),
+        "area": float(inputs["area"]),
+        "season": str(inputs["season"]),
+        "goal": str(inputs["goal"]),
+        "organic": bool(inputs["organic"]),
+        "result_json": encode_payload(results),
+    }
 
-def list_scenarios(limit: int = 50) -> List[Scenario]:
+@tracing.traced("db.save_scenarios")
+def save_scenarios(items: Iterable[Tuple[str, Dict[str, Any], Dict[str, Any]]], chunk_size: int = 500) -> List[int]:
+    """
+    Bulk version of save_scenario for imports: (name, inputs, results) tuples are inserted
+    `chunk_size` at a time with executemany, all inside one transaction. Returns the new ids in order.
+    """
+    engine = get_engine()
+    scenario_t = Scenario.__table__
+    ids: List[int] = []
+    items = iter(items)
+    with engine.begin() as conn:
+        while True:
+            chunk = list(islice(items, chunk_size))
+            if not chunk:
+                return ids
+            now = datetime.utcnow()
+            rows = [_scenario_row(name, inputs, results, now) for name, inputs, results in chunk]
+            new_ids = conn.execute(
+                insert(scenario_t).returning(scenario_t.c.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+
+            crop_rows, cost_rows = [], []
+            for scenario_id, (_, _, results) in zip(new_ids, chunk):
+                crops, cost = metric_rows(scenario_id, results)
+                crop_rows.extend(crops)
+                cost_rows.append(cost)
+            if crop_rows:
+                conn.execute(insert(ScenarioCrop.__table__), crop_rows)
+            conn.execute(insert(ScenarioCost.__table__), cost_rows)
+            ids.extend(new_ids)
+
+def import_ndjson(path: str, prefix: str = "import:", chunk_size: int = 500) -> int:
+    """Bulk-load an orchestrator.batch NDJSON output file (successful lines only)."""
+    def items():
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if not line.strip():
+                    continue
+                rec = json.loads(line)
+                if "result" in rec:
+                    yield f"{prefix}{rec['key']}", rec["inputs"], rec["result"]
+    init_db()
+    return len(save_scenarios(items(), chunk_size=chunk_size))
+
+def _filtered(stmt, name: Optional[str], location: Optional[str]):
+    if name:
+        stmt = stmt.where(Scenario.name.ilike(f"%{name}%"))
+    if location:
+        stmt = stmt.where(Scenario.location.ilike(f"%{location}%"))
+    return stmt
+
+@tracing.traced("db.list_scenarios")
+def list_scenarios(
+    limit: int = 50,
+    cursor: Optional[Tuple[datetime, int]] = None,
+    name: Optional[str] = None,
+    location: Optional[str] = None,
+) -> List[ScenarioSummary]:
+    """
+    Newest-first metadata listing (result_json is never loaded).
+    Keyset pagination: pass `cursor=next_cursor(previous_page)` to get the next page.
+    `name` / `location` are case-insensitive substring filters.
+    """
+    stmt = select(*_SUMMARY_COLUMNS)
+    if cursor is not None:
+        created_at, last_id = cursor
+        stmt = stmt.where(or_(
+            Scenario.created_at < created_at,
+            and_(Scenario.created_at == created_at, Scenario.id < last_id),
+        ))
+    stmt = _filtered(stmt, name, location).order_by(Scenario.created_at.desc(), Scenario.id.desc()).limit(limit)
+
+    engine = get_engine()
+    with Session(engine) as ses:
+        rows = ses.exec(stmt).all()
+    return [ScenarioSummary(**row._mapping) for row in rows]
+
+def next_cursor(page: List[ScenarioSummary]) -> Optional[Tuple[datetime, int]]:
+    return (page[-1].created_at, page[-1].id) if page else None
+
+def scenario_names(prefix: str = "") -> List[str]:
     engine = get_engine()
     with Session(engine) as ses:
-        rows = ses.exec(select(Scenario).order_by(Scenario.created_at.desc()).limit(limit)).all()
-        return rows
+        return list(ses.exec(select(Scenario.name).where(Scenario.name.startswith(prefix))).all())
 
+def _raw_payload(value) -> bytes:
+    # legacy rows hold plain JSON text; decode_payload accepts it as UTF-8 bytes too
+    return value.encode("utf-8") if isinstance(value, str) else bytes(value)
+
+def iter_scenario_payloads(chunk_size: int = 200, name: Optional[str] = None,
+                           location: Optional[str] = None) -> Iterator[List[Tuple[ScenarioSummary, bytes]]]:
+    """
+    Oldest-first (metadata, raw result_json) chunks, keyset-paginated on id; payloads are
+    left encoded so callers can decode them where the work happens (e.g. in worker processes).
+    """
+    engine = get_engine()
+    last_id = 0
+    while True:
+        stmt = _filtered(select(*_SUMMARY_COLUMNS, Scenario.result_json).where(Scenario.id > last_id), name, location)
+        with Session(engine) as ses:
+            rows = ses.exec(stmt.order_by(Scenario.id).limit(chunk_size)).all()
+        if not rows:
+            return
+        yield [(ScenarioSummary(**{k: v for k, v in row._mapping.items() if k != "result_json"}), _raw_payload(row.result_json))
+               for row in rows]
+        last_id = rows[-1].id
+
+def iter_scenario_totals(chunk_size: int = 1000, name: Optional[str] = None,
+                         location: Optional[str] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Oldest-first chunks of id/name/location/area plus ScenarioCost revenue, COGS and margin (None if missing)."""
+    engine = get_engine()
+    cols = (Scenario.id, Scenario.name, Scenario.location, Scenario.area,
+            ScenarioCost.revenue_usd, ScenarioCost.cogs_usd, ScenarioCost.margin_pct)
+    last_id = 0
+    while True:
+        stmt = select(*cols).outerjoin(ScenarioCost, ScenarioCost.scenario_id == Scenario.id).where(Scenario.id > last_id)
+        with Session(engine) as ses:
+            rows = ses.exec(_filtered(stmt, name, location).order_by(Scenario.id).limit(chunk_size)).all()
+        if not rows:
+            return
+        yield [dict(row._mapping) for row in rows]
+        last_id = rows[-1].id
+
+@tracing.traced("db.load_scenario")
 def load_scenario(scenario_id: int) -> Dict[str, Any]:
     engine = get_engine()
     with Session(engine) as ses:
-        scen = ses.get(Scenario, scenario_id)
-        if not scen:
+        payload = ses.exec(select(Scenario.result_json).where(Scenario.id == scenario_id)).first()
+        if payload is None:
             raise ValueError("Scenario not found")
-        return json.loads(scen.result_json)
+        return decode_payload(payload)
 
+@tracing.traced("db.delete_scenario")
 def delete_scenario(scenario_id: int) -> None:
     engine = get_engine()
     with Session(engine) as ses:
         scen = ses.get(Scenario, scenario_id)
         if scen:
+            for model in (ScenarioCrop, ScenarioCost):
+                ses.exec(delete(model).where(model.scenario_id == scenario_id))
             ses.delete(scen)
             ses.commit()
+
+def migrate_payloads(chunk_size: int = 500, vacuum: bool = True) -> int:
+    """Re-encode legacy plain-JSON payloads with the current codec. Safe to re-run; returns rows rewritten."""
+    engine = get_engine()
+    rewritten = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(Scenario.id, Scenario.result_json)
+                .where(Scenario.id > last_id)
+                .order_by(Scenario.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            todo = [{"sid": sid, "payload": encode_payload(decode_payload(raw))} for sid, raw in rows if not is_current(raw)]
+            if todo:
+                conn.execute(
+                    update(Scenario.__table__).where(Scenario.__table__.c.id == bindparam("sid")).values(result_json=bindparam("payload")),
+                    todo,
+                )
+            rewritten += len(todo)
+            last_id = rows[-1][0]
+    if vacuum and rewritten and settings.db_url.startswith("sqlite"):
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+    return rewritten
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Scenario storage maintenance")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    mig = sub.add_parser("migrate-payloads", help="re-encode plain-JSON result payloads and VACUUM")
+    mig.add_argument("--no-vacuum", action="store_true")
+    imp = sub.add_parser("import", help="bulk-import an orchestrator.batch NDJSON file")
+    imp.add_argument("path")
+    imp.add_argument("--prefix", default="import:")
+    imp.add_argument("--chunk-size", type=int, default=500)
+    args = ap.parse_args(argv)
+
+    init_db()
+    if args.cmd == "migrate-payloads":
+        print(f"re-encoded {migrate_payloads(vacuum=not args.no_vacuum)} scenarios")
+    else:
+        print(f"imported {import_ndjson(args.path, args.prefix, args.chunk_size)} scenarios")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,42 @@
+# tests/test_forex.py
+import pytest
+from benchmarks.stubs import StubResponse, offline
+from services import forex, http_client
+
+def no_lkr_request(seen: list):
+    """Frankfurter stand-in: publishes every requested code except LKR, rejects requests that name it."""
+    def request(method, url, timeout=None, params=None, **kwargs):
+        seen.append(dict(params or {}))
+        wanted = params["to"].split(",")
+        if "LKR" in wanted:
+            return StubResponse(url, 422, {"message": "invalid currency"})
+        return StubResponse(url, 200, {"base": params["from"], "rates": {c: 2.0 for c in wanted}})
+    return request
+
+@pytest.fixture
+def table():
+    seen = []
+    with offline():  # restores http_client.request on exit
+        http_client.request = no_lkr_request(seen)
+        yield forex.get_rate_table("USD"), seen
+
+def test_unpublished_codes_are_not_requested(table):
+    t, seen = table
+    assert len(seen) == 1
+    assert "LKR" not in seen[0]["to"].split(",")
+    assert t.rate("EUR") == 2.0
+    assert t.rate("GBP", "EUR") == 1.0
+    assert "LKR" not in t.rates
+
+def test_missing_code_raises_rate_unavailable(table):
+    t, _ = table
+    with pytest.raises(forex.RateUnavailable, match="LKR"):
+        t.rate("LKR")
+    with pytest.raises(forex.RateUnavailable):
+        forex.convert([1.0, 2.0], ["EUR", "LKR"], table=t)
+    assert forex.convert(10.0, "EUR", table=t) == pytest.approx(20.0)
+
+def test_get_rate_only_fails_for_the_missing_code(table):
+    assert forex.get_rate("USD", "EUR") == 2.0
+    with pytest.raises(forex.RateUnavailable):
+        forex.get_rate("USD", "LKR")